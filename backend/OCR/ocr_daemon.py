@@ -0,0 +1,129 @@
+#!/usr/bin/env python3
+"""
+Long-lived OCR service: one FastInsuranceExtractor with PaddleOCR and
+PyMuPDF imported, the models loaded and warmed once at startup, so a
+document costs only its own OCR and Ollama time.
+
+    python ocr_daemon.py                     # listens on 127.0.0.1:8765
+    OCR_DAEMON_PORT=9000 python ocr_daemon.py
+
+Endpoints (JSON in, JSON out — the same JSON paddleocr_to_json.py prints):
+    POST /process    {"path": "/abs/path/to/upload.pdf"}
+    POST /raw-text   {"text": "..."}
+    GET  /health     {"status": "ok", "warmup_seconds": ...}
+Errors are {"error": "..."} with status 400 (bad request), 404 (missing
+file) or 500.
+
+Documents are OCR'd one at a time (PaddleOCR is not thread-safe and the
+extractor keeps per-document confidence state), but the lock covers only
+the OCR step: one document's Ollama call overlaps the next one's OCR.
+Raw-text requests need no OCR and are served concurrently.
+"""
+
+import os
+import sys
+import json
+import tempfile
+import threading
+from datetime import datetime
+from http.server import BaseHTTPRequestHandler, ThreadingHTTPServer
+
+from PIL import Image, ImageDraw
+
+from paddleocr_to_json import FastInsuranceExtractor
+
+OCR_DAEMON_HOST = os.getenv('OCR_DAEMON_HOST', '127.0.0.1')
+OCR_DAEMON_PORT = int(os.getenv('OCR_DAEMON_PORT', '8765'))
+
+
+def warm_up(extractor):
+    """Run detection and recognition once so the first upload pays no lazy init"""
+    image = Image.new('RGB', (640, 160), 'white')
+    ImageDraw.Draw(image).text((20, 60), "POLICY NUMBER AB-1234567", fill='black')
+    temp_fd, temp_path = tempfile.mkstemp(suffix='.png')
+    try:
+        os.close(temp_fd)
+        image.save(temp_path)
+        extractor.extract_text_from_image(temp_path)
+    finally:
+        os.unlink(temp_path)
+
+
+class OCRRequestHandler(BaseHTTPRequestHandler):
+    extractor = None            # set by main()
+    text_extractor = None
+    ocr_lock = threading.Lock()
+    warmup_seconds = 0.0
+
+    def _send(self, status, body):
+        data = json.dumps(body, ensure_ascii=False, indent=2).encode('utf-8')
+        self.send_response(status)
+        self.send_header('Content-Type', 'application/json; charset=utf-8')
+        self.send_header('Content-Length', str(len(data)))
+        self.end_headers()
+        self.wfile.write(data)
+
+    def do_GET(self):
+        if self.path == '/health':
+            self._send(200, {"status": "ok", "warmup_seconds": self.warmup_seconds})
+        else:
+            self._send(404, {"error": f"Unknown endpoint: {self.path}"})
+
+    def do_POST(self):
+        try:
+            length = int(self.headers.get('Content-Length', 0))
+            payload = json.loads(self.rfile.read(length) or b'{}')
+        except (ValueError, json.JSONDecodeError) as e:
+            self._send(400, {"error": f"Invalid JSON body: {e}"})
+            return
+
+        try:
+            if self.path == '/process':
+                file_path = payload.get('path')
+                if not file_path:
+                    self._send(400, {"error": "Missing 'path'"})
+                    return
+                if not os.path.exists(file_path):
+                    self._send(404, {"error": f"File not found: {file_path}"})
+                    return
+                result = self.extractor.process_document(file_path, ocr_lock=self.ocr_lock)
+            elif self.path == '/raw-text':
+                if 'text' not in payload:
+                    self._send(400, {"error": "Missing 'text'"})
+                    return
+                result = self.text_extractor.process_raw_text(payload['text'])
+            else:
+                self._send(404, {"error": f"Unknown endpoint: {self.path}"})
+                return
+        except Exception as e:
+            print(f"[ERROR] Processing failed: {e}", file=sys.stderr)
+            self._send(500, {"error": str(e)})
+            return
+        self._send(200, result)
+
+    def log_message(self, format, *args):
+        print(f"[INFO] {self.address_string()} {format % args}", file=sys.stderr)
+
+
+def main():
+    start = datetime.now()
+    OCRRequestHandler.extractor = FastInsuranceExtractor(init_ocr=True)
+    OCRRequestHandler.text_extractor = FastInsuranceExtractor(init_ocr=False)
+    warm_up(OCRRequestHandler.extractor)
+    OCRRequestHandler.warmup_seconds = (datetime.now() - start).total_seconds()
+    print(f"[SUCCESS] Models loaded and warmed in {OCRRequestHandler.warmup_seconds:.2f}s",
+          file=sys.stderr)
+
+    server = ThreadingHTTPServer((OCR_DAEMON_HOST, OCR_DAEMON_PORT), OCRRequestHandler)
+    print(f"[INFO] OCR daemon listening on http://{OCR_DAEMON_HOST}:{OCR_DAEMON_PORT}",
+          file=sys.stderr)
+    try:
+        server.serve_forever()
+    except KeyboardInterrupt:
+        pass
+    finally:
+        server.server_close()
+
+
+if __name__ == "__main__":
+    main()
@@ -1,4 +1,16 @@
 #!/usr/bin/env python3
+"""
+Insurance document → JSON: PaddleOCR text extraction, then field
+extraction by Ollama.
+
+    python paddleocr_to_json.py <image|pdf|txt>
+    python paddleocr_to_json.py --raw-text "<text>"
+
+The CLI is a thin client: it forwards the request to the OCR daemon
+(ocr_daemon.py, OCR_DAEMON_URL), which keeps the models loaded, and only
+processes the document in-process when no daemon is running. Either way
+the JSON printed on stdout is the same.
+"""
 
 import os
 import sys
@@ -7,25 +19,42 @@ import requests
 from datetime import datetime
 from PIL import Image
 import tempfile
+from contextlib import nullcontext
+
+OCR_DAEMON_URL = os.getenv('OCR_DAEMON_URL', 'http://127.0.0.1:8765')
+
+# PaddleOCR and PyMuPDF take seconds to import; only an in-process
+# extractor loads them (see _import_ocr_backends)
+fitz = None
+PaddleOCR = None
+PDF_SUPPORT = False
+
 
-# PDF processing imports
-try:
-    import fitz  # PyMuPDF
-    PDF_SUPPORT = True
-    print("[SUCCESS] PyMuPDF imported - PDF support enabled", file=sys.stderr)
-except ImportError:
-    PDF_SUPPORT = False
-    print("[WARNING] PyMuPDF not found - PDF support disabled", file=sys.stderr)
-
-try:
-    from paddleocr import PaddleOCR
-    print("[SUCCESS] PaddleOCR imported successfully", file=sys.stderr)
-except ImportError as e:
-    print(f"[ERROR] Failed to import PaddleOCR: {e}", file=sys.stderr)
-    sys.exit(1)
+def _import_ocr_backends():
+    global fitz, PaddleOCR, PDF_SUPPORT
+    if PaddleOCR is not None:
+        return
+
+    # PDF processing imports
+    try:
+        import fitz as _fitz  # PyMuPDF
+        fitz, PDF_SUPPORT = _fitz, True
+        print("[SUCCESS] PyMuPDF imported - PDF support enabled", file=sys.stderr)
+    except ImportError:
+        PDF_SUPPORT = False
+        print("[WARNING] PyMuPDF not found - PDF support disabled", file=sys.stderr)
+
+    try:
+        from paddleocr import PaddleOCR as _PaddleOCR
+        PaddleOCR = _PaddleOCR
+        print("[SUCCESS] PaddleOCR imported successfully", file=sys.stderr)
+    except ImportError as e:
+        print(f"[ERROR] Failed to import PaddleOCR: {e}", file=sys.stderr)
+        sys.exit(1)
 
 class FastInsuranceExtractor:
     def __init__(self, init_ocr=True):
+        _import_ocr_backends()
         # Initialize OCR only if needed (for images/PDFs)
         self.ocr = None
         if init_ocr:
@@ -596,13 +625,21 @@ Match patterns exactly as they appear after the labels. Return only JSON."""
                 "coverage_limits": []
             }
     
-    def process_document(self, image_path):
-        """Fast document processing pipeline"""
+    def process_document(self, image_path, ocr_lock=None):
+        """Fast document processing pipeline
+
+        ocr_lock, if given, is held around the OCR step only (PaddleOCR and
+        confidence_scores are shared); the Ollama call runs outside it.
+        """
         start_time = datetime.now()
         
         # Step 1: Fast OCR
         ocr_start = datetime.now()
-        raw_text, detailed_ocr = self.extract_text(image_path)
+        with ocr_lock or nullcontext():
+            # a .txt upload or a PDF with no text blocks sets no confidence
+            self.confidence_scores = {}
+            raw_text, detailed_ocr = self.extract_text(image_path)
+            ocr_confidence = self.confidence_scores.get('ocr_confidence', 0)
         ocr_time = (datetime.now() - ocr_start).total_seconds()
         
         print(f"[INFO] OCR completed in {ocr_time:.2f}s", file=sys.stderr)
@@ -642,7 +679,7 @@ Match patterns exactly as they appear after the labels. Return only JSON."""
         
         # Add accuracy metrics
         extracted_data["accuracy_metrics"] = {
-            "ocr_confidence": self.confidence_scores.get('ocr_confidence', 0),
+            "ocr_confidence": ocr_confidence,
             "extraction_completeness": 0,  # Will be calculated by frontend
             "field_accuracy_estimates": {}
         }
@@ -657,6 +694,60 @@ Match patterns exactly as they appear after the labels. Return only JSON."""
         print(f"[SUCCESS] Total processing time: {total_time:.2f}s", file=sys.stderr)
         return extracted_data
 
+    def process_raw_text(self, raw_text):
+        """Field extraction from already-extracted text (no OCR)"""
+        print(f"Processing raw text directly (length: {len(raw_text)})", file=sys.stderr)
+        start_time = datetime.now()
+        
+        prompt = self.create_fast_prompt(raw_text)
+        content = self.fast_ollama_call(prompt)
+        processed_data = self.parse_json_response(content)
+        
+        ai_processing_time = (datetime.now() - start_time).total_seconds()
+        
+        # Add processing metrics
+        processed_data['processing_metrics'] = {
+            'paddleocr_time_seconds': 0.0,
+            'ai_processing_time_seconds': ai_processing_time,
+            'total_time_seconds': ai_processing_time,
+            'raw_text_processing': True
+        }
+        
+        # Create text blocks from raw text lines
+        processed_data["text_blocks"] = []
+        lines = raw_text.split('\\n')
+        for i, line in enumerate(lines):
+            if line.strip():
+                text_block = {
+                    "text": line.strip(),
+                    "confidence": 1.0,
+                    "bbox": f"Line {i+1}"
+                }
+                processed_data["text_blocks"].append(text_block)
+        
+        processed_data["raw_ocr_text"] = raw_text[:500] + "..." if len(raw_text) > 500 else raw_text
+        
+        print(f"[SUCCESS] Raw text processing completed in {ai_processing_time:.2f}s", file=sys.stderr)
+        return processed_data
+
+
+def call_daemon(endpoint, payload):
+    """
+    Result JSON from the OCR daemon, or None if no daemon is listening.
+    Processing errors reported by the daemon are raised.
+    """
+    try:
+        resp = requests.post(f"{OCR_DAEMON_URL}/{endpoint}", json=payload,
+                             timeout=int(os.getenv('OCR_DAEMON_TIMEOUT', '300')))
+    except requests.exceptions.ConnectionError:
+        print(f"[INFO] No OCR daemon at {OCR_DAEMON_URL} - processing in-process", file=sys.stderr)
+        return None
+    if resp.status_code != 200:
+        raise RuntimeError(resp.json().get('error', resp.text))
+    print(f"[INFO] Processed by OCR daemon at {OCR_DAEMON_URL}", file=sys.stderr)
+    return resp.json()
+
+
 if __name__ == "__main__":
     # Handle raw text processing
     if "--raw-text" in sys.argv:
@@ -664,41 +755,10 @@ if __name__ == "__main__":
             raw_text_index = sys.argv.index("--raw-text")
             if raw_text_index + 1 < len(sys.argv):
                 raw_text = sys.argv[raw_text_index + 1]
-                print(f"Processing raw text directly (length: {len(raw_text)})", file=sys.stderr)
-                
-                extractor = FastInsuranceExtractor()
-                start_time = datetime.now()
-                
-                prompt = extractor.create_fast_prompt(raw_text)
-                content = extractor.fast_ollama_call(prompt)
-                processed_data = extractor.parse_json_response(content)
-                
-                ai_processing_time = (datetime.now() - start_time).total_seconds()
-                
-                # Add processing metrics
-                processed_data['processing_metrics'] = {
-                    'paddleocr_time_seconds': 0.0,
-                    'ai_processing_time_seconds': ai_processing_time,
-                    'total_time_seconds': ai_processing_time,
-                    'raw_text_processing': True
-                }
-                
-                # Create text blocks from raw text lines
-                processed_data["text_blocks"] = []
-                lines = raw_text.split('\\n')
-                for i, line in enumerate(lines):
-                    if line.strip():
-                        text_block = {
-                            "text": line.strip(),
-                            "confidence": 1.0,
-                            "bbox": f"Line {i+1}"
-                        }
-                        processed_data["text_blocks"].append(text_block)
-                
-                processed_data["raw_ocr_text"] = raw_text[:500] + "..." if len(raw_text) > 500 else raw_text
-                
+                processed_data = call_daemon('raw-text', {'text': raw_text})
+                if processed_data is None:
+                    processed_data = FastInsuranceExtractor(init_ocr=False).process_raw_text(raw_text)
                 print(json.dumps(processed_data, ensure_ascii=False, indent=2))
-                print(f"[SUCCESS] Raw text processing completed in {ai_processing_time:.2f}s", file=sys.stderr)
                 sys.exit(0)
         except Exception as e:
             print(f"[ERROR] Error processing raw text: {e}", file=sys.stderr)
@@ -712,12 +772,14 @@ if __name__ == "__main__":
         sys.exit(1)
     
     try:
-        # Check if it's a text file to optimize initialization
-        is_text_file = file_path.lower().endswith('.txt')
-        
-        # Initialize extractor with or without OCR based on file type
-        extractor = FastInsuranceExtractor(init_ocr=not is_text_file)
-        result = extractor.process_document(file_path)
+        result = call_daemon('process', {'path': os.path.abspath(file_path)})
+        if result is None:
+            # Check if it's a text file to optimize initialization
+            is_text_file = file_path.lower().endswith('.txt')
+            
+            # Initialize extractor with or without OCR based on file type
+            extractor = FastInsuranceExtractor(init_ocr=not is_text_file)
+            result = extractor.process_document(file_path)
         print(json.dumps(result, ensure_ascii=False, indent=2))
     except Exception as e:
         print(f"[ERROR] Processing failed: {e}", file=sys.stderr)
@@ -3,6 +3,12 @@ import * as path from 'path';
 import { spawn } from 'child_process';
 import * as fs from 'fs';
 import * as os from 'os';
+import axios from 'axios';
+
+// OCR/ocr_daemon.py keeps PaddleOCR loaded; without it each request spawns
+// paddleocr_to_json.py and pays the model initialization again
+const OCR_DAEMON_URL = process.env.OCR_DAEMON_URL || 'http://127.0.0.1:8765';
+const OCR_DAEMON_TIMEOUT_MS = parseInt(process.env.OCR_DAEMON_TIMEOUT_MS || '300000', 10);
 
 @Injectable()
 export class AppService {
@@ -45,6 +51,11 @@ export class AppService {
       console.log('Image path:', absoluteImagePath);
       console.log('==========================================');
 
+      const daemonResult = await this.callOcrDaemon('process', { path: absoluteImagePath });
+      if (daemonResult) {
+        return daemonResult;
+      }
+
       return new Promise((resolve, reject) => {
         const pythonCmd = this.getPythonCommand();
         const pythonProcess = spawn(pythonCmd, [ocrScriptPath, absoluteImagePath]);
@@ -125,6 +136,11 @@ export class AppService {
       console.log('Raw text length:', rawText.length);
       console.log('==========================================');
 
+      const daemonResult = await this.callOcrDaemon('raw-text', { text: rawText });
+      if (daemonResult) {
+        return daemonResult;
+      }
+
       return new Promise((resolve, reject) => {
         const pythonCmd = this.getPythonCommand();
         const pythonProcess = spawn(pythonCmd, [ocrScriptPath, '--raw-text', rawText]);
@@ -186,6 +202,27 @@ export class AppService {
       });
     }
 
+  // Result from the OCR daemon, or null when none is listening (the caller
+  // then spawns the Python script instead)
+  private async callOcrDaemon(endpoint: string, payload: Record<string, unknown>): Promise<any> {
+    try {
+      const { data } = await axios.post(`${OCR_DAEMON_URL}/${endpoint}`, payload, {
+        timeout: OCR_DAEMON_TIMEOUT_MS,
+      });
+      console.log(`NESTJS: Processed by OCR daemon at ${OCR_DAEMON_URL}`);
+      return data;
+    } catch (error) {
+      if (error.response) {
+        throw new Error(`OCR daemon failed: ${error.response.data?.error || error.message}`);
+      }
+      if (error.code === 'ECONNREFUSED') {
+        console.log(`NESTJS: No OCR daemon at ${OCR_DAEMON_URL}, spawning Python script`);
+        return null;
+      }
+      throw error;
+    }
+  }
+
   private getPythonCommand(): string {
     const platform = os.platform();
     const envPath = process.env.PYTHON_PATH;
@@ -9,15 +9,19 @@ sys.path.insert(0, str(Path(__file__).parent.parent))
 from fastapi import FastAPI, HTTPException, UploadFile, File
 from fastapi.middleware.cors import CORSMiddleware
 from fastapi.responses import StreamingResponse
-from pydantic import BaseModel, Field
-from typing import Literal
+from pydantic import BaseModel, Field, ValidationError
+from typing import Literal, Optional
 import shutil
 
-from ml.predictor import predict, get_model_info, is_model_ready, is_excel_ready, reload
-from ml.trainer import train_models, train_models_streaming
-from ml.data_generator import generate_auto_insurance_data
+from ml.predictor import (predict, get_model_info, is_model_ready, is_excel_ready,
+                          reload, swap_model)
+from ml.train_worker import run_training, TrainingBusyError
 from ml.excel_reader import load_all_factors
-from ml.db_loader import load_training_data, is_db_available, get_total_row_count
+from ml.db_loader import (is_db_available, is_db_available_async,
+                          get_total_row_count_async)
+from ml.trainer import forest_params
+from ml.tuning import load_leaderboard
+from ml.prefecture_stats import load_stats_async, summarize
 
 DATA_DIR   = Path(__file__).parent.parent / "data"
 DATA_DIR.mkdir(exist_ok=True)
@@ -54,7 +58,19 @@ class RatingRequest(BaseModel):
 
 class TrainRequest(BaseModel):
     n_samples: int = Field(default=10000, ge=1000, le=5000000)
-    source: Literal["synthetic","database"] = "synthetic"
+    source: Literal["synthetic","database","snapshot"] = "synthetic"
+    seed:      int  = 42
+    use_cache: bool = True
+    oob_score:      bool  = False
+    early_stopping: bool  = False
+    oob_tol:        float = Field(default=0.001, ge=0, le=0.1)
+    dedupe:         bool  = False
+    params:         Optional[dict] = None   # forest overrides, e.g. from /tune/leaderboard
+    # database / snapshot sources — see db_loader.load_training_data
+    policy_years:     Optional[tuple[int, int]] = None   # inclusive (first, last)
+    prefecture_codes: Optional[list[str]]       = None
+    stratify_by:      Optional[Literal["risk_tier", "prefecture_code"]] = None
+    quotas:           Optional[dict[str, int]]  = None   # rows per stratum
 
 
 @app.get("/health")
@@ -75,60 +91,101 @@ def rate_policy(req: RatingRequest):
     return predict(req.model_dump(), mode=req.mode)
 
 
+def _check_train_request(req: TrainRequest):
+    if req.source == "database" and not is_db_available():
+        raise HTTPException(503, "Database not available.")
+    try:
+        forest_params(req.params)
+    except ValueError as e:
+        raise HTTPException(422, str(e))
+
+
 @app.post("/train")
 def train(req: TrainRequest):
     """Blocking train endpoint — kept for CLI/curl use."""
-    if req.source == "database":
-        if not is_db_available():
-            raise HTTPException(503, "Database not available.")
-        df = load_training_data(n_samples=req.n_samples)
-        source_label = "database"
-    else:
-        ef = load_all_factors(EXCEL_DEST) if EXCEL_DEST.exists() else None
-        df = generate_auto_insurance_data(req.n_samples, excel_factors=ef)
-        source_label = "synthetic" + ("_excel_anchored" if ef else "")
-
-    arts = train_models(df, source=source_label)
-    reload()
-    m = arts["metrics"]
-    return {
-        "message":                 "Training complete",
-        "training_samples":        len(df),
-        "training_source":         source_label,
-        "classification_accuracy": round(m["classification"]["accuracy"], 4),
-        "regression_r2":           round(m["regression"]["r2"], 4),
-        "regression_mae_jpy":      round(m["regression"]["mae"]),
-    }
+    _check_train_request(req)
+
+    result = None
+    try:
+        for item in run_training(req.model_dump()):
+            if item.get("error"):
+                raise HTTPException(500, item["error"])
+            if item.get("done"):
+                result = item["result"]
+    except TrainingBusyError as e:
+        raise HTTPException(409, str(e))
+
+    swap_model()
+    return result
+
+
+class RefreshRequest(BaseModel):
+    n_trees:  int = Field(default=10, ge=1, le=150)
+    max_rows: int = Field(default=1000000, ge=1000, le=5000000)
+
+
+@app.post("/train/refresh")
+def train_refresh(req: RefreshRequest):
+    """
+    Incremental refresh from policies inserted since the last DB training:
+    n_trees new trees per forest replace the oldest ones.
+    """
+    result = None
+    try:
+        for item in run_training({"mode": "refresh", **req.model_dump()}):
+            if item.get("error"):
+                raise HTTPException(500, item["error"])
+            if item.get("done"):
+                result = item["result"]
+    except TrainingBusyError as e:
+        raise HTTPException(409, str(e))
+
+    swap_model()
+    return result
 
 
 @app.get("/train/stream")
-async def train_stream(n_samples: int = 10000, source: str = "synthetic"):
+def train_stream(n_samples: int = 10000, source: str = "synthetic",
+                 seed: int = 42, use_cache: bool = True,
+                 oob_score: bool = False, early_stopping: bool = False,
+                 oob_tol: float = 0.001, dedupe: bool = False):
     """
     SSE endpoint — streams real training progress as trees are built.
-    Uses warm_start: each chunk of 10 trees yields a real progress event.
+    Training runs in a separate process (ml/train_worker.py); this thread
+    only relays its progress events. EventSource can only send query
+    parameters; POST /train/stream takes the full /train request.
     """
+    try:
+        req = TrainRequest(n_samples=n_samples, source=source, seed=seed,
+                           use_cache=use_cache, oob_score=oob_score,
+                           early_stopping=early_stopping, oob_tol=oob_tol, dedupe=dedupe)
+    except ValidationError as e:
+        raise HTTPException(422, e.errors(include_url=False))
+    return _stream_training(req)
+
+
+@app.post("/train/stream")
+def train_stream_post(req: TrainRequest):
+    """/train as an SSE progress stream: same request body, same run."""
+    return _stream_training(req)
+
+
+def _stream_training(req: TrainRequest) -> StreamingResponse:
+    _check_train_request(req)
+    try:
+        # starts the worker or raises — atomically, under the worker's lock
+        events = run_training(req.model_dump())
+    except TrainingBusyError as e:
+        raise HTTPException(409, str(e))
+
     progress_q: q_module.Queue = q_module.Queue()
 
     def run():
         try:
-            if source == "database":
-                if not is_db_available():
-                    progress_q.put({"error": "Database not available", "pct": 0})
-                    return
-                progress_q.put({"phase": "Querying database...", "pct": 2})
-                df = load_training_data(n_samples=n_samples)
-                progress_q.put({"phase": f"Loaded {len(df):,} rows from DB", "pct": 7})
-            else:
-                ef = load_all_factors(EXCEL_DEST) if EXCEL_DEST.exists() else None
-                progress_q.put({"phase": "Generating synthetic data...", "pct": 2})
-                df = generate_auto_insurance_data(n_samples, excel_factors=ef)
-                progress_q.put({"phase": f"Generated {len(df):,} rows", "pct": 7})
-
-            for item in train_models_streaming(df, source=source):
+            for item in events:
                 progress_q.put(item)
                 if item.get("done"):
-                    reload()
-
+                    swap_model()
         except Exception as e:
             progress_q.put({"error": str(e), "pct": 0})
         finally:
@@ -152,9 +209,7 @@ async def train_stream(n_samples: int = 10000, source: str = "synthetic"):
 
             if item is None:
                 break
-            # strip non-serialisable artifacts before sending to browser
-            safe = {k: v for k, v in item.items() if k != "artifacts"}
-            yield f"data: {json.dumps(safe)}\n\n"
+            yield f"data: {json.dumps(item)}\n\n"
 
     return StreamingResponse(
         event_gen(),
@@ -164,15 +219,40 @@ async def train_stream(n_samples: int = 10000, source: str = "synthetic"):
 
 
 @app.get("/db/status")
-def db_status():
-    available = is_db_available()
+async def db_status():
+    # async pool + short TTL cache: no threadpool worker, no connect per call
+    available = await is_db_available_async()
     if not available:
         return {"available": False, "total_rows": 0, "message": "DB not reachable"}
-    total = get_total_row_count()
+    total = await get_total_row_count_async()
     return {"available": True, "total_rows": total,
             "message": f"{total:,} historical policies available"}
 
 
+@app.get("/stats/prefecture")
+async def prefecture_stats(prefecture_code: Optional[str] = None,
+                           year_from: Optional[int] = None,
+                           year_to: Optional[int] = None,
+                           group_by: Literal["cell", "prefecture", "year", "all"] = "cell"):
+    """
+    Premium / NCD / claim-rate statistics per prefecture × policy year, from
+    the incrementally maintained summary table (never the policy table).
+    prefecture_code takes a comma-separated list; group_by merges years,
+    prefectures or both.
+    """
+    try:
+        stats = await load_stats_async()
+    except Exception as e:
+        raise HTTPException(503, f"Prefecture statistics unavailable: {e}")
+    codes = prefecture_code.split(",") if prefecture_code else None
+    years = None
+    if year_from is not None or year_to is not None:
+        years = (year_from if year_from is not None else 0,
+                 year_to if year_to is not None else 9999)
+    rows = summarize(stats, prefecture_codes=codes, policy_years=years, group_by=group_by)
+    return {"group_by": group_by, "updated_at": stats["updated_at"], "rows": rows}
+
+
 @app.post("/upload-excel")
 async def upload_excel(file: UploadFile = File(...)):
     if not file.filename.endswith(".xlsx"):
@@ -196,6 +276,17 @@ def model_info():
     return get_model_info()
 
 
+@app.get("/tune/leaderboard")
+def tune_leaderboard(limit: int = 20):
+    """Results of the last `python tune.py` run, best first."""
+    try:
+        board = load_leaderboard()
+    except FileNotFoundError:
+        raise HTTPException(404, "No tuning run yet. Run tune.py first.")
+    board["leaderboard"] = board["leaderboard"][:limit]
+    return board
+
+
 if __name__ == "__main__":
     import uvicorn
     uvicorn.run("main:app", host="0.0.0.0", port=8000, reload=True)
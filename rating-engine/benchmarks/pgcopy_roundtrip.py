@@ -0,0 +1,153 @@
+#!/usr/bin/env python3
+"""
+pgcopy_roundtrip.py
+===================
+Round-trip check for ml/pgcopy.py that needs no database.
+
+    python benchmarks/pgcopy_roundtrip.py                 # 50k rows
+    python benchmarks/pgcopy_roundtrip.py --rows 1000000
+
+encode_binary_copy() output is decoded two ways and compared with the
+input columns:
+  - BinaryCopyDecoder, fed in uneven chunks, for the int2/int4/int8
+    columns (the only types it accepts);
+  - a plain per-row parser of the binary COPY format for every column,
+    including fixed-width text, bool, date and vocabulary columns whose
+    words differ in length, so any vocabulary padding left in the stream
+    shows up as a wrong length or a shifted row.
+The decoder must also reject a stream with a NULL cell (length -1).
+Row counts straddle ENCODE_BLOCK so the blocked layout is covered.
+"""
+
+import argparse
+import sys
+from pathlib import Path
+
+import numpy as np
+
+sys.path.insert(0, str(Path(__file__).parent.parent))
+
+from ml.pgcopy import (BinaryCopyDecoder, CopyFormatError, encode_binary_copy,
+                       ENCODE_BLOCK, HEADER_FIXED, PG_EPOCH, SIGNATURE, TRAILER)
+
+# words of different lengths (and multi-byte UTF-8) force the padding compress
+VOCAB = ["Low", "Medium", "High", "Very High", "東京都"]
+
+
+def columns(n: int, rng) -> list:
+    """(name, pgtype, values) covering every type encode_binary_copy takes."""
+    return [
+        ("year",    "int2", rng.integers(2015, 2026, n).astype(np.int16)),
+        ("km",      "int4", rng.integers(-2**31, 2**31 - 1, n, dtype=np.int64).astype(np.int32)),
+        ("id",      "int8", rng.integers(-2**62, 2**62, n, dtype=np.int64)),
+        ("renewed", "bool", rng.random(n) < 0.5),
+        ("start",   "date", PG_EPOCH + rng.integers(-3000, 12000, n).astype("timedelta64[D]")),
+        ("code",    "text", np.array([f"{c:02d}".encode() for c in rng.integers(1, 48, n)], "S2")),
+        ("tier",    "text", (rng.integers(0, len(VOCAB), n), VOCAB)),
+        ("plan",    "text", (rng.integers(0, 2, n), ["A", "B"])),   # equal lengths: no padding
+    ]
+
+
+def parse(data: bytes, types: list) -> list:
+    """Reference decoder: one Python list per column, values as the server would read them."""
+    if data[:len(SIGNATURE)] != SIGNATURE:
+        raise CopyFormatError("Missing PGCOPY signature")
+    pos = HEADER_FIXED + int.from_bytes(data[HEADER_FIXED - 4:HEADER_FIXED], "big")
+    out = [[] for _ in types]
+    while True:
+        nfields = int.from_bytes(data[pos:pos + 2], "big", signed=True)
+        pos += 2
+        if nfields == -1:
+            break
+        if nfields != len(types):
+            raise CopyFormatError(f"Row {len(out[0])} has {nfields} fields")
+        for j, pgtype in enumerate(types):
+            length = int.from_bytes(data[pos:pos + 4], "big", signed=True)
+            pos += 4
+            raw = data[pos:pos + length]
+            pos += length
+            if pgtype == "text":
+                out[j].append(raw.decode("utf-8"))
+            elif pgtype == "bool":
+                out[j].append(raw == b"\x01")
+            else:
+                out[j].append(int.from_bytes(raw, "big", signed=True))
+    if pos != len(data):
+        raise CopyFormatError(f"{len(data) - pos} bytes after the trailer")
+    return out
+
+
+def expected(pgtype: str, values) -> list:
+    if pgtype == "text" and isinstance(values, tuple):
+        codes, vocab = values
+        return [vocab[c] for c in codes]
+    if pgtype == "text":
+        return [v.decode("utf-8") for v in values]
+    if pgtype == "date":
+        return (values - PG_EPOCH).astype(np.int64).tolist()
+    return values.tolist()
+
+
+def check_parser(data: bytes, cols: list):
+    try:
+        got = parse(data, [t for _, t, _ in cols])
+    except CopyFormatError as e:
+        sys.exit(f"❌  {len(cols[0][2]):,} rows: {e}")
+    for (name, pgtype, values), g in zip(cols, got):
+        want = expected(pgtype, values)
+        if g != want:
+            bad = next(i for i, (a, b) in enumerate(zip(g, want)) if a != b) \
+                if len(g) == len(want) else min(len(g), len(want))
+            sys.exit(f"❌  {name} ({pgtype}) differs at row {bad}: "
+                     f"{g[bad] if bad < len(g) else None!r} != "
+                     f"{want[bad] if bad < len(want) else None!r}")
+
+
+def check_decoder(cols: list, chunk: int):
+    ints = [(name, t, v) for name, t, v in cols if t in ("int2", "int4", "int8")]
+    data = encode_binary_copy([(t, v) for _, t, v in ints])
+    dec  = BinaryCopyDecoder([(name, t) for name, t, _ in ints])     # capacity 0: must grow
+    for lo in range(0, len(data), chunk):
+        dec.write(data[lo:lo + chunk])
+    arrays = dec.finish()
+    for name, _, v in ints:
+        if not np.array_equal(arrays[name], v):
+            bad = int(np.flatnonzero(arrays[name] != v)[0]) if len(arrays[name]) == len(v) else 0
+            sys.exit(f"❌  BinaryCopyDecoder: {name} differs at row {bad}")
+
+
+def check_null_rejected():
+    data = bytearray(encode_binary_copy([("int4", np.arange(3, dtype=np.int32))]))
+    # row 1's length word: header, row 0 (2 + 4 + 4 bytes), row 1's field count
+    at = HEADER_FIXED + 10 + 2
+    data[at:at + 8] = (-1).to_bytes(4, "big", signed=True) + bytes(4)
+    dec = BinaryCopyDecoder([("v", "int4")])
+    try:
+        dec.write(bytes(data))
+        dec.finish()
+    except CopyFormatError:
+        return
+    sys.exit("❌  BinaryCopyDecoder accepted a NULL cell")
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__.split("\n")[3])
+    parser.add_argument("--rows", type=int, default=50_000)
+    parser.add_argument("--seed", type=int, default=42)
+    args = parser.parse_args()
+
+    rng = np.random.default_rng(args.seed)
+    for n in sorted({1, ENCODE_BLOCK - 1, ENCODE_BLOCK, ENCODE_BLOCK + 1, args.rows}):
+        cols = columns(n, rng)
+        data = encode_binary_copy([(t, v) for _, t, v in cols])
+        if not data.endswith(TRAILER):
+            sys.exit(f"❌  {n} rows: stream does not end with the trailer")
+        check_parser(data, cols)
+        check_decoder(cols, chunk=4093)
+    check_null_rejected()
+    print(f"✅  Round trip OK: every column type up to {args.rows:,} rows, "
+          f"vocabulary padding dropped, NULL cell rejected")
+
+
+if __name__ == "__main__":
+    main()
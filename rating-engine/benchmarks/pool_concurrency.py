@@ -0,0 +1,82 @@
+#!/usr/bin/env python3
+"""
+pool_concurrency.py
+===================
+Checks that the sync pool (ml/db_pool.py) queues checkouts instead of
+failing when more connections are wanted than DB_POOL_SIZE: several
+concurrent sharded loads, each with more shards than the pool, while
+is_db_available is polled. Every load must return the same rows as the
+same call run alone afterwards (order within a shard may differ: the
+backend's scan order depends on concurrent scans), and the DB must never
+be reported down.
+
+Usage:
+    DB_POOL_SIZE=2 python benchmarks/pool_concurrency.py
+    python benchmarks/pool_concurrency.py --loads 3 --shards 12 --samples 50000
+"""
+
+import argparse
+import sys
+import time
+import threading
+from concurrent.futures import ThreadPoolExecutor
+from pathlib import Path
+sys.path.insert(0, str(Path(__file__).parent.parent))
+
+from ml.db_pool import DB_POOL_SIZE, invalidate
+from ml.db_loader import load_training_data, is_db_available
+
+
+def rows(df) -> list:
+    return sorted(df.astype(str).itertuples(index=False, name=None))
+
+
+def main():
+    parser = argparse.ArgumentParser()
+    parser.add_argument("--loads",   type=int, default=2, help="concurrent load_training_data calls")
+    parser.add_argument("--shards",  type=int, default=DB_POOL_SIZE * 2 + 1)
+    parser.add_argument("--samples", type=int, default=20_000)
+    parser.add_argument("--seed",    type=int, default=42)
+    args = parser.parse_args()
+    if args.shards <= DB_POOL_SIZE:
+        parser.error(f"--shards must exceed DB_POOL_SIZE ({DB_POOL_SIZE})")
+
+    def load(i):
+        return load_training_data(args.samples, shards=args.shards, seed=args.seed + i)
+
+    down = []
+    stop = threading.Event()
+
+    def poll():
+        while not stop.is_set():
+            invalidate("available")
+            if not is_db_available():
+                down.append(time.perf_counter())
+            time.sleep(0.01)
+
+    poller = threading.Thread(target=poll, daemon=True)
+    poller.start()
+    t0 = time.perf_counter()
+    try:
+        with ThreadPoolExecutor(max_workers=args.loads) as pool:
+            frames = list(pool.map(load, range(args.loads)))
+    finally:
+        stop.set()
+        poller.join()
+    secs = time.perf_counter() - t0
+
+    print(f"\nDB_POOL_SIZE {DB_POOL_SIZE}, {args.loads} loads × {args.shards} shards "
+          f"in {secs:.1f}s")
+    differ = 0
+    for i, df in enumerate(frames):
+        same = rows(df) == rows(load(i))
+        differ += not same
+        print(f"  load {i}: {len(df):,} rows, {'matches' if same else 'DIFFERS from'} "
+              f"a solo run")
+    if differ or down:
+        raise SystemExit(f"❌  {differ} loads differ, DB reported down {len(down)} times")
+    print("✅  All loads complete; DB never reported down")
+
+
+if __name__ == "__main__":
+    main()
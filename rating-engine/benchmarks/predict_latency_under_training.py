@@ -0,0 +1,117 @@
+#!/usr/bin/env python3
+"""
+predict_latency_under_training.py
+=================================
+Load test: /predict latency while a large training run is in progress.
+
+Fires /predict requests at a fixed rate from a small client pool, first
+with the engine idle (baseline), then while POST /train builds a model on
+--train-samples rows (default 1M). Prints p50 / p95 / p99 / max for both
+phases so the effect of retraining on live quoting is visible.
+
+The engine must already have a model (POST /train once) and be running:
+    venv/bin/python api/main.py
+    python benchmarks/predict_latency_under_training.py --url http://localhost:8000
+"""
+
+import argparse
+import json
+import threading
+import time
+import urllib.request
+from concurrent.futures import ThreadPoolExecutor
+
+import numpy as np
+
+PREDICT_BODY = json.dumps({
+    "ncd_grade": 12, "age_condition": "30+", "prefecture_code": "13",
+    "vehicle_rating_class": 7, "driver_restriction": "family",
+    "annual_km_band": "5,001〜10,000", "driver_age": 42,
+    "num_accidents": 1, "num_violations": 0, "years_licensed": 20,
+    "mode": "hybrid",
+}).encode()
+
+
+def _post(url, body, timeout):
+    req = urllib.request.Request(url, data=body, method="POST",
+                                 headers={"Content-Type": "application/json"})
+    with urllib.request.urlopen(req, timeout=timeout) as r:
+        return r.read()
+
+
+def _timed_predict(url):
+    t0 = time.perf_counter()
+    _post(f"{url}/predict", PREDICT_BODY, timeout=30)
+    return (time.perf_counter() - t0) * 1000
+
+
+def measure(url, seconds, rate, clients, until=None):
+    """Issue ~rate req/s for `seconds` (or until the `until` event is set)."""
+    latencies = []
+    interval  = 1.0 / rate
+    deadline  = time.perf_counter() + seconds
+    with ThreadPoolExecutor(max_workers=clients) as pool:
+        futures = []
+        nxt = time.perf_counter()
+        while time.perf_counter() < deadline and not (until and until.is_set()):
+            futures.append(pool.submit(_timed_predict, url))
+            nxt += interval
+            time.sleep(max(0.0, nxt - time.perf_counter()))
+        for f in futures:
+            latencies.append(f.result())
+    return np.array(latencies)
+
+
+def report(label, lat):
+    if not len(lat):
+        print(f"  {label:<18} no samples")
+        return
+    p50, p95, p99 = np.percentile(lat, [50, 95, 99])
+    print(f"  {label:<18} n={len(lat):>6,}  p50 {p50:7.1f} ms  p95 {p95:7.1f} ms  "
+          f"p99 {p99:7.1f} ms  max {lat.max():7.1f} ms")
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__.split("\n")[1])
+    parser.add_argument("--url",           default="http://localhost:8000")
+    parser.add_argument("--train-samples", type=int, default=1_000_000)
+    parser.add_argument("--source",        default="synthetic", choices=["synthetic", "database"])
+    parser.add_argument("--baseline-s",    type=float, default=20)
+    parser.add_argument("--max-train-s",   type=float, default=1800)
+    parser.add_argument("--rate",          type=float, default=50, help="requests per second")
+    parser.add_argument("--clients",       type=int,   default=8)
+    args = parser.parse_args()
+
+    print(f"🏁  Baseline: {args.rate:.0f} req/s for {args.baseline_s:.0f}s")
+    baseline = measure(args.url, args.baseline_s, args.rate, args.clients)
+
+    done  = threading.Event()
+    state = {}
+
+    def train():
+        t0 = time.perf_counter()
+        try:
+            body = json.dumps({"n_samples": args.train_samples, "source": args.source}).encode()
+            state["result"] = json.loads(_post(f"{args.url}/train", body, timeout=args.max_train_s))
+        except Exception as e:
+            state["error"] = str(e)
+        state["seconds"] = time.perf_counter() - t0
+        done.set()
+
+    print(f"🌳  Training on {args.train_samples:,} {args.source} rows while quoting...")
+    threading.Thread(target=train, daemon=True).start()
+    during = measure(args.url, args.max_train_s, args.rate, args.clients, until=done)
+    done.wait()
+
+    print()
+    report("idle", baseline)
+    report("during training", during)
+    if "error" in state:
+        print(f"\n❌  Training failed after {state['seconds']:.0f}s: {state['error']}")
+    else:
+        print(f"\n✅  Training finished in {state['seconds']:.0f}s — "
+              f"accuracy {state['result']['classification_accuracy']}")
+
+
+if __name__ == "__main__":
+    main()
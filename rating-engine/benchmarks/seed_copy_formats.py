@@ -0,0 +1,114 @@
+#!/usr/bin/env python3
+"""
+seed_copy_formats.py
+====================
+Text vs binary COPY for the seeder: a round-trip correctness check, then
+client encode time and server COPY time per format.
+
+    python benchmarks/seed_copy_formats.py                 # 200k rows, 3 repeats
+    python benchmarks/seed_copy_formats.py --rows 500000 --check-only
+
+Both formats load the same generated batch into temporary copies of
+japan_auto_policies (no indexes, no triggers), so server time is COPY
+input parsing plus heap insertion. The check requires the two loads to
+be identical row for row, and the binary load to match the generated
+columns exactly. Needs the .env database (any with 001 applied).
+"""
+
+import argparse
+import io
+import sys
+import time
+from pathlib import Path
+
+import numpy as np
+
+sys.path.insert(0, str(Path(__file__).parent.parent / "db" / "seeds"))
+
+from seed_policies import (generate_columns, to_copy_text, to_copy_binary,
+                           COPY_COLUMNS, VOCAB, _connect)
+
+ENCODERS = {"text": to_copy_text, "binary": to_copy_binary}
+
+
+def load(conn, table: str, fmt: str, data: bytes) -> float:
+    with conn.cursor() as cur:
+        cur.execute(f"TRUNCATE {table}")
+        t0 = time.perf_counter()
+        if fmt == "binary":
+            cur.copy_expert(f"COPY {table} ({COPY_COLUMNS}) FROM STDIN (FORMAT binary)",
+                            io.BytesIO(data))
+        else:
+            cur.copy_from(io.BytesIO(data), table, columns=COPY_COLUMNS.split(","), sep="\t")
+        return time.perf_counter() - t0
+
+
+def check(conn, cols: dict):
+    with conn.cursor() as cur:
+        # created_at is a column default, different per load
+        diff = "SELECT COUNT(*) FROM (SELECT {c} FROM {a} EXCEPT ALL SELECT {c} FROM {b}) d"
+        cur.execute(diff.format(c=COPY_COLUMNS, a="seed_text", b="seed_binary"))
+        extra_text = cur.fetchone()[0]
+        cur.execute(diff.format(c=COPY_COLUMNS, a="seed_binary", b="seed_text"))
+        extra_binary = cur.fetchone()[0]
+        if extra_text or extra_binary:
+            sys.exit(f"❌  text and binary loads differ ({extra_text} / {extra_binary} rows)")
+
+        cur.execute(f"SELECT {COPY_COLUMNS} FROM seed_binary ORDER BY policy_number")
+        rows = cur.fetchall()
+    order = np.argsort(cols["policy_index"], kind="stable")
+    for j, name in enumerate(COPY_COLUMNS.split(",")):
+        got = [r[j] for r in rows]
+        if name == "policy_number":
+            want = [f"JP{i:015d}" for i in cols["policy_index"][order]]
+        elif name in VOCAB:
+            want = [VOCAB[name][c] for c in cols[name][order]]
+        elif name == "start_date":
+            want = cols[name][order].astype(object).tolist()
+        else:
+            want = cols[name][order].tolist()
+        if got != want:
+            bad = next(i for i, (g, w) in enumerate(zip(got, want)) if g != w)
+            sys.exit(f"❌  {name} differs at row {bad}: {got[bad]!r} != {want[bad]!r}")
+    print(f"✅  Round trip OK: {len(rows):,} rows identical in text and binary, "
+          f"binary matches the generated columns")
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__.split("\n")[3])
+    parser.add_argument("--rows",       type=int, default=200_000)
+    parser.add_argument("--repeats",    type=int, default=3)
+    parser.add_argument("--check-only", action="store_true")
+    args = parser.parse_args()
+
+    cols = generate_columns(7, args.rows, 7 * 7919)
+    data = {fmt: enc(cols) for fmt, enc in ENCODERS.items()}
+
+    conn = _connect()
+    conn.autocommit = True
+    with conn.cursor() as cur:
+        for fmt in ENCODERS:
+            cur.execute(f"CREATE TEMP TABLE seed_{fmt} "
+                        "(LIKE japan_auto_policies INCLUDING DEFAULTS INCLUDING GENERATED)")
+    for fmt in ENCODERS:
+        load(conn, f"seed_{fmt}", fmt, data[fmt])
+    check(conn, cols)
+    if args.check_only:
+        return
+
+    print(f"\n{'format':>8} {'MB':>7} {'encode s':>9} {'COPY s':>8} {'client rows/s':>14} {'server rows/s':>14}")
+    for fmt, enc in ENCODERS.items():
+        enc_t, copy_t = [], []
+        for _ in range(args.repeats):
+            t0 = time.perf_counter()
+            enc(cols)
+            enc_t.append(time.perf_counter() - t0)
+            copy_t.append(load(conn, f"seed_{fmt}", fmt, data[fmt]))
+        e, c = min(enc_t), min(copy_t)
+        print(f"{fmt:>8} {len(data[fmt]) / 1e6:>7,.1f} {e:>9.2f} {c:>8.2f} "
+              f"{args.rows / e:>14,.0f} {args.rows / c:>14,.0f}")
+    conn.close()
+
+
+if __name__ == "__main__":
+    main()
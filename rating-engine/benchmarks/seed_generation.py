@@ -0,0 +1,45 @@
+#!/usr/bin/env python3
+"""
+seed_generation.py
+==================
+Per-core throughput of db/seeds/seed_policies.generate_batch in rows/s:
+one process synthesizing COPY-ready batches, no database involved.
+
+    python benchmarks/seed_generation.py --sizes 100000 500000
+    python benchmarks/seed_generation.py --repeats 5
+    python benchmarks/seed_generation.py --format binary
+
+The seeder runs one such process per core, so total generation
+throughput is roughly this figure × --workers.
+"""
+
+import argparse
+import sys
+import time
+from pathlib import Path
+
+sys.path.insert(0, str(Path(__file__).parent.parent / "db" / "seeds"))
+
+from seed_policies import generate_batch
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__.split("\n")[3])
+    parser.add_argument("--sizes",   type=int, nargs="+", default=[100_000, 500_000])
+    parser.add_argument("--repeats", type=int, default=3)
+    parser.add_argument("--format",  choices=["text", "binary"], default="text")
+    args = parser.parse_args()
+
+    print(f"{'rows':>10} {'best s':>8} {'rows/s/core':>12} {'MB out':>8}")
+    for n in args.sizes:
+        times = []
+        for r in range(args.repeats):
+            t0   = time.perf_counter()
+            _, data = generate_batch((r, n, r * 7919, args.format))
+            times.append(time.perf_counter() - t0)
+        best = min(times)
+        print(f"{n:>10,} {best:>8.2f} {n / best:>12,.0f} {len(data) / 1e6:>8,.1f}")
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,58 @@
+#!/usr/bin/env python3
+"""
+synthetic_generation.py
+=======================
+Throughput of ml/data_generator.generate_auto_insurance_data in rows/s,
+with the in-memory size of the resulting frame.
+
+    python benchmarks/synthetic_generation.py --sizes 100000 1000000 5000000
+    python benchmarks/synthetic_generation.py --excel      # Excel-anchored premiums
+
+With --excel the per-row Excel-chain pricing (excel_calculate_premiums)
+is also timed on its own.
+"""
+
+import argparse
+import sys
+import time
+from pathlib import Path
+
+sys.path.insert(0, str(Path(__file__).parent.parent))
+
+from ml.data_generator import generate_auto_insurance_data
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__.split("\n")[3])
+    parser.add_argument("--sizes",   type=int, nargs="+", default=[100_000, 1_000_000, 5_000_000])
+    parser.add_argument("--repeats", type=int, default=3)
+    parser.add_argument("--excel",   action="store_true", help="price with the Excel manual")
+    args = parser.parse_args()
+
+    ef = None
+    if args.excel:
+        from ml.excel_reader import load_all_factors, EXCEL_PATH
+        ef = load_all_factors(EXCEL_PATH)
+
+    print(f"{'rows':>10} {'best s':>8} {'rows/s':>12} {'frame MB':>9}"
+          + (f" {'chain rows/s':>13}" if ef else ""))
+    for n in args.sizes:
+        times = []
+        for _ in range(args.repeats):
+            t0 = time.perf_counter()
+            df = generate_auto_insurance_data(n, excel_factors=ef)
+            times.append(time.perf_counter() - t0)
+        best = min(times)
+        mb   = df.memory_usage(deep=True).sum() / 1e6
+        line = f"{n:>10,} {best:>8.2f} {n / best:>12,.0f} {mb:>9,.0f}"
+        if ef:
+            from ml.excel_reader import excel_calculate_premiums
+            t0 = time.perf_counter()
+            excel_calculate_premiums(df, ef)
+            line += f" {n / (time.perf_counter() - t0):>13,.0f}"
+        print(line)
+        del df
+
+
+if __name__ == "__main__":
+    main()
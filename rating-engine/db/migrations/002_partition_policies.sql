@@ -0,0 +1,272 @@
+-- =====================================================================
+-- 002_partition_policies.sql
+-- Range-partition japan_auto_policies by policy_year (one partition/year)
+--
+-- Year-filtered queries, TABLESAMPLE, VACUUM and index maintenance then
+-- touch only the partitions involved, and a new year is a new partition:
+-- history is never rewritten.
+--
+-- How to run (after 001; every step is safe to re-run):
+--   psql -U postgres -d insurance_poc -f 002_partition_policies.sql
+--   psql -U postgres -d insurance_poc -c "CALL migrate_policies_copy()"
+--   psql -U postgres -d insurance_poc -c "CALL migrate_policies_swap()"
+--   -- verify, then reclaim the space:
+--   --   DROP TABLE japan_auto_policies_unpartitioned;
+--
+-- migrate_policies_copy() copies the live table into the partitioned one
+-- in policy_id batches, committing after each, while the application
+-- keeps reading and writing the old table. Interrupt and re-run it at
+-- any time; it resumes after the highest policy_id already copied.
+-- migrate_policies_swap() takes a write lock on the old table, copies
+-- rows inserted since, and swaps the names in one transaction. Ids are
+-- not committed in order (parallel or sharded seeders write explicit
+-- ids, ledger gaps are refilled later), so besides the ids above the
+-- copied maximum it copies every row whose policy_id is still missing —
+-- one anti-join scan of both tables under the lock — and refuses to swap
+-- unless both tables then hold the same number of rows (a mismatch
+-- means rows were deleted from the old table after they were copied).
+-- The old heap is kept as japan_auto_policies_unpartitioned. If 003 has
+-- already run, the swap moves trg_prefecture_stats to the new table and
+-- does not recreate mv_prefecture_stats; otherwise it recreates and
+-- refreshes the view.
+--
+-- Differences from 001:
+--   • PRIMARY KEY (policy_id, policy_year) and UNIQUE (policy_number,
+--     policy_year): unique constraints on a partitioned table must contain
+--     the partition key. policy_id stays globally unique via its sequence.
+--   • No idx_polyr_year — partition pruning replaces it.
+--   • No upper bound on policy_year: a year without a partition is
+--     rejected until one is added, e.g. SELECT add_policy_year_partition(2026);
+--     or load it into a standalone table and ATTACH PARTITION (with a
+--     matching CHECK constraint the attach skips the validation scan).
+-- =====================================================================
+
+-- ── New partitions ────────────────────────────────────────────────────
+-- parent is resolved per call: a REGCLASS default would be bound to the
+-- table's OID at CREATE FUNCTION time and follow it through the swap
+DROP FUNCTION IF EXISTS add_policy_year_partition(INT, REGCLASS);
+CREATE OR REPLACE FUNCTION add_policy_year_partition(
+    yr     INT,
+    parent TEXT DEFAULT 'japan_auto_policies'
+) RETURNS TEXT LANGUAGE plpgsql AS $$
+DECLARE
+    part TEXT := format('japan_auto_policies_y%s', yr);
+BEGIN
+    EXECUTE format('CREATE TABLE IF NOT EXISTS %I PARTITION OF %s FOR VALUES FROM (%s) TO (%s)',
+                   part, parent::regclass, yr, yr + 1);
+    RETURN part;
+END $$;
+
+-- ── Partitioned copy of the table (staging name until the swap) ───────
+DO $$
+BEGIN
+    IF (SELECT relkind FROM pg_class WHERE oid = to_regclass('japan_auto_policies')) = 'p'
+       OR to_regclass('japan_auto_policies_partitioned') IS NOT NULL THEN
+        RETURN;     -- already migrated, or staging table exists
+    END IF;
+
+    CREATE TABLE japan_auto_policies_partitioned (
+        LIKE japan_auto_policies INCLUDING DEFAULTS INCLUDING GENERATED INCLUDING CONSTRAINTS
+    ) PARTITION BY RANGE (policy_year);
+
+    ALTER TABLE japan_auto_policies_partitioned
+        DROP CONSTRAINT IF EXISTS japan_auto_policies_policy_year_check,
+        ADD CONSTRAINT japan_auto_policies_partitioned_pkey PRIMARY KEY (policy_id, policy_year),
+        ADD CONSTRAINT japan_auto_policies_partitioned_policy_number_key
+            UNIQUE (policy_number, policy_year);
+
+    PERFORM add_policy_year_partition(y, 'japan_auto_policies_partitioned')
+    FROM generate_series(2000, 2025) AS y;
+END $$;
+
+-- ── Online, resumable copy ────────────────────────────────────────────
+CREATE OR REPLACE PROCEDURE migrate_policies_copy(batch_rows INT DEFAULT 1000000)
+LANGUAGE plpgsql AS $$
+DECLARE
+    done  BIGINT;
+    n     BIGINT;
+    total BIGINT := 0;
+BEGIN
+    IF to_regclass('japan_auto_policies_partitioned') IS NULL THEN
+        RAISE NOTICE 'Nothing to copy (already swapped, or staging table missing)';
+        RETURN;
+    END IF;
+
+    LOOP
+        SELECT COALESCE(MAX(policy_id), 0) INTO done FROM japan_auto_policies_partitioned;
+        CALL _copy_policies_after(done, batch_rows, n);
+        total := total + n;
+        COMMIT;
+        EXIT WHEN n = 0;
+        RAISE NOTICE 'Copied % rows (up to policy_id > %)', total, done;
+    END LOOP;
+
+    -- secondary indexes are built once, after the bulk of the copy; later
+    -- runs only maintain them. Created on the parent, they cascade to every
+    -- current and future partition.
+    CREATE INDEX IF NOT EXISTS idx_polyp_pref      ON japan_auto_policies_partitioned (prefecture_code);
+    CREATE INDEX IF NOT EXISTS idx_polyp_ncd       ON japan_auto_policies_partitioned (ncd_grade);
+    CREATE INDEX IF NOT EXISTS idx_polyp_tier      ON japan_auto_policies_partitioned (risk_tier);
+    CREATE INDEX IF NOT EXISTS idx_polyp_prem      ON japan_auto_policies_partitioned (annual_premium_jpy);
+    CREATE INDEX IF NOT EXISTS idx_polyp_claim     ON japan_auto_policies_partitioned (had_claim) WHERE had_claim = TRUE;
+    CREATE INDEX IF NOT EXISTS idx_polyp_year_pref ON japan_auto_policies_partitioned (policy_year, prefecture_code);
+    COMMIT;
+    ANALYZE japan_auto_policies_partitioned;
+END $$;
+
+CREATE OR REPLACE PROCEDURE _copy_policies_after(after_id BIGINT, batch_rows INT, INOUT n BIGINT)
+LANGUAGE plpgsql AS $$
+BEGIN
+    -- every stored column except the GENERATED ones (end_date, monthly_premium_jpy)
+    INSERT INTO japan_auto_policies_partitioned (
+        policy_id, policy_number, policy_year, start_date,
+        ncd_grade, age_condition, prefecture_code, vehicle_rating_class, driver_restriction,
+        annual_km_band, annual_km, driver_age, years_licensed, num_accidents_5yr, num_violations_5yr,
+        driver_gender, is_first_car,
+        vehicle_make, vehicle_model, vehicle_year, engine_cc, fuel_type, is_kei_car,
+        bi_premium, pd_premium, vehicle_premium, passenger_premium, annual_premium_jpy,
+        risk_tier, had_claim, num_claims, total_claim_amount_jpy, created_at)
+    SELECT
+        policy_id, policy_number, policy_year, start_date,
+        ncd_grade, age_condition, prefecture_code, vehicle_rating_class, driver_restriction,
+        annual_km_band, annual_km, driver_age, years_licensed, num_accidents_5yr, num_violations_5yr,
+        driver_gender, is_first_car,
+        vehicle_make, vehicle_model, vehicle_year, engine_cc, fuel_type, is_kei_car,
+        bi_premium, pd_premium, vehicle_premium, passenger_premium, annual_premium_jpy,
+        risk_tier, had_claim, num_claims, total_claim_amount_jpy, created_at
+    FROM japan_auto_policies
+    WHERE policy_id > after_id
+    ORDER BY policy_id
+    LIMIT batch_rows;
+    GET DIAGNOSTICS n = ROW_COUNT;
+END $$;
+
+-- rows below the copied maximum that committed after their neighbours
+CREATE OR REPLACE PROCEDURE _copy_policies_missing(INOUT n BIGINT)
+LANGUAGE plpgsql AS $$
+BEGIN
+    INSERT INTO japan_auto_policies_partitioned (
+        policy_id, policy_number, policy_year, start_date,
+        ncd_grade, age_condition, prefecture_code, vehicle_rating_class, driver_restriction,
+        annual_km_band, annual_km, driver_age, years_licensed, num_accidents_5yr, num_violations_5yr,
+        driver_gender, is_first_car,
+        vehicle_make, vehicle_model, vehicle_year, engine_cc, fuel_type, is_kei_car,
+        bi_premium, pd_premium, vehicle_premium, passenger_premium, annual_premium_jpy,
+        risk_tier, had_claim, num_claims, total_claim_amount_jpy, created_at)
+    SELECT
+        policy_id, policy_number, policy_year, start_date,
+        ncd_grade, age_condition, prefecture_code, vehicle_rating_class, driver_restriction,
+        annual_km_band, annual_km, driver_age, years_licensed, num_accidents_5yr, num_violations_5yr,
+        driver_gender, is_first_car,
+        vehicle_make, vehicle_model, vehicle_year, engine_cc, fuel_type, is_kei_car,
+        bi_premium, pd_premium, vehicle_premium, passenger_premium, annual_premium_jpy,
+        risk_tier, had_claim, num_claims, total_claim_amount_jpy, created_at
+    FROM japan_auto_policies s
+    WHERE NOT EXISTS (SELECT 1 FROM japan_auto_policies_partitioned p
+                      WHERE p.policy_id = s.policy_id);
+    GET DIAGNOSTICS n = ROW_COUNT;
+END $$;
+
+-- ── Swap (write lock on the old table) ────────────────────────────────
+CREATE OR REPLACE PROCEDURE migrate_policies_swap()
+LANGUAGE plpgsql AS $$
+DECLARE
+    done   BIGINT;
+    n      BIGINT;
+    n_old  BIGINT;
+    n_new  BIGINT;
+    idx    TEXT;
+    stats  BOOLEAN := to_regclass('prefecture_stats') IS NOT NULL;
+BEGIN
+    IF to_regclass('japan_auto_policies_partitioned') IS NULL THEN
+        RAISE NOTICE 'Nothing to swap (already partitioned, or staging table missing)';
+        RETURN;
+    END IF;
+
+    -- readers continue; writers wait for the swap
+    LOCK TABLE japan_auto_policies IN EXCLUSIVE MODE;
+    LOOP
+        SELECT COALESCE(MAX(policy_id), 0) INTO done FROM japan_auto_policies_partitioned;
+        CALL _copy_policies_after(done, 1000000, n);
+        EXIT WHEN n = 0;
+    END LOOP;
+    CALL _copy_policies_missing(n);
+    IF n > 0 THEN
+        RAISE NOTICE 'Copied % rows committed below the copied policy_id maximum', n;
+    END IF;
+
+    SELECT COUNT(*) INTO n_old FROM japan_auto_policies;
+    SELECT COUNT(*) INTO n_new FROM japan_auto_policies_partitioned;
+    IF n_old <> n_new THEN
+        RAISE EXCEPTION 'japan_auto_policies has % rows but the partitioned copy has %; '
+                        'not swapping (rows deleted after the copy?)', n_old, n_new;
+    END IF;
+
+    -- the materialized view is bound to the old table; recreated below
+    -- unless 003 already replaced it with prefecture_stats, whose trigger
+    -- would follow the old table through the rename: moved below instead
+    DROP MATERIALIZED VIEW IF EXISTS mv_prefecture_stats;
+    DROP TRIGGER IF EXISTS trg_prefecture_stats ON japan_auto_policies;
+
+    ALTER TABLE japan_auto_policies RENAME TO japan_auto_policies_unpartitioned;
+    ALTER TABLE japan_auto_policies_unpartitioned
+        RENAME CONSTRAINT japan_auto_policies_pkey TO japan_auto_policies_unpartitioned_pkey;
+    ALTER TABLE japan_auto_policies_unpartitioned
+        RENAME CONSTRAINT japan_auto_policies_policy_number_key
+                       TO japan_auto_policies_unpartitioned_policy_number_key;
+    FOREACH idx IN ARRAY ARRAY['year', 'pref', 'ncd', 'tier', 'prem', 'claim', 'year_pref'] LOOP
+        EXECUTE format('ALTER INDEX IF EXISTS %I RENAME TO %I',
+                       'idx_polyr_' || idx, 'idx_polyr_' || idx || '_unpartitioned');
+    END LOOP;
+
+    ALTER TABLE japan_auto_policies_partitioned RENAME TO japan_auto_policies;
+    ALTER TABLE japan_auto_policies
+        RENAME CONSTRAINT japan_auto_policies_partitioned_pkey TO japan_auto_policies_pkey;
+    ALTER TABLE japan_auto_policies
+        RENAME CONSTRAINT japan_auto_policies_partitioned_policy_number_key
+                       TO japan_auto_policies_policy_number_key;
+    FOREACH idx IN ARRAY ARRAY['pref', 'ncd', 'tier', 'prem', 'claim', 'year_pref'] LOOP
+        EXECUTE format('ALTER INDEX IF EXISTS %I RENAME TO %I',
+                       'idx_polyp_' || idx, 'idx_polyr_' || idx);
+    END LOOP;
+
+    -- keep the id sequence when the old table is dropped
+    ALTER SEQUENCE japan_auto_policies_policy_id_seq OWNED BY japan_auto_policies.policy_id;
+
+    COMMENT ON TABLE japan_auto_policies IS
+        'Japan auto insurance historical policies 2000-2025 (~80M rows), partitioned by policy_year. '
+        'Training source for Random Forest rating engine.';
+
+    IF stats THEN
+        -- every copied row was counted when it reached the old table
+        CREATE TRIGGER trg_prefecture_stats
+            AFTER INSERT ON japan_auto_policies
+            REFERENCING NEW TABLE AS new_policies
+            FOR EACH STATEMENT EXECUTE FUNCTION prefecture_stats_after_insert();
+        COMMIT;
+    ELSE
+        CREATE MATERIALIZED VIEW mv_prefecture_stats AS
+        SELECT
+            prefecture_code,
+            policy_year,
+            COUNT(*)                                            AS total_policies,
+            AVG(annual_premium_jpy)::INT                        AS avg_premium_jpy,
+            PERCENTILE_CONT(0.5) WITHIN GROUP
+                (ORDER BY annual_premium_jpy)::INT              AS median_premium_jpy,
+            ROUND(AVG(ncd_grade)::NUMERIC, 2)                  AS avg_ncd_grade,
+            ROUND(100.0 * SUM(had_claim::INT) / COUNT(*), 2)   AS claim_rate_pct
+        FROM japan_auto_policies
+        GROUP BY prefecture_code, policy_year
+        ORDER BY prefecture_code, policy_year
+        WITH NO DATA;
+        CREATE UNIQUE INDEX idx_mv_pref_year ON mv_prefecture_stats (prefecture_code, policy_year);
+
+        -- release the lock before the long-running parts
+        COMMIT;
+        REFRESH MATERIALIZED VIEW mv_prefecture_stats;
+        COMMIT;
+    END IF;
+    -- autovacuum never analyzes a partitioned parent; planner estimates and
+    -- pg_stats for the parent (db_loader's stratum shares) need this
+    ANALYZE japan_auto_policies;
+END $$;
@@ -0,0 +1,170 @@
+-- =====================================================================
+-- 003_prefecture_stats.sql
+-- Incrementally maintained prefecture × year statistics
+--
+-- Replaces mv_prefecture_stats, whose REFRESH rescans all ~80M rows.
+-- prefecture_stats keeps mergeable aggregates per (prefecture_code,
+-- policy_year): counts and sums for the averages and claim rate, and a
+-- fixed-bin premium histogram for the median. A statement-level trigger
+-- folds every inserted batch (INSERT or COPY) into it, reading only the
+-- batch's rows. v_prefecture_stats serves the columns of the old view.
+--
+-- The histogram has ¥1,000 bins over [¥0, ¥1,000,000] (premiums outside
+-- go to the end bins), identical to ml/sketch.HistogramSketch(0, 1_000_000,
+-- 1_000): the median is exact to within one bin. Bin layout must match
+-- PREMIUM_HIST in ml/prefecture_stats.py.
+--
+-- The policy table is insert-only; after UPDATEs or DELETEs, or to
+-- reconcile, rebuild with:  SELECT rebuild_prefecture_stats();
+--
+-- How to run (after 001; before or after 002's swap if you partition —
+-- the trigger is attached to whichever table is japan_auto_policies now,
+-- and migrate_policies_swap() moves it to the partitioned table):
+--   psql -U postgres -d insurance_poc -f 003_prefecture_stats.sql
+-- The first run backfills from the existing rows (one scan).
+-- =====================================================================
+
+CREATE TABLE IF NOT EXISTS prefecture_stats (
+    prefecture_code     CHAR(2)     NOT NULL,
+    policy_year         SMALLINT    NOT NULL,
+    total_policies      BIGINT      NOT NULL DEFAULT 0,
+    sum_premium_jpy     BIGINT      NOT NULL DEFAULT 0,
+    sum_ncd_grade       BIGINT      NOT NULL DEFAULT 0,
+    claim_count         BIGINT      NOT NULL DEFAULT 0,
+    premium_hist        INT[]       NOT NULL,       -- 1,001 bins of ¥1,000
+    updated_at          TIMESTAMPTZ NOT NULL DEFAULT NOW(),
+    PRIMARY KEY (prefecture_code, policy_year)
+);
+
+-- ── Histogram helpers ─────────────────────────────────────────────────
+-- bin of a premium
+CREATE OR REPLACE FUNCTION premium_hist_bin(premium INT) RETURNS INT
+LANGUAGE SQL IMMUTABLE PARALLEL SAFE AS $$
+    SELECT LEAST(GREATEST(premium, 0), 1000000) / 1000
+$$;
+
+-- dense histogram from sparse (bin, count) pairs
+CREATE OR REPLACE FUNCTION premium_hist_dense(bins INT[], counts BIGINT[]) RETURNS INT[]
+LANGUAGE SQL IMMUTABLE PARALLEL SAFE AS $$
+    SELECT array_agg(COALESCE(u.c, 0)::INT ORDER BY g)
+    FROM generate_series(0, 1000) AS g
+    LEFT JOIN unnest(bins, counts) AS u(b, c) ON u.b = g
+$$;
+
+-- element-wise sum: merging two histograms
+CREATE OR REPLACE FUNCTION premium_hist_merge(a INT[], b INT[]) RETURNS INT[]
+LANGUAGE SQL IMMUTABLE PARALLEL SAFE AS $$
+    SELECT array_agg(COALESCE(x, 0) + COALESCE(y, 0) ORDER BY i)
+    FROM unnest(a, b) WITH ORDINALITY AS t(x, y, i)
+$$;
+
+-- quantile q in [0, 1], interpolated inside the bin (HistogramSketch.quantiles)
+CREATE OR REPLACE FUNCTION premium_hist_quantile(hist INT[], q FLOAT8) RETURNS INT
+LANGUAGE plpgsql IMMUTABLE PARALLEL SAFE AS $$
+DECLARE
+    n    BIGINT := (SELECT SUM(c) FROM unnest(hist) AS c);
+    rank FLOAT8;
+    cum  BIGINT := 0;
+BEGIN
+    IF n IS NULL OR n = 0 THEN
+        RETURN NULL;
+    END IF;
+    rank := q * (n - 1);
+    FOR i IN 1 .. array_length(hist, 1) LOOP
+        IF cum + hist[i] > rank THEN
+            RETURN LEAST(((i - 1) + (rank - cum + 0.5) / hist[i]) * 1000, 1000000)::INT;
+        END IF;
+        cum := cum + hist[i];
+    END LOOP;
+    RETURN 1000000;
+END $$;
+
+-- ── Fold a set of policy rows into prefecture_stats ───────────────────
+-- Rows are upserted in key order so concurrent batches lock them in the
+-- same order and cannot deadlock.
+CREATE OR REPLACE FUNCTION prefecture_stats_after_insert() RETURNS TRIGGER
+LANGUAGE plpgsql AS $$
+BEGIN
+    INSERT INTO prefecture_stats AS s
+        (prefecture_code, policy_year, total_policies, sum_premium_jpy,
+         sum_ncd_grade, claim_count, premium_hist)
+    SELECT prefecture_code, policy_year, SUM(n), SUM(premium), SUM(ncd), SUM(claims),
+           premium_hist_dense(array_agg(bin), array_agg(n))
+    FROM (
+        SELECT prefecture_code, policy_year, premium_hist_bin(annual_premium_jpy) AS bin,
+               COUNT(*)                  AS n,
+               SUM(annual_premium_jpy)   AS premium,
+               SUM(ncd_grade)            AS ncd,
+               SUM(had_claim::INT)       AS claims
+        FROM new_policies
+        GROUP BY 1, 2, 3
+    ) per_bin
+    GROUP BY prefecture_code, policy_year
+    ORDER BY prefecture_code, policy_year
+    ON CONFLICT (prefecture_code, policy_year) DO UPDATE SET
+        total_policies  = s.total_policies  + EXCLUDED.total_policies,
+        sum_premium_jpy = s.sum_premium_jpy + EXCLUDED.sum_premium_jpy,
+        sum_ncd_grade   = s.sum_ncd_grade   + EXCLUDED.sum_ncd_grade,
+        claim_count     = s.claim_count     + EXCLUDED.claim_count,
+        premium_hist    = premium_hist_merge(s.premium_hist, EXCLUDED.premium_hist),
+        updated_at      = NOW();
+    RETURN NULL;
+END $$;
+
+DROP TRIGGER IF EXISTS trg_prefecture_stats ON japan_auto_policies;
+CREATE TRIGGER trg_prefecture_stats
+    AFTER INSERT ON japan_auto_policies
+    REFERENCING NEW TABLE AS new_policies
+    FOR EACH STATEMENT EXECUTE FUNCTION prefecture_stats_after_insert();
+
+-- ── Full rebuild (backfill / reconcile) ───────────────────────────────
+CREATE OR REPLACE FUNCTION rebuild_prefecture_stats() RETURNS BIGINT
+LANGUAGE plpgsql AS $$
+DECLARE
+    built BIGINT;
+BEGIN
+    -- block writers so no batch is counted twice or missed
+    LOCK TABLE japan_auto_policies IN SHARE MODE;
+    LOCK TABLE prefecture_stats IN EXCLUSIVE MODE;
+    DELETE FROM prefecture_stats;
+    -- same aggregation as prefecture_stats_after_insert, over every row
+    INSERT INTO prefecture_stats
+        (prefecture_code, policy_year, total_policies, sum_premium_jpy,
+         sum_ncd_grade, claim_count, premium_hist)
+    SELECT prefecture_code, policy_year, SUM(n), SUM(premium), SUM(ncd), SUM(claims),
+           premium_hist_dense(array_agg(bin), array_agg(n))
+    FROM (
+        SELECT prefecture_code, policy_year, premium_hist_bin(annual_premium_jpy) AS bin,
+               COUNT(*)                  AS n,
+               SUM(annual_premium_jpy)   AS premium,
+               SUM(ncd_grade)            AS ncd,
+               SUM(had_claim::INT)       AS claims
+        FROM japan_auto_policies
+        GROUP BY 1, 2, 3
+    ) per_bin
+    GROUP BY prefecture_code, policy_year;
+    GET DIAGNOSTICS built = ROW_COUNT;
+    RETURN built;
+END $$;
+
+DO $$
+BEGIN
+    IF NOT EXISTS (SELECT 1 FROM prefecture_stats) THEN
+        PERFORM rebuild_prefecture_stats();
+    END IF;
+END $$;
+
+-- ── Same columns as the old materialized view, no base-table scan ─────
+DROP MATERIALIZED VIEW IF EXISTS mv_prefecture_stats;
+
+CREATE OR REPLACE VIEW v_prefecture_stats AS
+SELECT
+    prefecture_code,
+    policy_year,
+    total_policies,
+    (sum_premium_jpy::NUMERIC / NULLIF(total_policies, 0))::INT               AS avg_premium_jpy,
+    premium_hist_quantile(premium_hist, 0.5)                                   AS median_premium_jpy,
+    ROUND(sum_ncd_grade::NUMERIC / NULLIF(total_policies, 0), 2)              AS avg_ncd_grade,
+    ROUND(100.0 * claim_count / NULLIF(total_policies, 0), 2)                 AS claim_rate_pct
+FROM prefecture_stats
+ORDER BY prefecture_code, policy_year;
@@ -0,0 +1,202 @@
+"""
+bulk_load.py
+============
+Bulk-load mode for seed_policies.py (--bulk-load): load japan_auto_policies
+without per-row index and trigger maintenance, then restore the schema.
+
+prepare_bulk_load()
+    Records every secondary index, unique constraint and enabled user
+    trigger of the table (definitions from the catalog, so the plain 001
+    table and the partitioned 002 table are both covered) in the
+    seed_bulk_load table, then drops the indexes and constraints and
+    disables the triggers — all in one transaction. With unlogged=True the
+    table (or each partition) and the seed_batches ledger (ledger.py) are
+    also switched to UNLOGGED, skipping WAL for the load; on a non-empty
+    table this rewrites it once.
+
+finish_bulk_load()
+    Restores what seed_bulk_load lists: SET LOGGED first (it rewrites the
+    table, so before any index exists), unique constraints, then the
+    plain indexes in parallel — one connection per index, each also using
+    parallel maintenance workers — then re-enables the triggers and
+    rebuilds prefecture_stats once (003_prefecture_stats.sql). Every step
+    is idempotent and seed_bulk_load is dropped last, so an interrupted
+    load or finish is completed by the next run (with or without
+    --bulk-load). The seeder ANALYZEs afterwards.
+
+The primary key stays in place throughout.
+
+Configuration (.env):
+    BULK_MAINTENANCE_WORK_MEM   maintenance_work_mem per index build (default 1GB)
+"""
+
+import os
+import re
+import time
+from concurrent.futures import ThreadPoolExecutor
+
+from ledger import LEDGER_TABLE
+
+TABLE                     = "japan_auto_policies"
+STATE_TABLE               = "seed_bulk_load"
+BULK_MAINTENANCE_WORK_MEM = os.getenv("BULK_MAINTENANCE_WORK_MEM", "1GB")
+
+STATE_SQL = f"""
+    CREATE TABLE {STATE_TABLE} (
+        kind        TEXT NOT NULL,      -- index | constraint | trigger | unlogged
+        name        TEXT NOT NULL,
+        definition  TEXT NOT NULL,
+        PRIMARY KEY (kind, name)
+    )
+"""
+
+# secondary indexes not backing a constraint, and non-primary constraints
+INDEXES_SQL = """
+    SELECT c.relname, pg_get_indexdef(i.indexrelid)
+    FROM pg_index i JOIN pg_class c ON c.oid = i.indexrelid
+    WHERE i.indrelid = %s::regclass AND NOT i.indisprimary
+      AND NOT EXISTS (SELECT 1 FROM pg_constraint k WHERE k.conindid = i.indexrelid
+                                                      AND k.conrelid = i.indrelid)
+"""
+CONSTRAINTS_SQL = """
+    SELECT conname, pg_get_constraintdef(oid)
+    FROM pg_constraint
+    WHERE conrelid = %s::regclass AND contype IN ('u', 'x')
+"""
+TRIGGERS_SQL = """
+    SELECT tgname, '' FROM pg_trigger
+    WHERE tgrelid = %s::regclass AND NOT tgisinternal AND tgenabled <> 'D'
+"""
+# the table itself, or its partitions: a partitioned parent has no storage
+PERSISTENCE_SQL = """
+    SELECT c.oid::regclass::text, c.relpersistence FROM pg_class c
+    WHERE c.oid = %(t)s::regclass AND c.relkind = 'r'
+    UNION ALL
+    SELECT i.inhrelid::regclass::text, c.relpersistence
+    FROM pg_inherits i JOIN pg_class c ON c.oid = i.inhrelid
+    WHERE i.inhparent = %(t)s::regclass
+"""
+
+
+def _state_exists(cur) -> bool:
+    cur.execute("SELECT to_regclass(%s) IS NOT NULL", (STATE_TABLE,))
+    return cur.fetchone()[0]
+
+
+def bulk_load_pending(connect) -> bool:
+    """True if a bulk load was prepared and not yet finished."""
+    conn = connect()
+    try:
+        with conn.cursor() as cur:
+            return _state_exists(cur)
+    finally:
+        conn.close()
+
+
+def prepare_bulk_load(connect, unlogged: bool = False):
+    """Drop secondary indexes / constraints, disable triggers; no-op if already prepared."""
+    conn = connect()
+    try:
+        with conn.cursor() as cur:
+            if _state_exists(cur):
+                print("    Bulk load already prepared — resuming")
+                return
+            cur.execute(STATE_SQL)
+            saved = []
+            for kind, sql in (("index", INDEXES_SQL), ("constraint", CONSTRAINTS_SQL),
+                              ("trigger", TRIGGERS_SQL)):
+                cur.execute(sql, (TABLE,))
+                saved += [(kind, name, definition) for name, definition in cur.fetchall()]
+            if unlogged:
+                # the ledger goes with the table, so a crash truncates both
+                rels = []
+                for t in (TABLE, LEDGER_TABLE):
+                    cur.execute(PERSISTENCE_SQL, {"t": t})
+                    rels += cur.fetchall()
+                saved += [("unlogged", rel, "") for rel, persistence in rels
+                          if persistence == "p"]
+            cur.executemany(f"INSERT INTO {STATE_TABLE} VALUES (%s, %s, %s)", saved)
+
+            for kind, name, _ in saved:
+                if kind == "index":
+                    cur.execute(f'DROP INDEX "{name}"')
+                elif kind == "constraint":
+                    cur.execute(f'ALTER TABLE {TABLE} DROP CONSTRAINT "{name}"')
+                elif kind == "trigger":
+                    cur.execute(f'ALTER TABLE {TABLE} DISABLE TRIGGER "{name}"')
+                else:
+                    cur.execute(f"ALTER TABLE {name} SET UNLOGGED")
+        conn.commit()
+        counts = {k: sum(1 for s in saved if s[0] == k)
+                  for k in ("index", "constraint", "trigger", "unlogged")}
+        print(f"    Bulk load : dropped {counts['index']} indexes, {counts['constraint']} "
+              f"constraints; disabled {counts['trigger']} triggers; "
+              f"{counts['unlogged']} relations unlogged")
+    finally:
+        conn.close()
+
+
+def _create_index(connect, definition: str):
+    # pg_get_indexdef says ON ONLY for a partitioned parent; without ONLY the
+    # index is built on every partition and attached
+    sql = re.sub(r"^CREATE (UNIQUE )?INDEX ", r"CREATE \1INDEX IF NOT EXISTS ", definition)
+    sql = sql.replace(" ON ONLY ", " ON ", 1)
+    conn = connect()
+    conn.autocommit = True
+    try:
+        with conn.cursor() as cur:
+            cur.execute("SET maintenance_work_mem = %s", (BULK_MAINTENANCE_WORK_MEM,))
+            t0 = time.time()
+            cur.execute(sql)
+            return time.time() - t0
+    finally:
+        conn.close()
+
+
+def finish_bulk_load(connect, jobs: int = 4):
+    """Restore everything prepare_bulk_load() removed, in parallel where possible."""
+    conn = connect()
+    conn.autocommit = True
+    try:
+        with conn.cursor() as cur:
+            if not _state_exists(cur):
+                return
+            cur.execute(f"SELECT kind, name, definition FROM {STATE_TABLE} ORDER BY kind, name")
+            saved = cur.fetchall()
+
+            t0 = time.time()
+            for kind, name, _ in saved:
+                if kind == "unlogged":
+                    print(f"    SET LOGGED {name} ...")
+                    cur.execute(f"ALTER TABLE {name} SET LOGGED")
+
+            # unique constraints take an exclusive lock: one at a time, before
+            # the concurrent index builds
+            cur.execute("SET maintenance_work_mem = %s", (BULK_MAINTENANCE_WORK_MEM,))
+            for kind, name, definition in saved:
+                if kind == "constraint":
+                    cur.execute("SELECT 1 FROM pg_constraint WHERE conrelid = %s::regclass "
+                                "AND conname = %s", (TABLE, name))
+                    if cur.fetchone() is None:
+                        print(f"    Adding constraint {name} ...")
+                        cur.execute(f'ALTER TABLE {TABLE} ADD CONSTRAINT "{name}" {definition}')
+
+            indexes = [(name, d) for kind, name, d in saved if kind == "index"]
+            print(f"    Building {len(indexes)} indexes ({jobs} parallel) ...")
+            with ThreadPoolExecutor(max_workers=max(1, jobs)) as pool:
+                futures = {name: pool.submit(_create_index, connect, d) for name, d in indexes}
+                for name, f in futures.items():
+                    print(f"      {name:<32} {f.result():>7.1f}s")
+
+            for kind, name, _ in saved:
+                if kind == "trigger":
+                    cur.execute(f'ALTER TABLE {TABLE} ENABLE TRIGGER "{name}"')
+            if any(kind == "trigger" for kind, _, _ in saved):
+                cur.execute("SELECT to_regproc('rebuild_prefecture_stats') IS NOT NULL")
+                if cur.fetchone()[0]:
+                    print("    Rebuilding prefecture_stats ...")
+                    cur.execute("SELECT rebuild_prefecture_stats()")
+            cur.execute(f"DROP TABLE {STATE_TABLE}")
+            print(f"    Schema restored in {(time.time() - t0) / 60:.1f} min")
+    finally:
+        conn.close()
@@ -0,0 +1,131 @@
+"""
+ledger.py
+=========
+Checkpoint ledger for seed_policies.py: one row per committed batch,
+inserted in the same transaction as the batch's COPY, so a batch is in
+the ledger exactly when its rows are in japan_auto_policies.
+
+A batch is identified by its first policy index (policy_number
+JP<index>) and covers `rows` consecutive indexes; its RNG seed is
+derived from that index and its rows get policy_id = index + id_offset,
+so the same batch is identical whichever process or host writes it. Restarts read the ledger (one row per batch,
+~160 for 80M rows) and plan batches only over the index ranges not yet
+covered, so a failed batch is simply redone and a changed --batch or
+--rows stays exact.
+
+A table seeded before the ledger existed is adopted once: if its rows
+are exactly policy indexes 1..COUNT(*), that range is recorded as a
+single entry with seed -1. Its rows keep their sequence-assigned
+policy_ids; later batches are given id_offset = MAX(policy_id) - COUNT(*)
+so their explicit ids start above them. A fresh table has id_offset 0.
+
+Batches live on a fixed grid of --batch indexes: grid cell k covers
+k*batch+1 .. (k+1)*batch, and with --shard i/N a process owns the cells
+with k % N == i-1. Shards sharing --rows and --batch therefore write
+disjoint policy ranges whose union is exactly a single-process run.
+
+Because ids are explicit, a refilled gap or a slower shard commits ids
+below rows that are already committed. Id watermarks (training, refresh,
+snapshot sync) therefore stop before the first index range missing from
+the ledger (ml/db_loader.get_policy_watermark) and move past it once the
+range is loaded; an abandoned run holds them there until it is resumed.
+
+With seed_policies.py --bulk-load --unlogged the ledger is UNLOGGED for
+the load along with the policy table (bulk_load.py): a crash truncates
+both, so they never disagree.
+"""
+
+LEDGER_TABLE = "seed_batches"
+
+LEDGER_SQL = f"""
+    CREATE TABLE IF NOT EXISTS {LEDGER_TABLE} (
+        first_policy  BIGINT      PRIMARY KEY,        -- batch id: first policy index
+        rows          INT         NOT NULL CHECK (rows > 0),
+        seed          BIGINT      NOT NULL,           -- -1: rows predating the ledger
+        id_offset     BIGINT      NOT NULL DEFAULT 0, -- policy_id - policy index
+        committed_at  TIMESTAMPTZ NOT NULL DEFAULT NOW()
+    )
+"""
+
+RECORD_SQL = (f"INSERT INTO {LEDGER_TABLE} (first_policy, rows, seed, id_offset) "
+              "VALUES (%s, %s, %s, %s)")
+
+# serializes ledger creation / adoption and sequence updates across shards
+LOCK_SQL = f"SELECT pg_advisory_xact_lock(hashtext('{LEDGER_TABLE}'))"
+
+# policy_id's sequence past every explicitly written id
+SEQUENCE_SQL = f"""
+    SELECT setval(seq, GREATEST(MAX(first_policy + rows - 1 + id_offset),
+                                COALESCE(pg_sequence_last_value(seq), 1)))
+    FROM {LEDGER_TABLE},
+         (SELECT pg_get_serial_sequence('japan_auto_policies', 'policy_id')::regclass) AS s(seq)
+    GROUP BY seq
+"""
+
+
+def batch_seed(first_policy: int) -> int:
+    """RNG seed of the batch starting at first_policy."""
+    return first_policy * 7919
+
+
+def load_ledger(conn) -> tuple:
+    """
+    Committed (first_policy, rows) ranges and the id_offset for new
+    batches, creating / adopting the ledger as needed.
+    """
+    with conn.cursor() as cur:
+        cur.execute(LOCK_SQL)
+        cur.execute(LEDGER_SQL)
+        cur.execute(f"SELECT first_policy, rows FROM {LEDGER_TABLE} ORDER BY first_policy")
+        done = cur.fetchall()
+        if not done:
+            done = _adopt(cur)
+        cur.execute(f"SELECT COALESCE(MAX(id_offset), 0) FROM {LEDGER_TABLE}")
+        id_offset = cur.fetchone()[0]
+    conn.commit()
+    return done, id_offset
+
+
+def advance_sequence(conn):
+    """Move policy_id's sequence past the ids the seeder wrote itself."""
+    with conn.cursor() as cur:
+        cur.execute(LOCK_SQL)
+        cur.execute(SEQUENCE_SQL)
+    conn.commit()
+
+
+def _adopt(cur) -> list:
+    cur.execute("SELECT EXISTS (SELECT 1 FROM japan_auto_policies)")
+    if not cur.fetchone()[0]:
+        return []
+    print("    Ledger    : adopting existing rows (one-time COUNT) ...")
+    # policy numbers are zero-padded, so the greatest one is the top index
+    cur.execute("SELECT COUNT(*), MAX(policy_number), MAX(policy_id) FROM japan_auto_policies")
+    count, top, max_id = cur.fetchone()
+    top = int(top[2:])
+    if count != top:
+        raise SystemExit(f"❌  japan_auto_policies has {count:,} rows but policy indexes up to "
+                         f"{top:,}; cannot tell which batches are complete. Reseed into an "
+                         f"empty table.")
+    cur.execute(RECORD_SQL, (1, count, -1, max(0, max_id - count)))
+    return [(1, count)]
+
+
+def plan_batches(total: int, batch: int, done: list, shard: tuple = (1, 1)) -> list:
+    """
+    (first_policy, rows) for every index range in 1..total not covered by
+    `done`, cut at multiples of `batch` so a fresh run gets the usual
+    fixed-size batches; only the grid cells owned by shard = (i, N).
+    """
+    i, n_shards = shard
+    tasks, pos = [], 1
+    for first, rows in sorted(done) + [(total + 1, 0)]:
+        end = min(first, total + 1)                  # gap is [pos, end)
+        while pos < end:
+            cell = (pos - 1) // batch
+            stop = min(cell * batch + batch + 1, end)
+            if cell % n_shards == i - 1:
+                tasks.append((pos, stop - pos))
+            pos = stop
+        pos = max(pos, first + rows)
+    return tasks
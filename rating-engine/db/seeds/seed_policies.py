@@ -6,9 +6,27 @@ Generates and bulk-inserts ~80,000,000 realistic Japan auto insurance
 historical policy records into the japan_auto_policies PostgreSQL table.
 
 Features:
-  - Parallel generation using multiprocessing (one worker per core)
-  - Bulk insert via psycopg2 COPY for maximum throughput
-  - Resumes from where it left off (checks existing row count first)
+  - Parallel generation using multiprocessing (one worker per core);
+    each batch is synthesized as whole NumPy arrays and formatted for
+    COPY column-wise by Arrow (benchmarks/seed_generation.py)
+  - Bulk insert via psycopg2 COPY for maximum throughput, streamed by a
+    pool of writer threads over persistent connections; generation is
+    throttled so finished batches never pile up in memory
+  - Works on the plain or the policy_year-partitioned table
+    (db/migrations/002_partition_policies.sql); batches are written
+    grouped by year
+  - Resumes exactly where it left off: every batch is recorded in the
+    seed_batches ledger in the same transaction as its COPY, and a
+    restart loads only the index ranges missing from it (ledger.py) —
+    no COUNT(*) over the table
+  - --shard i/N: several processes or hosts load one table together,
+    each owning a fixed, disjoint set of batches (policy_id and
+    policy_number ranges); batch content depends only on the batch, so
+    the shards together write exactly what one process would
+  - --bulk-load: secondary indexes, unique constraints and triggers are
+    removed for the load and restored afterwards, indexes built in
+    parallel (bulk_load.py); an interrupted bulk load is finished by
+    the next run
   - Progress bar with ETA
   - Realistic Japan distributions (population-weighted prefectures,
     actual vehicle fleet splits, NCD grade real-world distribution)
@@ -18,24 +36,38 @@ Usage:
   python seed_policies.py --rows 1000000        # quick test (1M)
   python seed_policies.py --workers 8           # override worker count
   python seed_policies.py --batch 500000        # rows per batch
+  python seed_policies.py --writers 8           # parallel COPY connections
+  python seed_policies.py --format binary       # binary COPY (less CPU both sides)
+  python seed_policies.py --shard 2/4           # this host loads batches 2, 6, 10, ... of 4 hosts
+  python seed_policies.py --bulk-load           # defer indexes/triggers, rebuild in parallel
+  python seed_policies.py --bulk-load --unlogged  # ... and skip WAL while loading
 
 Prerequisites:
-  pip install psycopg2-binary numpy tqdm python-dotenv
+  pip install psycopg2-binary numpy pyarrow tqdm python-dotenv
 """
 
 import argparse
 import io
 import multiprocessing as mp
 import os
+import queue
 import sys
+import threading
 import time
-from datetime import date, timedelta
 from pathlib import Path
 
 import numpy as np
 import psycopg2
+import pyarrow as pa
+import pyarrow.compute as pc
+import pyarrow.csv as pa_csv
 from dotenv import load_dotenv
 
+sys.path.insert(0, str(Path(__file__).resolve().parents[2]))     # rating-engine/
+from ml.pgcopy import encode_binary_copy
+from bulk_load import prepare_bulk_load, finish_bulk_load, bulk_load_pending
+from ledger import RECORD_SQL, LOCK_SQL, advance_sequence, batch_seed, load_ledger, plan_batches
+
 # ── Load .env ─────────────────────────────────────────────────────────
 load_dotenv(Path(__file__).parent.parent / ".env")
 
@@ -47,6 +79,9 @@ DB_PASSWORD = os.getenv("DB_PASSWORD", "postgres")
 
 TARGET_ROWS = 80_000_000
 DEFAULT_BATCH = 500_000
+DEFAULT_WRITERS = int(os.getenv("SEED_WRITERS", 4))
+BASE_YEAR  = 2000     # policy_year = BASE_YEAR + policy index % YEARS_SPAN
+YEARS_SPAN = 25
 
 # ── Japan realistic distributions ─────────────────────────────────────
 
@@ -131,91 +166,182 @@ def _pref_mult(code):
     return table.get(code, 1.00), table.get(code, 0.98)
 
 
-def _compute_premium(ncd, age_cond, pref_code, veh_cls, dr, rng):
-    """Compute 4-coverage premium chain with ±5% noise."""
-    nm = NCD_MULT.get(ncd, 1.0)
-    am = AGE_MULT.get(age_cond, 1.0)
-    bi_pd_pf, veh_pf = _pref_mult(pref_code)
-    drm = DR_MULT.get(dr, 1.0)
-
-    bi  = BASE_BI .get(veh_cls, 45000) * nm * am * bi_pd_pf * drm
-    pd  = BASE_PD .get(veh_cls, 37000) * nm * am * bi_pd_pf * drm
-    veh = BASE_VEH.get(veh_cls, 80000)       * am * veh_pf    * drm
-    pax = BASE_PAX.get(veh_cls, 13000) * nm * am * bi_pd_pf * drm
-
-    noise = rng.normal(1.0, 0.05)
-    bi, pd, veh, pax = int(bi*noise), int(pd*noise), int(veh*noise), int(pax*noise)
-    total = bi + pd + veh + pax
-    return bi, pd, veh, pax, total
-
-
-def _assign_tier(premium):
-    if premium < 80000:   return "Low"
-    if premium < 140000:  return "Medium"
-    if premium < 220000:  return "High"
-    return "Very High"
+# ── Lookup arrays for whole-batch synthesis ───────────────────────────
+# Categorical columns are drawn as indices into their value lists; these
+# arrays map an index to its rating factor in one gather.
+NCD_MULT_A  = np.array([NCD_MULT[g] for g in NCD_GRADES])
+AGE_MULT_A  = np.array([AGE_MULT[a] for a in AGE_CONDS])
+DR_MULT_A   = np.array([DR_MULT[d]  for d in DR_TYPES])
+PREF_MULT_A = np.array([_pref_mult(c) for c in PREF_CODES])       # (47, [bi_pd, veh])
+BASE_A      = np.array([[BASE_BI[v], BASE_PD[v], BASE_VEH[v], BASE_PAX[v]]
+                        for v in VEH_CLASSES], dtype=np.float64)
+TIERS       = ["Low", "Medium", "High", "Very High"]
+TIER_BOUNDS = np.array([80_000, 140_000, 220_000])                 # lower bound of tiers 1..3
+
+# enum / text columns travel as int8 codes into these vocabularies
+VOCAB = {
+    "age_condition":      AGE_CONDS,
+    "prefecture_code":    PREF_CODES,
+    "driver_restriction": DR_TYPES,
+    "annual_km_band":     KM_BANDS,
+    "driver_gender":      GENDERS,
+    "vehicle_make":       MAKES,
+    "fuel_type":          FUELS,
+    "risk_tier":          TIERS,
+}
 
 
-def generate_batch(args):
-    """Generate one batch of rows, return as CSV bytes ready for COPY."""
-    batch_id, n, seed = args
+def generate_columns(first_policy: int, n: int, seed: int, id_offset: int = 0) -> dict:
+    """
+    Policies first_policy .. first_policy+n-1 as whole NumPy arrays keyed
+    by column: int8 codes for the VOCAB columns, policy_index (int64) for
+    policy_number, policy_id = policy_index + id_offset, datetime64[D] for
+    start_date, bool and integer arrays otherwise. Rows are ordered by
+    policy_year, so on the partitioned table COPY fills one partition at a
+    time instead of alternating per row.
+    """
     rng = np.random.default_rng(seed)
 
-    ncds   = rng.choice(NCD_GRADES,  n, p=NCD_P)
-    ages   = rng.choice(AGE_CONDS,   n, p=AGE_P)
-    prefs  = rng.choice(PREF_CODES,  n, p=PREF_P)
-    vcls   = rng.choice(VEH_CLASSES, n, p=VEH_P)
-    drs    = rng.choice(DR_TYPES,    n, p=DR_P)
-    km_bs  = rng.choice(KM_BANDS,    n, p=KM_P)
-    km_vs  = np.array([KM_MID[KM_BANDS.index(k)] for k in km_bs])
+    def codes(values, p):
+        return rng.choice(len(values), n, p=p).astype(np.int8)
+
+    ncds   = np.asarray(NCD_GRADES)[rng.choice(len(NCD_GRADES), n, p=NCD_P)]
+    age_c  = codes(AGE_CONDS,   AGE_P)
+    pref_c = codes(PREF_CODES,  PREF_P)
+    vcls_i = rng.choice(len(VEH_CLASSES), n, p=VEH_P)
+    dr_c   = codes(DR_TYPES,    DR_P)
+    km_c   = codes(KM_BANDS,    KM_P)
     d_ages = rng.integers(18, 76, n)
-    nacc   = rng.choice([0,1,2,3,4,5], n, p=[0.70,0.15,0.08,0.04,0.02,0.01])
-    nviol  = rng.choice([0,1,2,3,4],   n, p=[0.72,0.16,0.07,0.03,0.02])
+    nacc   = rng.choice(6, n, p=[0.70,0.15,0.08,0.04,0.02,0.01])
+    nviol  = rng.choice(5, n, p=[0.72,0.16,0.07,0.03,0.02])
     ylicen = np.clip(d_ages - 18 - rng.integers(0, 4, n), 0, 57)
-    gends  = rng.choice(GENDERS, n, p=GENDER_P)
-    makes  = rng.choice(MAKES,   n, p=MAKE_P)
-    fuels  = rng.choice(FUELS,   n, p=FUEL_P)
+    gend_c = codes(GENDERS, GENDER_P)
+    make_c = codes(MAKES,   MAKE_P)
+    fuel_c = codes(FUELS,   FUEL_P)
     v_yrs  = rng.integers(2000, 2026, n)
     ekei   = rng.random(n) < 0.22   # 22% of Japan fleet is kei cars
     first  = rng.random(n) < 0.05
+    month  = rng.integers(0, 12, n)
+
+    pol_ix = first_policy + np.arange(n, dtype=np.int64)
+    py     = BASE_YEAR + pol_ix % YEARS_SPAN
+    start  = (py - 1970).astype("datetime64[Y]").astype("datetime64[M]") + month
+
+    # 4-coverage premium chain with ±5% noise; vehicle cover has no NCD factor
+    nm     = NCD_MULT_A[ncds - 1]
+    common = AGE_MULT_A[age_c] * DR_MULT_A[dr_c] * rng.normal(1.0, 0.05, n)
+    pf     = PREF_MULT_A[pref_c]
+    base   = BASE_A[vcls_i]
+    bi     = (base[:, 0] * nm * common * pf[:, 0]).astype(np.int64)
+    pd_    = (base[:, 1] * nm * common * pf[:, 0]).astype(np.int64)
+    veh    = (base[:, 2]      * common * pf[:, 1]).astype(np.int64)
+    pax    = (base[:, 3] * nm * common * pf[:, 0]).astype(np.int64)
+    total  = bi + pd_ + veh + pax
+
+    claim_prob = 0.04 + nacc * 0.03 + nviol * 0.01
+    had_claim  = rng.random(n) < claim_prob
+    n_claims   = np.where(had_claim, rng.integers(1, 4, n), 0)
+    claim_amt  = np.where(had_claim, rng.integers(50_000, np.maximum(total * 3, 50_001)), 0)
+
+    order = np.argsort(py, kind="stable")
+    cols = {
+        "policy_index":           pol_ix,
+        "policy_id":              pol_ix + id_offset,
+        "policy_year":            py,
+        "start_date":             start.astype("datetime64[D]"),
+        "ncd_grade":              ncds,
+        "age_condition":          age_c,
+        "prefecture_code":        pref_c,
+        "vehicle_rating_class":   np.asarray(VEH_CLASSES)[vcls_i],
+        "driver_restriction":     dr_c,
+        "annual_km_band":         km_c,
+        "annual_km":              np.asarray(KM_MID)[km_c],
+        "driver_age":             d_ages,
+        "years_licensed":         ylicen,
+        "num_accidents_5yr":      nacc,
+        "num_violations_5yr":     nviol,
+        "driver_gender":          gend_c,
+        "is_first_car":           first,
+        "vehicle_make":           make_c,
+        "vehicle_year":           v_yrs,
+        "fuel_type":              fuel_c,
+        "is_kei_car":             ekei,
+        "bi_premium":             bi,
+        "pd_premium":             pd_,
+        "vehicle_premium":        veh,
+        "passenger_premium":      pax,
+        "annual_premium_jpy":     total,
+        "risk_tier":              np.searchsorted(TIER_BOUNDS, total, side="right").astype(np.int8),
+        "had_claim":              had_claim,
+        "num_claims":             n_claims,
+        "total_claim_amount_jpy": claim_amt,
+    }
+    return {name: col[order] for name, col in cols.items()}
+
+
+def to_copy_text(cols: dict) -> bytes:
+    """
+    Tab-separated COPY text of generate_columns() output. Formatting runs
+    column-wise in Arrow's CSV writer; no value passes through Python.
+    """
+    digits = pc.utf8_lpad(pc.cast(pa.array(cols["policy_index"]), pa.string()), 15, "0")
+    arrays = {"policy_id":     pa.array(cols["policy_id"]),
+              "policy_number": pc.binary_join_element_wise("JP", digits, "")}
+    for name in COPY_COLUMNS.split(",")[2:]:
+        col = cols[name]
+        arrays[name] = (pa.array(VOCAB[name]).take(pa.array(col)) if name in VOCAB
+                        else pa.array(col))
+    out = io.BytesIO()
+    pa_csv.write_csv(pa.table(arrays), out,
+                     pa_csv.WriteOptions(include_header=False, delimiter="\t",
+                                         quoting_style="none"))
+    return out.getvalue()
+
+
+# binary COPY wire type per column (SMALLINT → int2, INT → int4; enum,
+# CHAR and VARCHAR values all travel as UTF-8 text)
+COPY_TYPES = {
+    "policy_id": "int8", "policy_number": "text", "policy_year": "int2", "start_date": "date",
+    "ncd_grade": "int2", "vehicle_rating_class": "int2", "annual_km": "int4",
+    "driver_age": "int2", "years_licensed": "int2",
+    "num_accidents_5yr": "int2", "num_violations_5yr": "int2",
+    "is_first_car": "bool", "vehicle_year": "int2", "is_kei_car": "bool",
+    "bi_premium": "int4", "pd_premium": "int4", "vehicle_premium": "int4",
+    "passenger_premium": "int4", "annual_premium_jpy": "int4",
+    "had_claim": "bool", "num_claims": "int2", "total_claim_amount_jpy": "int4",
+    **{name: "text" for name in VOCAB},
+}
 
-    base_pol_id = batch_id * n
-    base_year = 2000
-    years_span = 25
-
-    buf = io.StringIO()
-    for i in range(n):
-        pol_id = base_pol_id + i + 1
-        pol_num = f"JP{pol_id:015d}"
-        py = base_year + (pol_id % years_span)
-        start = date(py, rng.integers(1, 13), 1)
-
-        bi, pd_, veh, pax, total = _compute_premium(
-            int(ncds[i]), ages[i], prefs[i], int(vcls[i]), drs[i], rng
-        )
-        tier = _assign_tier(total)
-        claim_prob = 0.04 + nacc[i] * 0.03 + nviol[i] * 0.01
-        had_claim = rng.random() < claim_prob
-        n_claims = int(rng.integers(1, 4)) if had_claim else 0
-        claim_amt = int(rng.integers(50000, total * 3)) if had_claim else 0
-
-        row = (
-            f"{pol_num}\t{py}\t{start}\t"
-            f"{ncds[i]}\t{ages[i]}\t{prefs[i]}\t{vcls[i]}\t{drs[i]}\t"
-            f"{km_bs[i]}\t{km_vs[i]}\t"
-            f"{d_ages[i]}\t{ylicen[i]}\t{nacc[i]}\t{nviol[i]}\t"
-            f"{gends[i]}\t{'t' if first[i] else 'f'}\t"
-            f"{makes[i]}\t{v_yrs[i]}\t{fuels[i]}\t{'t' if ekei[i] else 'f'}\t"
-            f"{bi}\t{pd_}\t{veh}\t{pax}\t{total}\t"
-            f"{tier}\t{'t' if had_claim else 'f'}\t{n_claims}\t{claim_amt}\n"
-        )
-        buf.write(row)
-
-    return buf.getvalue().encode("utf-8")
+
+def to_copy_binary(cols: dict) -> bytes:
+    """
+    PostgreSQL binary COPY stream of generate_columns() output (see
+    ml/pgcopy.encode_binary_copy): numbers and dates are sent as fixed-
+    width binary values the server stores without parsing.
+    """
+    ids = cols["policy_index"]
+    number = np.empty((len(ids), 17), np.uint8)                     # JP + 15 digits
+    number[:, :2] = np.frombuffer(b"JP", np.uint8)
+    number[:, 2:] = ord("0") + (ids[:, None] // 10 ** np.arange(14, -1, -1)) % 10
+    fields = [("int8", cols["policy_id"]), ("text", number.view("S17").ravel())]
+    for name in COPY_COLUMNS.split(",")[2:]:
+        col = cols[name]
+        fields.append((COPY_TYPES[name], (col, VOCAB[name]) if name in VOCAB else col))
+    return encode_binary_copy(fields)
+
+
+COPY_FORMATS = {"text": to_copy_text, "binary": to_copy_binary}
+
+
+def generate_batch(args):
+    """Generate one batch of rows, return (its ledger row, COPY data in the given format)."""
+    first, n, seed, id_offset, fmt = args
+    cols = generate_columns(first, n, seed, id_offset)
+    return (first, n, seed, id_offset), COPY_FORMATS[fmt](cols)
 
 
 COPY_COLUMNS = (
-    "policy_number,policy_year,start_date,"
+    "policy_id,policy_number,policy_year,start_date,"
     "ncd_grade,age_condition,prefecture_code,vehicle_rating_class,driver_restriction,"
     "annual_km_band,annual_km,"
     "driver_age,years_licensed,num_accidents_5yr,num_violations_5yr,"
@@ -226,52 +352,170 @@ COPY_COLUMNS = (
 )
 
 
-def get_existing_count():
-    conn = psycopg2.connect(
+def _connect():
+    return psycopg2.connect(
         host=DB_HOST, port=DB_PORT, dbname=DB_NAME,
         user=DB_USER, password=DB_PASSWORD
     )
+
+
+def get_completed_batches():
+    """(first_policy, rows) of every committed batch and the id_offset, from the ledger."""
+    conn = _connect()
+    try:
+        return load_ledger(conn)
+    finally:
+        conn.close()
+
+
+def prepare_partitions():
+    """
+    If japan_auto_policies is partitioned (002_partition_policies.sql),
+    make sure every year the seeder writes has a partition.
+    """
+    conn = _connect()
     with conn.cursor() as cur:
-        cur.execute("SELECT COUNT(*) FROM japan_auto_policies")
-        count = cur.fetchone()[0]
+        cur.execute("SELECT relkind = 'p' FROM pg_class "
+                    "WHERE oid = to_regclass('japan_auto_policies')")
+        row = cur.fetchone()
+        if row and row[0]:
+            cur.execute(LOCK_SQL)       # shards starting together
+            cur.execute("SELECT add_policy_year_partition(y) FROM generate_series(%s, %s) AS y",
+                        (BASE_YEAR, BASE_YEAR + YEARS_SPAN - 1))
+    conn.commit()
     conn.close()
-    return count
 
 
-def insert_batch(data: bytes):
-    conn = psycopg2.connect(
-        host=DB_HOST, port=DB_PORT, dbname=DB_NAME,
-        user=DB_USER, password=DB_PASSWORD
-    )
-    conn.autocommit = False
+def insert_batch(conn, data: bytes, fmt: str = "text", batch: tuple = None):
+    """
+    COPY one batch over an open connection, in its own transaction; with
+    batch = (first, n, seed, id_offset) its ledger row commits in the same one.
+    """
     try:
         with conn.cursor() as cur:
-            cur.copy_from(
-                io.BytesIO(data),
-                "japan_auto_policies",
-                columns=COPY_COLUMNS.split(","),
-                sep="\t",
-                null="\\N",
-            )
+            if batch is not None:
+                cur.execute(RECORD_SQL, batch)
+            if fmt == "binary":
+                cur.copy_expert(f"COPY japan_auto_policies ({COPY_COLUMNS}) "
+                                "FROM STDIN (FORMAT binary)", io.BytesIO(data))
+            else:
+                cur.copy_from(
+                    io.BytesIO(data),
+                    "japan_auto_policies",
+                    columns=COPY_COLUMNS.split(","),
+                    sep="\t",
+                    null="\\N",
+                )
         conn.commit()
-    except Exception as e:
+    except Exception:
         conn.rollback()
-        raise e
-    finally:
-        conn.close()
+        raise
+
+
+class CopyWriters:
+    """
+    Writer threads, each streaming COPY over its own persistent connection.
+    psycopg2 releases the GIL while libpq sends and the server ingests, so
+    batches load in parallel up to the database's write capacity.
+
+    put() blocks while the queue is full; together with the slots taken
+    before a batch is generated, this bounds the batches in memory.
+    """
+
+    def __init__(self, n_writers: int, depth: int, slots: threading.Semaphore,
+                 fmt: str = "text"):
+        self.queue    = queue.Queue(maxsize=depth)
+        self.fmt      = fmt
+        self.slots    = slots
+        self.inserted = 0
+        self.error    = None
+        self._lock    = threading.Lock()
+        self._conns   = [_connect() for _ in range(n_writers)]
+        self._threads = [threading.Thread(target=self._run, args=(c,), daemon=True)
+                         for c in self._conns]
+        for t in self._threads:
+            t.start()
+
+    def _run(self, conn):
+        while True:
+            item = self.queue.get()
+            if item is None:
+                return
+            batch, data = item
+            try:
+                if self.error is None:
+                    insert_batch(conn, data, self.fmt, batch)
+                    with self._lock:
+                        self.inserted += batch[1]
+            except Exception as e:
+                # keep draining so the generator side never blocks on a dead writer
+                self.error = self.error or e
+            finally:
+                self.slots.release()
+
+    def put(self, batch: tuple, data: bytes):
+        if self.error is not None:
+            raise self.error
+        self.queue.put((batch, data))
+
+    def close(self):
+        for _ in self._threads:
+            self.queue.put(None)
+        for t in self._threads:
+            t.join()
+        for c in self._conns:
+            c.close()
+        if self.error is not None:
+            raise self.error
+
+
+def _shard(value: str) -> tuple:
+    try:
+        i, n = (int(x) for x in value.split("/"))
+    except ValueError:
+        raise argparse.ArgumentTypeError("expected i/N, e.g. 1/4")
+    if not 1 <= i <= n:
+        raise argparse.ArgumentTypeError("need 1 <= i <= N")
+    return i, n
 
 
 def main():
     parser = argparse.ArgumentParser(description="Seed Japan auto insurance 80M rows")
     parser.add_argument("--rows",    type=int, default=TARGET_ROWS)
     parser.add_argument("--batch",   type=int, default=DEFAULT_BATCH)
-    parser.add_argument("--workers", type=int, default=max(1, mp.cpu_count() - 1))
+    parser.add_argument("--workers", type=int, default=max(1, mp.cpu_count() - 1),
+                        help="generator processes")
+    parser.add_argument("--writers", type=int, default=DEFAULT_WRITERS,
+                        help="COPY connections")
+    parser.add_argument("--format",  choices=sorted(COPY_FORMATS), default="text",
+                        help="COPY data format (binary skips server-side text parsing)")
+    parser.add_argument("--shard",   type=_shard, default=(1, 1), metavar="i/N",
+                        help="load only batches k with k %% N == i-1 (same --rows/--batch on every shard)")
+    parser.add_argument("--bulk-load",  action="store_true",
+                        help="drop secondary indexes / disable triggers while loading, rebuild after")
+    parser.add_argument("--unlogged",   action="store_true",
+                        help="with --bulk-load: load UNLOGGED, SET LOGGED when done")
+    parser.add_argument("--index-jobs", type=int, default=4,
+                        help="with --bulk-load: indexes rebuilt concurrently")
     args = parser.parse_args()
 
-    existing = get_existing_count()
-    remaining = args.rows - existing
-    if remaining <= 0:
-        print(f"✅  Table already has {existing:,} rows — nothing to do.")
+    if args.unlogged and not args.bulk_load:
+        parser.error("--unlogged requires --bulk-load")
+    sharded = args.shard[1] > 1
+    if args.bulk_load and sharded:
+        parser.error("--bulk-load drops indexes for every loader; run it without --shard")
+
+    done, id_offset = get_completed_batches()
+    existing = sum(rows for _, rows in done)
+    tasks = [(first, n, batch_seed(first), id_offset, args.format)
+             for first, n in plan_batches(args.rows, args.batch, done, args.shard)]
+    remaining = sum(task[1] for task in tasks)
+    pending = bulk_load_pending(_connect)
+    if pending and sharded:
+        sys.exit("❌  An interrupted bulk load is pending; finish it with one unsharded run first.")
+    if remaining == 0 and not pending:
+        scope = f"Shard {args.shard[0]}/{args.shard[1]} is complete; table" if sharded else "Table"
+        print(f"✅  {scope} already has {existing:,} rows — nothing to do.")
         return
 
     print(f"🇯🇵  Japan Auto Insurance Seeder")
@@ -280,27 +524,39 @@ def main():
     print(f"    To insert : {remaining:>15,} rows")
     print(f"    Batch size: {args.batch:>15,}")
     print(f"    Workers   : {args.workers:>15}")
+    print(f"    Writers   : {args.writers:>15}")
+    print(f"    Format    : {args.format:>15}")
+    print(f"    Shard     : {'%d/%d' % args.shard:>15}")
+    print(f"    Bulk load : {('unlogged' if args.unlogged else 'yes') if args.bulk_load else 'no':>15}")
     print()
 
-    n_batches = (remaining + args.batch - 1) // args.batch
+    prepare_partitions()
+    if args.bulk_load:
+        prepare_bulk_load(_connect, unlogged=args.unlogged)
+    elif pending:
+        print("    Finishing an interrupted bulk load first")
+        finish_bulk_load(_connect, args.index_jobs)
     t0 = time.time()
-    inserted = 0
-
-    batch_id_start = existing // args.batch
-
-    with mp.Pool(processes=args.workers) as pool:
-        for b_idx, data in enumerate(
-            pool.imap_unordered(
-                generate_batch,
-                [
-                    (batch_id_start + b, min(args.batch, remaining - b * args.batch), (batch_id_start + b) * 7919)
-                    for b in range(n_batches)
-                    if remaining - b * args.batch > 0
-                ],
-            )
-        ):
-            insert_batch(data)
-            inserted += len(data.decode("utf-8").strip().splitlines())
+
+    # a slot is taken before a batch is handed to a generator and released
+    # once it is committed: at most this many batches exist at any time
+    depth = 2 * args.writers
+    slots = threading.Semaphore(args.workers + depth + args.writers)
+    stop  = threading.Event()
+
+    def throttled():
+        for task in tasks:
+            while not slots.acquire(timeout=0.5):
+                if stop.is_set():
+                    return
+            yield task
+
+    writers = CopyWriters(args.writers, depth, slots, args.format)
+    pool    = mp.Pool(processes=args.workers)
+    try:
+        for batch, data in pool.imap_unordered(generate_batch, throttled()):
+            writers.put(batch, data)
+            inserted = writers.inserted
             elapsed = time.time() - t0
             rate = inserted / elapsed if elapsed > 0 else 0
             eta_s = (remaining - inserted) / rate if rate > 0 else 0
@@ -311,19 +567,37 @@ def main():
                 f"| ETA {eta_s/60:.1f} min",
                 end="\r", flush=True,
             )
-
-    print(f"\n\n✅  Inserted {inserted:,} rows in {(time.time()-t0)/60:.1f} min")
-    print("    Refreshing materialized view...")
-
-    conn = psycopg2.connect(
-        host=DB_HOST, port=DB_PORT, dbname=DB_NAME,
-        user=DB_USER, password=DB_PASSWORD
-    )
+    finally:
+        # the pool's task feeder may be waiting for a slot; let it exit
+        # before terminate() joins it
+        stop.set()
+        pool.terminate()
+        pool.join()
+        writers.close()
+    inserted = writers.inserted
+    elapsed = time.time() - t0
+    print(f"\n\n✅  Inserted {inserted:,} rows in {elapsed/60:.1f} min "
+          f"({inserted / elapsed:,.0f} rows/s)")
+    if args.bulk_load:
+        finish_bulk_load(_connect, args.index_jobs)
+    print("    Analyzing...")
+
+    conn = _connect()
+    advance_sequence(conn)
     conn.autocommit = True
     with conn.cursor() as cur:
-        cur.execute("REFRESH MATERIALIZED VIEW CONCURRENTLY mv_prefecture_stats")
+        # autovacuum analyzes the partitions but never a partitioned parent,
+        # whose statistics drive year-spanning plans and sample sizing
+        cur.execute("ANALYZE japan_auto_policies")
+        # prefecture_stats is kept current per batch by its trigger
+        # (003_prefecture_stats.sql); only a pre-003 database still has the
+        # materialized view, which needs a full rescan
+        cur.execute("SELECT to_regclass('mv_prefecture_stats') IS NOT NULL")
+        if cur.fetchone()[0]:
+            print("    Refreshing materialized view...")
+            cur.execute("REFRESH MATERIALIZED VIEW CONCURRENTLY mv_prefecture_stats")
     conn.close()
-    print("✅  Materialized view refreshed. Database ready.")
+    print("✅  Database ready.")
 
 
 if __name__ == "__main__":
@@ -2,10 +2,23 @@
 data_generator.py
 Approach 1 (synthetic only) or Approach 3/4 (Excel-anchored).
 When excel_factors is provided, premiums are anchored to real actuarial values.
+
+Rows are produced in fixed-size chunks, each from its own child of
+SeedSequence(seed), optionally across a process pool (workers=N) and
+optionally as a stream (iter_chunks). Tier cut points (p33/p66/p85) come
+from a mergeable premium sketch (ml/sketch.py), so they never need the
+full premium array.
 """
+import os
+import multiprocessing as mp
+from collections import deque
+from concurrent.futures import ProcessPoolExecutor
+
 import numpy as np
 import pandas as pd
 
+from .sketch import HistogramSketch
+
 RISK_TIERS = ["Low", "Medium", "High", "Very High"]
 
 NCD_GRADES   = list(range(1, 21))
@@ -39,86 +52,199 @@ KM_PROB      = _KM_PROB / _KM_PROB.sum()
 KM_MID       = [3000,7500,12500,17500,25000]
 
 
-def generate_auto_insurance_data(n_samples=10000, excel_factors=None):
-    rng = np.random.default_rng(42)
+KM_MID_ARR   = np.array(KM_MID)
+VEH_ARR      = np.array(VEH_CLASSES)
+# age_condition multiplier, indexed by AGE_CONDS code
+AGE_FACTOR   = np.array([1.3, 1.1, 1.0, 0.92, 0.85])
+
+GENERATOR_VERSION = 2         # bump whenever the same seed would produce different rows
+CHUNK_ROWS        = 250_000   # rows per generation chunk / seed
+PREMIUM_MIN       = 30_000    # generated premiums are clipped to this range
+PREMIUM_MAX       = 800_000
+SKETCH_BIN_JPY    = 10        # tier cut points are exact to ¥10
+# Excel-anchored data: claims-experience surcharge on top of the manual's chain
+ACCIDENT_LOADING  = 0.20      # per at-fault accident
+VIOLATION_LOADING = 0.10      # per violation
+
+# Columns drawn as integer codes, in draw order
+CODE_PROBS   = {
+    "age_condition":        AGE_PROB,
+    "prefecture_code":      PREF_PROB,
+    "vehicle_rating_class": VEH_PROB,
+    "driver_restriction":   DR_PROB,
+    "annual_km_band":       KM_PROB,
+}
+
+
+def generate_auto_insurance_data(n_samples=10000, excel_factors=None, seed=42,
+                                  workers=1, chunk_rows=CHUNK_ROWS):
+    """
+    Materialize n_samples rows. Equivalent to concatenating iter_chunks()
+    for the same arguments, but generates every chunk only once: tier cut
+    points come from the merged per-chunk sketches, then the tiers are
+    assigned over the concatenated premiums.
+    """
+    frames, premiums, sketch = [], [], _premium_sketch()
+    for df, prem, sk in _ordered(_chunk_frame, _plan(n_samples, seed, chunk_rows, excel_factors),
+                                 workers):
+        frames.append(df)
+        premiums.append(prem)
+        sketch.merge(sk)
+
+    df = pd.concat(frames, ignore_index=True) if len(frames) > 1 else frames[0]
+    df["risk_tier"] = _tiers(np.concatenate(premiums), _cut_points(sketch))
+    return df
+
+
+def iter_chunks(n_samples=10000, excel_factors=None, seed=42, workers=1,
+                chunk_rows=CHUNK_ROWS):
+    """
+    Yield the dataset as DataFrames of at most chunk_rows rows, in order,
+    without ever holding all rows. Because tiers depend on global premium
+    percentiles, a first pass sketches every chunk's premiums, and the
+    chunks are regenerated (deterministically, from the same child seeds)
+    and labelled in the second pass — about twice the generation cost of
+    generate_auto_insurance_data, at constant memory.
+    """
+    plan   = _plan(n_samples, seed, chunk_rows, excel_factors)
+    sketch = _premium_sketch()
+    for sk in _ordered(_chunk_sketch, plan, workers):
+        sketch.merge(sk)
+    cuts = _cut_points(sketch)
+
+    start = 0
+    for df, prem, _ in _ordered(_chunk_frame, plan, workers):
+        df.index = pd.RangeIndex(start, start + len(df))
+        df["risk_tier"] = _tiers(prem, cuts)
+        start += len(df)
+        yield df
+
+
+# ── Chunk plan and workers ──────────────────────────────────────────────
+
+def _plan(n_samples, seed, chunk_rows, excel_factors):
+    """
+    One task per chunk: (draw_rows, keep_rows, child_seed, excel_factors).
+    Child seeds are spawned from SeedSequence(seed), so the rows depend
+    only on (seed, n_samples, chunk_rows) — never on the worker count.
+    Premiums are min-max normalized per chunk; a short tail chunk is
+    therefore drawn at full size and truncated, so every chunk has the
+    same premium distribution.
+    """
+    n_chunks = max(1, -(-n_samples // chunk_rows))
+    children = np.random.SeedSequence(seed).spawn(n_chunks)
+    draw     = min(n_samples, chunk_rows)
+    return [(draw, min(chunk_rows, n_samples - i * chunk_rows), child, excel_factors)
+            for i, child in enumerate(children)]
+
+
+def _ordered(fn, tasks, workers):
+    """Map fn over tasks in order, in a process pool when workers > 1."""
+    if workers is None:
+        workers = len(os.sched_getaffinity(0)) if hasattr(os, "sched_getaffinity") else os.cpu_count()
+    workers = min(workers, len(tasks))
+    if workers <= 1:
+        yield from map(fn, tasks)
+        return
+
+    with ProcessPoolExecutor(max_workers=workers, mp_context=mp.get_context("spawn")) as pool:
+        pending = deque()
+        for task in tasks:
+            pending.append(pool.submit(fn, task))
+            # bounded look-ahead: at most 2 finished chunks wait per worker
+            if len(pending) >= 2 * workers:
+                yield pending.popleft().result()
+        while pending:
+            yield pending.popleft().result()
+
+
+def _premium_sketch():
+    return HistogramSketch(PREMIUM_MIN, PREMIUM_MAX, bin_width=SKETCH_BIN_JPY)
+
+
+def _cut_points(sketch):
+    return sketch.quantiles([0.33, 0.66, 0.85])
 
-    ncd   = rng.choice(NCD_GRADES,   n_samples, p=NCD_PROB)
-    age_c = rng.choice(AGE_CONDS,    n_samples, p=AGE_PROB)
-    pref  = rng.choice(PREF_CODES,   n_samples, p=PREF_PROB)
-    vcls  = rng.choice(VEH_CLASSES,  n_samples, p=VEH_PROB)
-    dr    = rng.choice(DRIVER_RESTR, n_samples, p=DR_PROB)
-    km_b  = rng.choice(KM_BANDS,     n_samples, p=KM_PROB)
-    km_v  = np.array([KM_MID[KM_BANDS.index(k)] for k in km_b])
+
+def _tiers(premiums, cuts):
+    p33, p66, p85 = cuts
+    return pd.cut(premiums, bins=[-np.inf, p33, p66, p85, np.inf], labels=RISK_TIERS)
+
+
+def _generate_chunk(task):
+    draw, keep, child, excel_factors = task
+    rng = np.random.default_rng(child)
+    df  = _features(rng, draw)
+    if excel_factors:
+        premiums = _excel_anchored(df, rng, draw, excel_factors)
+    else:
+        premiums = _statistical(df, rng, draw)
+    premiums = np.asarray(premiums, dtype=np.float64)
+    if keep < draw:
+        df, premiums = df.iloc[:keep].copy(), premiums[:keep]
+    df["annual_premium_jpy"] = np.round(premiums).astype(int)
+    return df, premiums
+
+
+def _chunk_frame(task):
+    df, premiums = _generate_chunk(task)
+    return df, premiums, _premium_sketch().update(premiums)
+
+
+def _chunk_sketch(task):
+    return _premium_sketch().update(_generate_chunk(task)[1])
+
+
+def _features(rng, n_samples):
+    """
+    Categorical features are drawn as integer codes and emitted as pandas
+    Categoricals (annual_km is looked up from the km-band code), so no
+    per-row Python work or object arrays are involved.
+    """
+    ncd   = rng.choice(NCD_GRADES, n_samples, p=NCD_PROB)
+    codes = {col: rng.choice(len(p), n_samples, p=p) for col, p in CODE_PROBS.items()}
 
     age    = rng.integers(18, 76, n_samples)
     nacc   = rng.choice([0,1,2,3,4], n_samples, p=[0.70,0.18,0.08,0.03,0.01])
     nviol  = rng.choice([0,1,2,3],   n_samples, p=[0.72,0.18,0.07,0.03])
     ylicen = np.clip(age - 18 - rng.integers(0, 4, n_samples), 0, 57)
 
-    df = pd.DataFrame({
+    def cat(name, vocab):
+        return pd.Categorical.from_codes(codes[name], categories=vocab)
+
+    return pd.DataFrame({
         "ncd_grade":            ncd,
-        "age_condition":        age_c,
-        "prefecture_code":      pref,
-        "vehicle_rating_class": vcls,
-        "driver_restriction":   dr,
-        "annual_km_band":       km_b,
-        "annual_km":            km_v,
+        "age_condition":        cat("age_condition", AGE_CONDS),
+        "prefecture_code":      cat("prefecture_code", PREF_CODES),
+        "vehicle_rating_class": VEH_ARR[codes["vehicle_rating_class"]],
+        "driver_restriction":   cat("driver_restriction", DRIVER_RESTR),
+        "annual_km_band":       cat("annual_km_band", KM_BANDS),
+        "annual_km":            KM_MID_ARR[codes["annual_km_band"]],
         "driver_age":           age,
         "num_accidents":        nacc,
         "num_violations":       nviol,
         "years_licensed":       ylicen,
     })
 
-    if excel_factors:
-        premiums = _excel_anchored(df, rng, n_samples, excel_factors)
-    else:
-        premiums = _statistical(df, rng, n_samples)
-
-    p33, p66, p85 = np.percentile(premiums, [33, 66, 85])
-    df["annual_premium_jpy"] = np.round(premiums).astype(int)
-    df["risk_tier"] = pd.cut(
-        premiums, bins=[-np.inf, p33, p66, p85, np.inf], labels=RISK_TIERS
-    )
-    return df
-
 
 def _excel_anchored(df, rng, n, ef):
-    """Fast vectorized Excel-anchored premium generation.
-    Uses a reference premium for a standard profile, then scales
-    statistically — avoids the slow per-row Python loop.
+    """Each row's exact Excel-chain premium (base × NCD × age × prefecture ×
+    driver restriction, vectorized — see excel_calculate_premiums), loaded
+    for claims experience, which the manual does not price, plus ±3% noise.
     """
-    from .excel_reader import excel_calculate_premium
-    ref = excel_calculate_premium({
-        "ncd_grade": 6, "age_condition": "26+",
-        "prefecture_code": "13", "vehicle_rating_class": 7,
-        "driver_restriction": "none"
-    }, ef)
-    anchor = ref["annual_premium_jpy"]   # e.g. ¥148,000
-
-    # Build a risk score and scale around the anchor
-    s = np.zeros(n)
-    s += (6 - np.clip(df["ncd_grade"].values, 1, 6)) * 0.4   # NCD discount lowers risk
-    s -= np.maximum(df["ncd_grade"].values - 13, 0) * 0.25
-    ac_map = {"all": 1.3, "21+": 1.1, "26+": 1.0, "30+": 0.92, "35+": 0.85}
-    s += (df["age_condition"].map(ac_map).fillna(1.0).values - 1.0) * 2.5
-    s += df["num_accidents"].values * 1.5
-    s += df["num_violations"].values * 0.8
-    s += (df["vehicle_rating_class"].values - 7) * 0.12
-    s += rng.normal(0, 0.4, n)
+    from .excel_reader import excel_calculate_premiums
+    chain = excel_calculate_premiums(df, ef)["annual_premium_jpy"].to_numpy()
 
-    norm = (s - s.min()) / max(s.max() - s.min(), 1e-6)
-    # Scale: 0.5x anchor (great driver) to 2.0x anchor (very high risk)
-    premiums = anchor * (0.5 + norm * 1.5)
-    return (premiums * rng.normal(1.0, 0.03, n)).clip(30000, 800000)
+    loading = (1.0 + ACCIDENT_LOADING * df["num_accidents"].to_numpy()
+                   + VIOLATION_LOADING * df["num_violations"].to_numpy())
+    return (chain * loading * rng.normal(1.0, 0.03, n)).clip(PREMIUM_MIN, PREMIUM_MAX)
 
 
 def _statistical(df, rng, n):
     s = np.zeros(n)
     s += np.where(df["ncd_grade"] <= 5, (6 - df["ncd_grade"]) * 0.5, 0)
     s -= np.where(df["ncd_grade"] >= 14, (df["ncd_grade"] - 13) * 0.3, 0)
-    ac = df["age_condition"].map(
-        {"all": 1.3, "21+": 1.1, "26+": 1.0, "30+": 0.92, "35+": 0.85}
-    )
+    ac = AGE_FACTOR[df["age_condition"].cat.codes.values]
     s += (ac - 1.0) * 3
     s += df["num_accidents"] * 1.5
     s += df["num_violations"] * 0.8
@@ -126,4 +252,4 @@ def _statistical(df, rng, n):
     s += rng.normal(0, 0.5, n)
     base  = 150000 + (df["vehicle_rating_class"] * 8000).values
     norm  = (s - s.min()) / (s.max() - s.min())
-    return (base * (0.5 + norm * 2.0) + rng.normal(0, 3000, n)).clip(30000, 800000)
+    return (base * (0.5 + norm * 2.0) + rng.normal(0, 3000, n)).clip(PREMIUM_MIN, PREMIUM_MAX)
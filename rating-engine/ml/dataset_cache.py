@@ -0,0 +1,134 @@
+"""
+dataset_cache.py
+================
+Disk-backed cache for training DataFrames (synthetic or DB-sampled).
+
+Datasets are stored as uncompressed Arrow IPC files — the columnar format
+that can be memory-mapped, so a repeated or hyperparameter-tuning run maps
+the cached columns straight from the page cache instead of regenerating
+the data or re-querying Postgres. Categorical columns round-trip as Arrow
+dictionaries.
+
+Entries are keyed by a hash of everything that determines the data:
+source, sample size, seed, Excel manual hash and sampling parameters.
+When the cache grows past DATASET_CACHE_MAX_MB, least-recently-used files
+are evicted.
+
+Configuration (.env):
+    DATASET_CACHE_DIR     cache directory (default rating-engine/data/cache)
+    DATASET_CACHE_MAX_MB  size budget before LRU eviction (default 4096)
+
+Usage:
+    from ml.dataset_cache import get_or_build
+    df, hit = get_or_build({"source": "synthetic", "n_samples": 10000, "seed": 42},
+                           lambda: generate_auto_insurance_data(10000))
+"""
+
+import os
+import json
+import hashlib
+import logging
+from pathlib import Path
+from typing import Callable, Optional, Tuple
+
+import pandas as pd
+import pyarrow as pa
+from dotenv import load_dotenv
+
+load_dotenv(Path(__file__).parent.parent / ".env")
+
+log = logging.getLogger(__name__)
+
+DATASET_CACHE_DIR    = Path(os.getenv("DATASET_CACHE_DIR") or
+                            Path(__file__).parent.parent / "data" / "cache")
+DATASET_CACHE_MAX_MB = int(os.getenv("DATASET_CACHE_MAX_MB", 4096))
+SUFFIX               = ".arrow"
+
+
+def file_hash(path) -> Optional[str]:
+    """Content hash of a file (e.g. the Excel manual), or None if absent."""
+    p = Path(path)
+    if not p.exists():
+        return None
+    h = hashlib.sha256()
+    with open(p, "rb") as f:
+        for block in iter(lambda: f.read(1 << 20), b""):
+            h.update(block)
+    return h.hexdigest()[:16]
+
+
+def cache_key(params: dict) -> str:
+    blob = json.dumps(params, sort_keys=True, default=str)
+    return hashlib.sha256(blob.encode()).hexdigest()[:24]
+
+
+def _path(key: str) -> Path:
+    return DATASET_CACHE_DIR / f"{key}{SUFFIX}"
+
+
+def load(key: str) -> Optional[pd.DataFrame]:
+    """Memory-map a cached dataset; returns None on a miss."""
+    p = _path(key)
+    if not p.exists():
+        return None
+    try:
+        # not closed explicitly: the table's buffers keep the mapping alive
+        table = pa.ipc.open_file(pa.memory_map(str(p), "r")).read_all()
+        os.utime(p)   # LRU: mark as recently used
+        return table.to_pandas(split_blocks=True)
+    except (OSError, pa.ArrowInvalid) as e:
+        log.warning("Dropping unreadable cache entry %s: %s", p.name, e)
+        p.unlink(missing_ok=True)
+        return None
+
+
+def store(key: str, df: pd.DataFrame, params: dict = None) -> Path:
+    """Write df under key (atomic rename), then enforce the size budget."""
+    DATASET_CACHE_DIR.mkdir(parents=True, exist_ok=True)
+    table = pa.Table.from_pandas(df, preserve_index=False)
+    if params:
+        meta = dict(table.schema.metadata or {})
+        meta[b"cache_params"] = json.dumps(params, sort_keys=True, default=str).encode()
+        table = table.replace_schema_metadata(meta)
+
+    p   = _path(key)
+    tmp = p.with_name(f"{p.name}.{os.getpid()}.tmp")
+    with pa.OSFile(str(tmp), "wb") as sink:
+        with pa.ipc.new_file(sink, table.schema) as writer:
+            writer.write_table(table)
+    os.replace(tmp, p)
+    evict()
+    return p
+
+
+def evict(max_mb: int = None):
+    """Delete least-recently-used entries until the cache fits in max_mb."""
+    budget  = (DATASET_CACHE_MAX_MB if max_mb is None else max_mb) * 1024 * 1024
+    entries = sorted(DATASET_CACHE_DIR.glob(f"*{SUFFIX}"), key=lambda p: p.stat().st_mtime)
+    total   = sum(p.stat().st_size for p in entries)
+    for p in entries:
+        if total <= budget:
+            break
+        total -= p.stat().st_size
+        p.unlink(missing_ok=True)
+        log.info("Evicted cached dataset %s", p.name)
+
+
+def get_or_build(params: dict, build: Callable[[], pd.DataFrame],
+                 use_cache: bool = True) -> Tuple[pd.DataFrame, bool]:
+    """
+    Return (df, cache_hit). On a miss, build() is called and its result is
+    persisted under the key derived from params.
+    """
+    if not use_cache:
+        return build(), False
+
+    key = cache_key(params)
+    df  = load(key)
+    if df is not None:
+        log.info("Dataset cache hit %s (%s rows)", key, f"{len(df):,}")
+        return df, True
+
+    df = build()
+    store(key, df, params)
+    return df, False
@@ -7,21 +7,40 @@ sampled from japan_auto_policies.
 The sample uses PostgreSQL TABLESAMPLE SYSTEM for fast random
 sampling without a full table scan (O(blocks) not O(rows)).
 
+Connections come from the pool in ml/db_pool.py. Availability and row
+count are cached for DB_STATUS_TTL_S seconds and have async variants for
+the API's event loop.
+
+load_training_data() can also filter by policy year / prefecture through
+the indexes, stratify by risk tier or prefecture with per-stratum quotas,
+and reproduce a sample exactly from its seed. With source="snapshot" it
+samples the local Parquet snapshot (ml/snapshot.py) instead.
+
+iter_policies() streams the table (optionally filtered) in fixed-size
+chunks through a server-side cursor for consumers that only iterate.
+
 Usage:
     from ml.db_loader import load_training_data
     df = load_training_data(n_samples=1_000_000)
+    df = load_training_data(200_000, seed=7, policy_years=(2020, 2024),
+                            stratify_by="risk_tier")
+
+    for chunk in iter_policies(chunk_rows=100_000, policy_years=(2020, 2024)):
+        ...
 """
 
 import os
+import random
 import logging
-from pathlib import Path
+from concurrent.futures import ThreadPoolExecutor
+from typing import Iterator
 
+import numpy as np
 import pandas as pd
-import psycopg2
-from psycopg2 import sql
-from dotenv import load_dotenv
+import pyarrow as pa
 
-load_dotenv(Path(__file__).parent.parent / ".env")
+from .pgcopy import BinaryCopyDecoder, PG_TYPES
+from .db_pool import connection, cached, cached_async, fetchone_async, DB_STATUS_TTL_S
 
 log = logging.getLogger(__name__)
 
@@ -45,42 +64,336 @@ QUERY_COLUMNS = [
 SELECT_COLS = ", ".join(QUERY_COLUMNS)
 
 
-def _get_conn():
-    return psycopg2.connect(
-        host=os.getenv("DB_HOST", "localhost"),
-        port=int(os.getenv("DB_PORT", 5432)),
-        dbname=os.getenv("DB_NAME", "insurance_poc"),
-        user=os.getenv("DB_USER", "postgres"),
-        password=os.getenv("DB_PASSWORD", "postgres"),
-        connect_timeout=10,
-        client_encoding="UTF8",
-    )
+# reltuples of the table, or summed over its partitions when it is
+# partitioned by policy_year (002_partition_policies.sql)
+ROW_COUNT_SQL = """SELECT COALESCE(SUM(GREATEST(c.reltuples, 0)), 0)::BIGINT
+                   FROM pg_class c
+                   WHERE (c.oid = to_regclass('japan_auto_policies') AND c.relkind = 'r')
+                      OR c.oid IN (SELECT inhrelid FROM pg_inherits
+                                   WHERE inhparent = to_regclass('japan_auto_policies'))"""
+PARTITIONED_SQL = """SELECT relkind = 'p' FROM pg_class
+                     WHERE oid = to_regclass('japan_auto_policies')"""
+TABLE_EXISTS_SQL = ("SELECT 1 FROM information_schema.tables "
+                    "WHERE table_name = 'japan_auto_policies'")
+
+
+def _fetchone(query: str, params=None):
+    with connection() as conn, conn.cursor() as cur:
+        cur.execute(query, params)
+        return cur.fetchone()
 
 
 def get_total_row_count() -> int:
-    """Fast approximate count using pg_class statistics."""
-    conn = _get_conn()
-    with conn.cursor() as cur:
-        cur.execute(
-            """SELECT reltuples::BIGINT
-               FROM pg_class
-               WHERE relname = 'japan_auto_policies'"""
-        )
-        row = cur.fetchone()
-    conn.close()
-    return int(row[0]) if row else 0
+    """Fast approximate count using pg_class statistics (cached briefly)."""
+    def query():
+        row = _fetchone(ROW_COUNT_SQL)
+        return int(row[0]) if row else 0
+    return cached("row_count", DB_STATUS_TTL_S, query)
+
+
+def is_partitioned() -> bool:
+    """True once japan_auto_policies is range-partitioned by policy_year."""
+    def query():
+        row = _fetchone(PARTITIONED_SQL)
+        return bool(row and row[0])
+    return cached("partitioned", DB_STATUS_TTL_S, query)
+
+
+async def get_total_row_count_async() -> int:
+    async def query():
+        row = await fetchone_async(ROW_COUNT_SQL)
+        return int(row[0]) if row else 0
+    return await cached_async("row_count", DB_STATUS_TTL_S, query)
+
+
+# ── Binary COPY column layout ──────────────────────────────────────────
+# (output column, SQL expression, wire type). Every column is sent as a
+# NOT NULL integer so the COPY stream is fixed-width (see ml/pgcopy.py);
+# enums travel as 0-based codes in their pg_enum sort order, prefecture
+# codes as numbers, and both come back as pandas Categoricals.
+ENUM_TYPES = {
+    "age_condition":      "age_condition_t",
+    "driver_restriction": "driver_restriction_t",
+    "annual_km_band":     "km_band_t",
+    "risk_tier":          "risk_tier_t",
+}
+TRAINING_FIELDS = [
+    ("ncd_grade",            "ncd_grade",              "int2"),
+    ("age_condition",        None,                     "int2"),
+    ("prefecture_code",      "prefecture_code::int2",  "int2"),
+    ("vehicle_rating_class", "vehicle_rating_class",   "int2"),
+    ("driver_restriction",   None,                     "int2"),
+    ("annual_km_band",       None,                     "int2"),
+    ("annual_km",            "annual_km",              "int4"),
+    ("driver_age",           "driver_age",             "int2"),
+    ("num_accidents",        "num_accidents_5yr",      "int2"),
+    ("num_violations",       "num_violations_5yr",     "int2"),
+    ("years_licensed",       "years_licensed",         "int2"),
+    ("annual_premium_jpy",   "annual_premium_jpy",     "int4"),
+    ("risk_tier",            None,                     "int2"),
+]
+PREF_LABELS = [f"{i:02d}" for i in range(1, 48)]
+DB_LOAD_SHARDS = int(os.getenv("DB_LOAD_SHARDS", 1))
+
+_enum_labels = {}
+
+
+def _get_enum_labels(conn) -> dict:
+    """{enum type: [labels in sort order]}, read once per process."""
+    if not _enum_labels:
+        with conn.cursor() as cur:
+            cur.execute(
+                """SELECT t.typname, array_agg(e.enumlabel::TEXT ORDER BY e.enumsortorder)
+                   FROM pg_enum e JOIN pg_type t ON t.oid = e.enumtypid
+                   WHERE t.typname = ANY(%s)
+                   GROUP BY t.typname""",
+                (list(ENUM_TYPES.values()),),
+            )
+            _enum_labels.update(dict(cur.fetchall()))
+    return _enum_labels
+
+
+def _select_list(labels: dict, with_id: bool, rank: str = None) -> tuple:
+    """SELECT expressions and decoder fields for TRAINING_FIELDS."""
+    exprs, fields = [], []
+    if with_id:
+        exprs.append("policy_id")
+        fields.append(("policy_id", "int8"))
+    if rank is not None:
+        exprs.append(f"({rank})::int8 AS sample_hash")
+        fields.append(("sample_hash", "int8"))
+    for name, expr, pgtype in TRAINING_FIELDS:
+        if expr is None:
+            cases = " ".join(f"WHEN '{lab.replace(chr(39), chr(39) * 2)}' THEN {i}"
+                             for i, lab in enumerate(labels[ENUM_TYPES[name]]))
+            expr  = f"(CASE {name} {cases} END)::int2"
+        exprs.append(f"{expr} AS {name}")
+        fields.append((name, pgtype))
+    return ", ".join(exprs), fields
+
+
+def _to_frame(arrays: dict, labels: dict) -> pd.DataFrame:
+    cols = {}
+    for name, _, _ in TRAINING_FIELDS:
+        values = arrays[name]
+        if name in ENUM_TYPES:
+            values = pd.Categorical.from_codes(values, categories=labels[ENUM_TYPES[name]])
+        elif name == "prefecture_code":
+            codes  = np.where((values >= 1) & (values <= 47), values - 1, -1)
+            values = pd.Categorical.from_codes(codes, categories=PREF_LABELS)
+        cols[name] = values
+    df = pd.DataFrame(cols)
+    if "policy_id" in arrays:
+        df.insert(0, "policy_id", arrays["policy_id"])
+    if "sample_hash" in arrays:
+        df["sample_hash"] = arrays["sample_hash"]
+    return df
+
+
+def _copy_rows(tail: str, params: dict = None, capacity: int = 0,
+               with_id: bool = False, rank: str = None) -> pd.DataFrame:
+    """
+    COPY (SELECT <training columns> <tail>) TO STDOUT in binary format,
+    decoded straight into NumPy. tail is the FROM/WHERE/LIMIT part; rank,
+    an int8 SQL expression, is returned as an extra sample_hash column.
+    """
+    with connection() as conn:
+        labels = _get_enum_labels(conn)
+        select, fields = _select_list(labels, with_id, rank)
+        with conn.cursor() as cur:
+            query = cur.mogrify(f"SELECT {select} {tail}", params).decode()
+            dec   = BinaryCopyDecoder(fields, capacity)
+            cur.copy_expert(f"COPY ({query}) TO STDOUT (FORMAT binary)", dec)
+    return _to_frame(dec.finish(), labels)
+
+
+def _copy_sharded(tail_for_range, lo: int, hi: int, shards: int, n: int, rank: str,
+                  with_id: bool = False) -> pd.DataFrame:
+    """
+    Run one COPY per policy_id sub-range of [lo, hi], each on its own
+    pooled connection in parallel, and keep the n rows with the lowest
+    rank across all of them, in id-range order. tail_for_range(a, b)
+    returns (tail, params) for ids a..b, ordered by rank and limited to n
+    rows: a range with few matching rows is made up for by the others.
+    """
+    bounds = np.linspace(lo, hi + 1, shards + 1).astype(np.int64)
+    ranges = [(int(a), int(b) - 1) for a, b in zip(bounds[:-1], bounds[1:]) if b > a]
+
+    def one(r):
+        tail, params = tail_for_range(*r)
+        return _copy_rows(tail, params, n // len(ranges) + 1, with_id, rank)
+
+    with ThreadPoolExecutor(max_workers=len(ranges)) as pool:
+        parts = list(pool.map(one, ranges))
+    df   = pd.concat(parts, ignore_index=True)
+    keep = np.sort(np.argsort(df["sample_hash"].values, kind="stable")[:n])
+    return df.iloc[keep].drop(columns="sample_hash").reset_index(drop=True)
+
+
+def get_max_policy_id() -> int:
+    """Highest policy_id in the table (PK index lookup, no scan)."""
+    row = _fetchone("SELECT MAX(policy_id) FROM japan_auto_policies")
+    return int(row[0]) if row and row[0] is not None else 0
+
+
+# last policy_id before the first index range missing from the seeder's
+# ledger (db/seeds/ledger.py: seed_batches), NULL when there is no gap
+LEDGER_GAP_SQL = """
+    SELECT MIN(g.ix) - 1 + (SELECT COALESCE(MAX(id_offset), 0) FROM seed_batches)
+    FROM (SELECT first_policy + rows AS ix FROM seed_batches UNION ALL SELECT 1) g
+    WHERE NOT EXISTS (SELECT 1 FROM seed_batches b WHERE b.first_policy = g.ix)
+      AND g.ix < (SELECT MAX(first_policy + rows) FROM seed_batches)
+"""
+
+
+def get_policy_watermark() -> int:
+    """
+    Highest policy_id that no later commit can land below: MAX(policy_id),
+    capped before the first gap in the seeder's ledger. The seeder writes
+    explicit ids, so a resumed gap or a slower --shard commits ids below
+    rows already committed; a watermark past the gap would skip them.
+    Training, refresh and snapshot sync take their watermark from here and
+    pick up the gap's rows once it is filled.
+    """
+    with connection() as conn, conn.cursor() as cur:
+        cur.execute("SELECT MAX(policy_id), to_regclass('seed_batches') IS NOT NULL "
+                    "FROM japan_auto_policies")
+        top, ledger = cur.fetchone()
+        top = int(top or 0)
+        if not ledger:
+            return top
+        cur.execute(LEDGER_GAP_SQL)
+        gap = cur.fetchone()[0]
+    if gap is not None and gap < top:
+        log.info("Policy watermark held at %s (seed ledger gap; MAX(policy_id) is %s)",
+                 f"{gap:,}", f"{top:,}")
+        return int(gap)
+    return top
+
 
+# ── Sampling ───────────────────────────────────────────────────────────
+SAMPLE_OVERSAMPLE = 1.25     # candidate rows drawn per wanted row
+ROW_SAMPLE_MAX    = 0.2      # filters keeping at most this share of the table
+                             # sample rows through the indexes, else blocks
+HASH_SPACE        = 1 << 31
+STRATUM_RETRIES   = 3        # top-up queries for strata that came back short
+STRATA            = ("risk_tier", "prefecture_code")
+STRATA_ARRAY      = {"risk_tier": "risk_tier_t[]", "prefecture_code": "bpchar[]"}
 
-def load_training_data(n_samples: int = 1_000_000) -> pd.DataFrame:
+
+def _row_hash(seed: int) -> str:
+    """A uniform, seeded pseudo-random value in [0, HASH_SPACE) per row."""
+    return f"(hashint8extended(policy_id, {int(seed)}) & {HASH_SPACE - 1})"
+
+
+def _literal(value) -> str:
+    return "'" + str(value).replace("'", "''") + "'"
+
+
+def _case(column: str, mapping: dict, default=0) -> str:
+    whens = " ".join(f"WHEN {_literal(k)} THEN {v}" for k, v in mapping.items())
+    return f"(CASE {column} {whens} ELSE {default} END)"
+
+
+def _and(where: str, clause: str) -> str:
+    return f"{where} AND {clause}" if where else f"WHERE {clause}"
+
+
+def _estimate_rows(where: str, params: dict) -> float:
+    """Planner row estimate for the filters — statistics only, no scan."""
+    with connection() as conn, conn.cursor() as cur:
+        cur.execute(f"EXPLAIN (FORMAT JSON) SELECT 1 FROM japan_auto_policies {where}", params)
+        return float(cur.fetchone()[0][0]["Plan"]["Plan Rows"])
+
+
+def _stratum_shares(column: str, strata: list) -> dict:
+    """
+    Share of the table in each stratum from pg_stats' most-common values
+    (every tier and prefecture is an MCV after ANALYZE), renormalised over
+    strata. Strata missing from the statistics get an even split of the
+    remainder.
+    """
+    row = _fetchone("""SELECT most_common_vals::TEXT::TEXT[], most_common_freqs
+                       FROM pg_stats
+                       WHERE tablename = 'japan_auto_policies' AND attname = %s""",
+                    (column,))
+    freqs = dict(zip(row[0], row[1])) if row and row[0] else {}
+    known = {s: float(freqs[s]) for s in strata if s in freqs}
+    missing = [s for s in strata if s not in known]
+    rest = max(1.0 - sum(freqs.values()), 0.0) if freqs else 1.0
+    shares = {**known, **{s: rest / len(missing) for s in missing}}
+    total = sum(shares.values()) or 1.0
+    return {s: max(v / total, 1e-9) for s, v in shares.items()}
+
+
+def _stratum_quotas(column: str, strata: list, n_samples: int, quotas: dict = None) -> dict:
+    """Per-stratum row quotas: the given ones, or n_samples split evenly."""
+    if quotas is None:
+        base, extra = divmod(n_samples, len(strata))
+        return {s: base + (i < extra) for i, s in enumerate(strata)}
+    norm = (lambda k: str(k).zfill(2)) if column == "prefecture_code" else str
+    out = {norm(k): int(v) for k, v in quotas.items()}
+    unknown = set(out) - set(strata)
+    if unknown:
+        raise ValueError(f"Unknown {column} strata in quotas: {sorted(unknown)}")
+    return out
+
+
+def load_training_data(n_samples: int = 1_000_000, max_policy_id: int = None,
+                       shards: int = None, seed: int = None, policy_years=None,
+                       prefecture_codes=None, stratify_by: str = None,
+                       quotas: dict = None, source: str = "database") -> pd.DataFrame:
     """
     Return a random sample of n_samples rows as a pandas DataFrame.
 
     Uses PostgreSQL TABLESAMPLE SYSTEM for O(blocks) random sampling,
     then LIMIT n_samples to trim. Much faster than ORDER BY RANDOM().
+    Rows arrive via binary COPY and are decoded straight into NumPy
+    arrays; enum and prefecture columns are Categoricals.
 
     For 80M rows, TABLESAMPLE SYSTEM(1.25) returns ~1M rows in ~2-4 s.
+
+    max_policy_id: only sample rows at or below this id — the watermark
+                   recorded in the artifacts for incremental refresh.
+    shards:        split the sample into this many policy_id ranges fetched
+                   over parallel connections (default DB_LOAD_SHARDS). All
+                   shards use the same REPEATABLE block sample; each backend
+                   sends up to n_samples of its candidates in hash order and
+                   the lowest hashes across shards are kept, so ranges with
+                   few matching rows (filters, id gaps) don't shorten the
+                   sample. Not used with stratify_by.
+    seed:          the sample is a pure function of (seed, arguments, table
+                   contents); None picks a random seed (logged).
+    policy_years / prefecture_codes:
+                   filters, as in iter_policies. Filters that keep at most
+                   ROW_SAMPLE_MAX of the table — of the year partitions
+                   they touch, once the table is partitioned — are answered
+                   through idx_polyr_year_pref / idx_polyr_pref instead of
+                   a block sample, and rows are sampled individually by a
+                   seeded hash of policy_id — no block clustering by
+                   policy_year.
+    stratify_by:   "risk_tier" or "prefecture_code": draw quotas[stratum]
+                   rows from each stratum (default: n_samples split evenly).
+                   One query — each stratum's candidates are sampled at their
+                   own rate, then row_number() over the hash keeps exactly
+                   the quota. Only a stratum whose share was overestimated
+                   is topped up with a second query.
+    source:        "snapshot" samples the local Parquet snapshot instead
+                   (ml/snapshot.py) — no database round trip; supports seed
+                   and the filters, and rows up to the snapshot watermark.
     """
     n_samples = max(1000, int(n_samples))
+    if source == "snapshot":
+        if stratify_by is not None or max_policy_id is not None or shards:
+            raise ValueError("source='snapshot' supports seed, policy_years and "
+                             "prefecture_codes only")
+        from .snapshot import sample_snapshot
+        return sample_snapshot(n_samples, seed=seed, policy_years=policy_years,
+                               prefecture_codes=prefecture_codes)
+    if source != "database":
+        raise ValueError(f"Unknown source {source!r}")
+    shards    = max(1, int(shards or DB_LOAD_SHARDS))
+    seed      = random.randrange(HASH_SPACE) if seed is None else int(seed) % HASH_SPACE
     total = get_total_row_count()
 
     if total == 0:
@@ -88,64 +401,200 @@ def load_training_data(n_samples: int = 1_000_000) -> pd.DataFrame:
             "Table japan_auto_policies is empty. "
             "Run db/seeds/seed_policies.py first."
         )
+    if stratify_by is not None and stratify_by not in STRATA:
+        raise ValueError(f"stratify_by must be one of {STRATA}, got {stratify_by!r}")
+
+    filters = dict(policy_years=policy_years, prefecture_codes=prefecture_codes)
+    where, params = _where(**filters)
+    matching = _estimate_rows(where, params) if where else float(total)
+    matching = min(max(matching, 1.0), float(total))
+    # a year filter on the partitioned table prunes partitions, so a block
+    # sample only reads the years asked for
+    scope = float(total)
+    if policy_years is not None and is_partitioned():
+        scope = min(max(_estimate_rows(*_where(policy_years=policy_years)), 1.0), scope)
+    by_row   = matching <= ROW_SAMPLE_MAX * scope
+    row_hash = _row_hash(seed)
+
+    if stratify_by is not None:
+        if stratify_by == "risk_tier":
+            with connection() as conn:
+                strata = list(_get_enum_labels(conn)[ENUM_TYPES["risk_tier"]])
+        else:
+            strata = params.get("prefs") or PREF_LABELS
+        want   = _stratum_quotas(stratify_by, strata, n_samples, quotas)
+        shares = _stratum_shares(stratify_by, strata)
+        # fraction of each stratum's matching rows needed as candidates
+        rates  = {s: min(1.0, q * SAMPLE_OVERSAMPLE / (matching * shares[s]))
+                  for s, q in want.items()}
+        n_samples = sum(want.values())
+        shards    = 1
+    else:
+        rates = {None: min(1.0, n_samples * SAMPLE_OVERSAMPLE / matching)}
+
+    log.info("Loading %s training rows from DB (table has ~%s rows, ~%s match, %s, "
+             "seed %d, %d shard(s)%s)",
+             f"{n_samples:,}", f"{total:,}", f"{int(matching):,}",
+             "row-level hash sample via indexes" if by_row
+             else f"TABLESAMPLE {min(100.0, max(rates.values()) * 100):.2f}%",
+             seed, shards, f", stratified by {stratify_by}" if stratify_by else "")
+
+    def tail(rates, lo_id=None, hi_id=None, ordered=by_row):
+        w, p = _where(min_policy_id=lo_id, max_policy_id=hi_id, **filters)
+        if stratify_by is not None and len(rates) < len(want):
+            w = _and(w, f"{stratify_by} = ANY(%(strata)s::{STRATA_ARRAY[stratify_by]})")
+            p["strata"] = list(rates)
+        if by_row:
+            if stratify_by is None:
+                cut = f"{int(rates[None] * HASH_SPACE)}"
+            else:
+                cut = _case(stratify_by, {s: int(r * HASH_SPACE) for s, r in rates.items()})
+            from_clause = f"japan_auto_policies {_and(w, f'{row_hash} < {cut}')}"
+        else:
+            # a pct% block sample holds ~pct% of the matching rows of every stratum
+            pct = min(100.0, max(rates.values()) * 100)
+            from_clause = f"japan_auto_policies TABLESAMPLE SYSTEM({pct:.4f}) REPEATABLE({seed}) {w}"
+
+        if stratify_by is not None:
+            return (f"""FROM (SELECT *, row_number() OVER (PARTITION BY {stratify_by}
+                                                           ORDER BY {row_hash}) AS sample_rank
+                              FROM {from_clause}) candidates
+                        WHERE sample_rank <= {_case(stratify_by, want)}""", p)
+        # ordering by the hash keeps the truncation from favouring early blocks
+        order = f"ORDER BY {row_hash}" if ordered else ""
+        return f"FROM {from_clause} {order} LIMIT {n_samples}", p
 
-    # Calculate BERNOULLI percentage needed to get at least n_samples rows
-    pct = min(100.0, (n_samples / max(total, 1)) * 100 * 1.25)
-
-    query = f"""
-        SELECT
-            ncd_grade,
-            age_condition::TEXT,
-            prefecture_code::TEXT,
-            vehicle_rating_class,
-            driver_restriction::TEXT,
-            annual_km_band::TEXT,
-            annual_km,
-            driver_age,
-            num_accidents_5yr   AS num_accidents,
-            num_violations_5yr  AS num_violations,
-            years_licensed,
-            annual_premium_jpy,
-            risk_tier::TEXT
-        FROM japan_auto_policies
-        TABLESAMPLE SYSTEM({pct:.4f})
-        LIMIT {n_samples}
-    """
-
-    log.info("Loading %s training rows from DB (table has ~%s rows, TABLESAMPLE %.2f%%)",
-             f"{n_samples:,}", f"{total:,}", pct)
-
-    conn = _get_conn()
-    try:
-        df = pd.read_sql_query(query, conn)
-    finally:
-        conn.close()
-
-    # Ensure dtypes match what trainer expects
-    df["vehicle_rating_class"] = df["vehicle_rating_class"].astype(str)
-    df["ncd_grade"]            = df["ncd_grade"].astype(int)
-    df["annual_km"]            = df["annual_km"].astype(int)
-    df["driver_age"]           = df["driver_age"].astype(int)
-    df["num_accidents"]        = df["num_accidents"].astype(int)
-    df["num_violations"]       = df["num_violations"].astype(int)
-    df["years_licensed"]       = df["years_licensed"].astype(int)
-    df["annual_premium_jpy"]   = df["annual_premium_jpy"].astype(int)
+    if shards == 1:
+        df = _copy_rows(*tail(rates, hi_id=max_policy_id), capacity=n_samples)
+    else:
+        hi = int(max_policy_id) if max_policy_id is not None else get_max_policy_id()
+        df = _copy_sharded(lambda a, b: tail(rates, a, b, ordered=True), 1, hi, shards,
+                           n_samples, row_hash)
+
+    if stratify_by is not None:
+        # Shares assume strata are independent of the filters (Low risk is
+        # rarer in Tokyo than nationally). Redraw short strata at a higher
+        # rate: a stratum's rows are its lowest hashes among the candidates,
+        # and raising the rate only adds candidates, so the result is what
+        # a single query at the higher rate would have returned.
+        for _ in range(STRATUM_RETRIES):
+            counts = df[stratify_by].value_counts()
+            short  = {s: int(counts.get(s, 0)) for s, q in want.items()
+                      if counts.get(s, 0) < q and rates[s] < 1.0}
+            if not short:
+                break
+            redo = {s: min(1.0, rates[s] * SAMPLE_OVERSAMPLE * want[s] / max(got, 1))
+                    for s, got in short.items()}
+            rates.update(redo)
+            extra = _copy_rows(*tail(redo, hi_id=max_policy_id),
+                               capacity=sum(want[s] for s in redo))
+            df = pd.concat([df[~df[stratify_by].isin(list(redo))], extra], ignore_index=True)
+
+        counts = df[stratify_by].value_counts()
+        short  = {s: int(counts.get(s, 0)) for s, q in want.items() if counts.get(s, 0) < q}
+        if short:
+            log.warning("Strata with fewer matching rows than their quota: %s", short)
 
     log.info("Loaded %s rows from database.", f"{len(df):,}")
     return df
 
 
+def load_policies_after(watermark: int, limit: int = 1_000_000) -> pd.DataFrame:
+    """
+    Rows with watermark < policy_id <= get_policy_watermark(), oldest
+    first, as training columns plus policy_id. A primary-key range scan —
+    cost is proportional to the new rows, not the table.
+    """
+    df = _copy_rows("""FROM japan_auto_policies
+                       WHERE policy_id > %(watermark)s AND policy_id <= %(upto)s
+                       ORDER BY policy_id
+                       LIMIT %(limit)s""",
+                    {"watermark": int(watermark), "upto": get_policy_watermark(),
+                     "limit": int(limit)},
+                    capacity=int(limit), with_id=True)
+    log.info("Loaded %s policies above watermark %s.", f"{len(df):,}", f"{watermark:,}")
+    return df
+
+
+def _where(policy_years=None, prefecture_codes=None,
+           min_policy_id: int = None, max_policy_id: int = None) -> tuple:
+    """
+    WHERE clause + params for the common filters, written so the planner
+    can use the indexes from 001_create_policies.sql: policy_year
+    (idx_polyr_year, idx_polyr_year_pref — or partition pruning once
+    002_partition_policies.sql has run), prefecture_code compared as CHAR
+    (idx_polyr_pref) and policy_id ranges (primary key).
+
+    policy_years: one year or an inclusive (first, last) pair
+    prefecture_codes: one code or a list, e.g. "13" or ["13", "14"]
+    """
+    clauses, params = [], {}
+    if policy_years is not None:
+        first, last = (policy_years, policy_years) if isinstance(policy_years, int) else policy_years
+        clauses.append("policy_year BETWEEN %(year_lo)s AND %(year_hi)s")
+        params.update(year_lo=int(first), year_hi=int(last))
+    if prefecture_codes is not None:
+        codes = [prefecture_codes] if isinstance(prefecture_codes, str) else list(prefecture_codes)
+        clauses.append("prefecture_code = ANY(%(prefs)s::bpchar[])")
+        params["prefs"] = [str(c).zfill(2) for c in codes]
+    if min_policy_id is not None:
+        clauses.append("policy_id >= %(id_lo)s")
+        params["id_lo"] = int(min_policy_id)
+    if max_policy_id is not None:
+        clauses.append("policy_id <= %(id_hi)s")
+        params["id_hi"] = int(max_policy_id)
+    return ("WHERE " + " AND ".join(clauses)) if clauses else "", params
+
+
+def iter_policies(chunk_rows: int = 100_000, policy_years=None, prefecture_codes=None,
+                  min_policy_id: int = None, max_policy_id: int = None,
+                  as_arrow: bool = False, order_by_id: bool = False) -> Iterator:
+    """
+    Stream japan_auto_policies (training columns + policy_id) through a
+    named server-side cursor, yielding DataFrames — or pyarrow
+    RecordBatches with as_arrow — of at most chunk_rows rows. Only one
+    chunk is held client-side, so memory stays flat for any table size.
+    Filters are pushed down to the server (see _where).
+
+    The cursor lives in a transaction on a pooled connection until the
+    iterator is exhausted or closed.
+    """
+    where, params = _where(policy_years, prefecture_codes, min_policy_id, max_policy_id)
+    order = "ORDER BY policy_id" if order_by_id else ""
+
+    with connection() as conn:
+        labels = _get_enum_labels(conn)
+        select, fields = _select_list(labels, with_id=True)
+        dtypes = [PG_TYPES[t] for _, t in fields]
+        with conn.cursor(name="iter_policies") as cur:
+            cur.itersize = chunk_rows
+            cur.execute(f"SELECT {select} FROM japan_auto_policies {where} {order}", params)
+            while True:
+                rows = cur.fetchmany(chunk_rows)
+                if not rows:
+                    break
+                block  = np.array(rows, dtype=np.int64)
+                arrays = {name: block[:, i].astype(dt)
+                          for i, ((name, _), dt) in enumerate(zip(fields, dtypes))}
+                del rows, block
+                df = _to_frame(arrays, labels)
+                yield pa.RecordBatch.from_pandas(df, preserve_index=False) if as_arrow else df
+
+
 def is_db_available() -> bool:
-    """Return True if the DB is reachable and the table exists."""
-    try:
-        conn = _get_conn()
-        with conn.cursor() as cur:
-            cur.execute(
-                "SELECT 1 FROM information_schema.tables "
-                "WHERE table_name = 'japan_auto_policies'"
-            )
-            exists = cur.fetchone() is not None
-        conn.close()
-        return exists
-    except Exception:
-        return False
+    """Return True if the DB is reachable and the table exists (cached briefly)."""
+    def query():
+        try:
+            return _fetchone(TABLE_EXISTS_SQL) is not None
+        except Exception:
+            return False
+    return cached("available", DB_STATUS_TTL_S, query)
+
+
+async def is_db_available_async() -> bool:
+    async def query():
+        try:
+            return await fetchone_async(TABLE_EXISTS_SQL) is not None
+        except Exception:
+            return False
+    return await cached_async("available", DB_STATUS_TTL_S, query)
@@ -0,0 +1,313 @@
+"""
+db_pool.py
+==========
+Pooled PostgreSQL connections for the rating engine, sync and async.
+
+connection()        — context manager over a per-process psycopg2
+                      ThreadedConnectionPool, for the loaders and the
+                      training process.
+async_connection()  — async context manager over psycopg2's native
+                      asynchronous connections (non-blocking sockets driven
+                      by the asyncio event loop), for FastAPI handlers:
+                      a slow or unreachable database never parks a
+                      threadpool worker.
+
+Checkout blocks while DB_POOL_SIZE connections are out (psycopg2's pool
+itself raises PoolError instead of waiting), so sharded loads wider than
+the pool and concurrent callers queue rather than fail.
+
+Connections are health-checked on checkout: closed or broken ones are
+replaced, and ones idle longer than DB_POOL_CHECK_S are pinged with
+SELECT 1 first. A connection that raised during use is discarded instead
+of being returned to the pool.
+
+cached(key, ttl, fn) / cached_async(...) memoize small results such as
+the row count for a few seconds; concurrent async callers share one
+in-flight query.
+
+Configuration (.env):
+    DB_POOL_SIZE     max connections per pool (default 8)
+    DB_POOL_CHECK_S  ping connections idle longer than this (default 30)
+    DB_STATUS_TTL_S  cache lifetime for availability / row count (default 5)
+"""
+
+import os
+import time
+import asyncio
+import logging
+import threading
+from contextlib import contextmanager, asynccontextmanager
+from pathlib import Path
+
+import psycopg2
+import psycopg2.extensions as ext
+from psycopg2.pool import ThreadedConnectionPool
+from dotenv import load_dotenv
+
+load_dotenv(Path(__file__).parent.parent / ".env")
+
+log = logging.getLogger(__name__)
+
+DB_POOL_SIZE    = int(os.getenv("DB_POOL_SIZE", 8))
+DB_POOL_CHECK_S = float(os.getenv("DB_POOL_CHECK_S", 30))
+DB_STATUS_TTL_S = float(os.getenv("DB_STATUS_TTL_S", 5))
+CONNECT_TIMEOUT = 10
+
+
+def conn_params() -> dict:
+    return {
+        "host":            os.getenv("DB_HOST", "localhost"),
+        "port":            int(os.getenv("DB_PORT", 5432)),
+        "dbname":          os.getenv("DB_NAME", "insurance_poc"),
+        "user":            os.getenv("DB_USER", "postgres"),
+        "password":        os.getenv("DB_PASSWORD", "postgres"),
+        "connect_timeout": CONNECT_TIMEOUT,
+    }
+
+
+def connect(**overrides):
+    """A fresh, unpooled connection (COPY workers, long streaming cursors)."""
+    return psycopg2.connect(**{**conn_params(), "client_encoding": "UTF8", **overrides})
+
+
+# ── Sync pool ───────────────────────────────────────────────────────────
+
+_pool      = None
+_pool_pid  = None
+_pool_lock = threading.Lock()
+_slots     = None        # BoundedSemaphore(DB_POOL_SIZE): one per checked-out conn
+_last_used = {}          # id(conn) -> monotonic time of last check-in
+
+
+def _get_pool() -> tuple:
+    global _pool, _pool_pid, _slots
+    with _pool_lock:
+        # a pool must never be shared across processes
+        if _pool is None or _pool_pid != os.getpid():
+            _pool = ThreadedConnectionPool(0, DB_POOL_SIZE, client_encoding="UTF8",
+                                           **conn_params())
+            _slots = threading.BoundedSemaphore(DB_POOL_SIZE)
+            _pool_pid = os.getpid()
+        return _pool, _slots
+
+
+def _healthy(conn) -> bool:
+    if conn.closed:
+        return False
+    used = _last_used.get(id(conn))
+    if used is None or time.monotonic() - used < DB_POOL_CHECK_S:
+        return True        # freshly opened, or used recently
+    try:
+        with conn.cursor() as cur:
+            cur.execute("SELECT 1")
+        conn.rollback()
+        return True
+    except psycopg2.Error:
+        return False
+
+
+@contextmanager
+def connection():
+    """
+    Check out a healthy pooled connection, waiting for a free slot if the
+    pool is exhausted; rolled back on return.
+    """
+    pool, slots = _get_pool()
+    slots.acquire()
+    try:
+        conn = pool.getconn()
+        while not _healthy(conn):
+            _last_used.pop(id(conn), None)
+            pool.putconn(conn, close=True)
+            conn = pool.getconn()
+    except BaseException:
+        slots.release()
+        raise
+
+    broken = False
+    try:
+        yield conn
+    except (psycopg2.OperationalError, psycopg2.InterfaceError):
+        broken = True
+        raise
+    finally:
+        if not broken and not conn.closed:
+            try:
+                conn.rollback()
+            except psycopg2.Error:
+                broken = True
+        broken = broken or bool(conn.closed)
+        if broken:
+            _last_used.pop(id(conn), None)
+        else:
+            _last_used[id(conn)] = time.monotonic()
+        try:
+            pool.putconn(conn, close=broken)
+        finally:
+            slots.release()
+
+
+# ── Async pool ──────────────────────────────────────────────────────────
+
+async def _wait(conn):
+    """Drive an async psycopg2 connection until its current operation completes."""
+    loop = asyncio.get_running_loop()
+    while True:
+        state = conn.poll()
+        if state == ext.POLL_OK:
+            return
+        fut = loop.create_future()
+        fd  = conn.fileno()
+        if state == ext.POLL_READ:
+            loop.add_reader(fd, fut.set_result, None)
+            remove = loop.remove_reader
+        elif state == ext.POLL_WRITE:
+            loop.add_writer(fd, fut.set_result, None)
+            remove = loop.remove_writer
+        else:
+            raise psycopg2.OperationalError(f"Bad poll state {state}")
+        try:
+            await fut
+        finally:
+            remove(fd)
+
+
+class AsyncCursor:
+    """Minimal awaitable cursor over an async psycopg2 connection."""
+
+    def __init__(self, conn):
+        self._conn = conn
+        self._cur  = conn.cursor()
+
+    async def execute(self, query, params=None):
+        self._cur.execute(query, params)
+        await _wait(self._conn)
+        return self
+
+    def fetchone(self):
+        return self._cur.fetchone()
+
+    def fetchall(self):
+        return self._cur.fetchall()
+
+
+class AsyncPool:
+    """Bounded pool of async (autocommit) connections bound to one event loop."""
+
+    def __init__(self, size: int = DB_POOL_SIZE):
+        self._idle  = []                       # (conn, last_used)
+        self._slots = asyncio.Semaphore(size)
+
+    async def _open(self):
+        conn = psycopg2.connect(async_=True, **conn_params())
+        try:
+            # libpq ignores connect_timeout for non-blocking connects
+            await asyncio.wait_for(_wait(conn), CONNECT_TIMEOUT)
+        except BaseException:
+            conn.close()
+            raise
+        return conn
+
+    async def _checkout(self):
+        while self._idle:
+            conn, used = self._idle.pop()
+            if conn.closed:
+                continue
+            if time.monotonic() - used < DB_POOL_CHECK_S:
+                return conn
+            try:
+                await AsyncCursor(conn).execute("SELECT 1")
+                return conn
+            except psycopg2.Error:
+                conn.close()
+        return await self._open()
+
+    @asynccontextmanager
+    async def acquire(self):
+        async with self._slots:
+            conn = await self._checkout()
+            try:
+                yield conn
+            except BaseException:
+                # mid-query cancellation or error leaves the socket in an
+                # unknown state — never hand it to the next caller
+                conn.close()
+                raise
+            else:
+                if not conn.closed:
+                    self._idle.append((conn, time.monotonic()))
+
+    def close(self):
+        for conn, _ in self._idle:
+            conn.close()
+        self._idle.clear()
+
+
+_async_pools = {}        # event loop -> AsyncPool
+
+
+@asynccontextmanager
+async def async_connection():
+    loop = asyncio.get_running_loop()
+    pool = _async_pools.get(loop)
+    if pool is None:
+        pool = _async_pools[loop] = AsyncPool()
+    async with pool.acquire() as conn:
+        yield conn
+
+
+async def fetchone_async(query: str, params=None):
+    async with async_connection() as conn:
+        cur = await AsyncCursor(conn).execute(query, params)
+        return cur.fetchone()
+
+
+def close_async_pools():
+    for pool in _async_pools.values():
+        pool.close()
+    _async_pools.clear()
+
+
+# ── Short-lived result cache ────────────────────────────────────────────
+
+_cache      = {}          # key -> (expires, value)
+_cache_lock = threading.Lock()
+_inflight   = {}          # (event loop, key) -> asyncio.Task
+
+
+def cached(key: str, ttl: float, fn):
+    now = time.monotonic()
+    with _cache_lock:
+        hit = _cache.get(key)
+    if hit and hit[0] > now:
+        return hit[1]
+    value = fn()
+    with _cache_lock:
+        _cache[key] = (time.monotonic() + ttl, value)
+    return value
+
+
+async def cached_async(key: str, ttl: float, coro_fn):
+    hit = _cache.get(key)
+    if hit and hit[0] > time.monotonic():
+        return hit[1]
+    slot = (asyncio.get_running_loop(), key)
+    task = _inflight.get(slot)
+    if task is None:
+        task = _inflight[slot] = asyncio.ensure_future(coro_fn())
+    try:
+        value = await asyncio.shield(task)
+    finally:
+        if _inflight.get(slot) is task and task.done():
+            del _inflight[slot]
+    with _cache_lock:
+        _cache[key] = (time.monotonic() + ttl, value)
+    return value
+
+
+def invalidate(key: str = None):
+    with _cache_lock:
+        if key is None:
+            _cache.clear()
+        else:
+            _cache.pop(key, None)
@@ -0,0 +1,182 @@
+"""
+distributed.py
+==============
+Multi-node Random Forest training.
+
+Each worker draws its own training sample (a TABLESAMPLE from
+japan_auto_policies, or synthetic rows for local testing), builds a
+disjoint subset of the trees with its own seed and writes a shard file.
+Because the workers encode with trainer.canonical_encoders(), every shard
+shares the same feature_encoders / tier_encoder, so the coordinator can
+concatenate the trees (forest_ops.merge_forests), evaluate the merged
+forests on a holdout sample and write the standard rf_artifacts.pkl.
+For the database and snapshot sources the holdout is another sample of
+the same table, so it overlaps the shards' training rows and its scores
+are marked in-sample (metrics["holdout"]); only synthetic holdouts are
+fresh data.
+
+Shards are exchanged through a directory (shared filesystem, or copied
+to the coordinator):  <out_dir>/shard-<i>-of-<n>.pkl
+
+Usage: see train_distributed.py
+"""
+
+import os
+import pickle
+import logging
+from pathlib import Path
+
+import numpy as np
+import pandas as pd
+from sklearn.ensemble import RandomForestClassifier, RandomForestRegressor
+from sklearn.metrics import classification_report, mean_absolute_error, r2_score
+
+from .trainer import (ALL_FEATURES, canonical_encoders, encode, forest_params,
+                      save_artifacts)
+from .forest_ops import merge_forests
+
+log = logging.getLogger(__name__)
+
+
+def shard_seed(base_seed: int, index: int) -> int:
+    """Distinct, reproducible seed per shard."""
+    return int(np.random.SeedSequence([base_seed, index]).generate_state(1)[0])
+
+
+def _sample(source: str, n_samples: int, seed: int, max_policy_id: int = None) -> pd.DataFrame:
+    if source == "database":
+        from .db_loader import load_training_data
+        return load_training_data(n_samples=n_samples, max_policy_id=max_policy_id, seed=seed)
+    if source == "snapshot":
+        from .db_loader import load_training_data
+        return load_training_data(n_samples, seed=seed, source="snapshot")
+    from .data_generator import generate_auto_insurance_data
+    return generate_auto_insurance_data(n_samples, seed=seed)
+
+
+def train_shard(index: int, n_shards: int, n_samples: int, n_trees: int, out_dir,
+                source: str = "database", base_seed: int = 42,
+                max_policy_id: int = None, params: dict = None) -> Path:
+    """
+    Worker: sample, fit n_trees trees per forest, write the shard file.
+    max_policy_id should be the same for every shard (the coordinator's
+    watermark); if omitted on a DB run, the worker reads its own.
+    """
+    seed = shard_seed(base_seed, index)
+    if source == "database" and max_policy_id is None:
+        from .db_loader import get_policy_watermark
+        max_policy_id = get_policy_watermark()
+    elif source == "snapshot":
+        from .snapshot import read_manifest
+        max_policy_id = read_manifest()["watermark"]
+
+    df = _sample(source, n_samples, seed, max_policy_id)
+    encoders, tier_enc = canonical_encoders()
+    X, _  = encode(df, encoders, fit=False)
+    y_cls = tier_enc.transform(df["risk_tier"].astype(str))
+    y_reg = df["annual_premium_jpy"].values
+
+    rf = forest_params({**(params or {}), "n_estimators": n_trees})
+    clf = RandomForestClassifier(random_state=seed % (2 ** 31), n_jobs=-1, **rf).fit(X, y_cls)
+    reg = RandomForestRegressor(random_state=seed % (2 ** 31), n_jobs=-1, **rf).fit(X, y_reg)
+
+    out = Path(out_dir) / f"shard-{index}-of-{n_shards}.pkl"
+    out.parent.mkdir(parents=True, exist_ok=True)
+    tmp = out.with_name(out.name + ".tmp")
+    with open(tmp, "wb") as f:
+        pickle.dump({
+            "classifier": clf, "regressor": reg, "index": index, "n_shards": n_shards,
+            "seed": seed, "base_seed": base_seed, "n_rows": len(df), "source": source,
+            "policy_watermark": max_policy_id, "params": rf,
+        }, f, protocol=pickle.HIGHEST_PROTOCOL)
+    os.replace(tmp, out)
+    log.info("Shard %d/%d: %s rows, %d trees → %s", index, n_shards, f"{len(df):,}", n_trees, out)
+    return out
+
+
+def load_shards(shard_dir) -> list:
+    """Load every shard in shard_dir; all n shards of one run must be present."""
+    paths = sorted(Path(shard_dir).glob("shard-*-of-*.pkl"))
+    if not paths:
+        raise FileNotFoundError(f"No shard files in {shard_dir}")
+    shards = []
+    for p in paths:
+        with open(p, "rb") as f:
+            shards.append(pickle.load(f))
+    n = shards[0]["n_shards"]
+    got = sorted(s["index"] for s in shards)
+    if got != list(range(n)) or any(s["n_shards"] != n for s in shards):
+        raise RuntimeError(f"Incomplete shard set in {shard_dir}: have {got}, expected 0..{n - 1}")
+    return shards
+
+
+def merge_shards(shard_dir, eval_samples: int = 100_000, save: bool = True) -> dict:
+    """
+    Coordinator: merge all shards into standard artifacts, evaluate on a
+    holdout sample drawn with a seed no shard used, and save. Database and
+    snapshot holdouts overlap the training rows: their scores are
+    optimistic and flagged in_sample.
+    """
+    shards = sorted(load_shards(shard_dir), key=lambda s: s["index"])
+    source = shards[0]["source"]
+    info   = [{"index": s["index"], "seed": s["seed"], "rows": s["n_rows"],
+               "trees": len(s["classifier"].estimators_)} for s in shards]
+    clf = merge_forests([s["classifier"] for s in shards])
+    reg = merge_forests([s["regressor"] for s in shards])
+
+    encoders, tier_enc = canonical_encoders()
+    watermarks = [s["policy_watermark"] for s in shards if s["policy_watermark"] is not None]
+    watermark  = min(watermarks) if watermarks else None
+
+    # index n_shards: a seed none of the workers used
+    holdout = _sample(source, eval_samples, shard_seed(shards[0]["base_seed"], len(shards)),
+                      watermark)
+    X_te, _ = encode(holdout, encoders, fit=False)
+    yc_te   = tier_enc.transform(holdout["risk_tier"].astype(str))
+    yr_te   = holdout["annual_premium_jpy"].values
+    yr_pred = reg.predict(X_te)
+
+    clf_report = classification_report(
+        yc_te, clf.predict(X_te), labels=np.arange(len(tier_enc.classes_)),
+        target_names=tier_enc.classes_, output_dict=True, zero_division=0,
+    )
+    reg_metrics = {
+        "mae": float(mean_absolute_error(yr_te, yr_pred)),
+        "r2":  float(r2_score(yr_te, yr_pred)),
+    }
+    n_rows    = sum(s["n_rows"] for s in shards)
+    in_sample = source in ("database", "snapshot")
+
+    artifacts = {
+        "classifier":         clf,
+        "regressor":          reg,
+        "feature_encoders":   encoders,
+        "tier_encoder":       tier_enc,
+        "feature_names":      ALL_FEATURES,
+        "metrics":            {
+            "classification": clf_report, "regression": reg_metrics,
+            "holdout": {"rows": len(holdout), "source": source, "in_sample": in_sample},
+            "forest": {
+                "classifier_trees": len(clf.estimators_),
+                "regressor_trees":  len(reg.estimators_),
+                "params":           {**shards[0]["params"], "n_estimators": len(clf.estimators_)},
+                "shards":           info,
+            },
+        },
+        "feature_importance": {
+            "classification": dict(zip(ALL_FEATURES, clf.feature_importances_.tolist())),
+            "regression":     dict(zip(ALL_FEATURES, reg.feature_importances_.tolist())),
+        },
+        "training_samples":   n_rows,
+        "trained_with_excel": False,
+        "training_source":    f"{source}_distributed_{len(shards)}",
+        "policy_watermark":   watermark,
+    }
+    if save:
+        save_artifacts(artifacts)
+
+    print(f"✅  Merged {len(shards)} shards ({n_rows:,} rows, {len(clf.estimators_)} trees)")
+    print(f"    Accuracy {clf_report['accuracy']:.3f}  R² {reg_metrics['r2']:.3f}  "
+          f"MAE ¥{reg_metrics['mae']:,.0f}  (holdout {len(holdout):,}"
+          f"{', overlaps training rows' if in_sample else ''})")
+    return artifacts
@@ -4,6 +4,8 @@ Parses the Japan actuarial rating manual Excel file and exposes
 factor tables as Python dicts for use by the hybrid rating engine.
 """
 from pathlib import Path
+import numpy as np
+import pandas as pd
 import openpyxl
 
 EXCEL_PATH = Path(__file__).parent.parent / "data" / "japan_auto_rating_manual.xlsx"
@@ -160,3 +162,69 @@ def excel_calculate_premium(inputs: dict, factors: dict) -> dict:
         "annual_premium_jpy":  round(total),
         "monthly_premium_jpy": round(total / 12),
     }
+
+
+# Component order of the vectorized tables
+COMPONENTS = ["bi", "pd", "vehicle", "passenger"]
+_BASE_DEFAULTS = {"bi": 38000, "pd": 31000, "vehicle": 68000, "passenger": 11000}
+
+
+def _codes(col: pd.Series, vocab: list) -> np.ndarray:
+    """Position of each value in vocab, -1 if absent (categoricals: no re-parse)."""
+    if isinstance(col.dtype, pd.CategoricalDtype) and list(col.cat.categories) == list(vocab):
+        return col.cat.codes.to_numpy()
+    return pd.Categorical(col.astype(str), categories=vocab).codes
+
+
+def excel_calculate_premiums(df: pd.DataFrame, factors: dict) -> pd.DataFrame:
+    """
+    Vectorized excel_calculate_premium over every row of df (columns
+    ncd_grade, age_condition, prefecture_code, vehicle_rating_class,
+    driver_restriction). Each factor sheet becomes a small lookup array;
+    rows index into it by code, with unknown keys falling back exactly as
+    the scalar chain does (an extra default row at index -1).
+    Returns float per-coverage premiums plus annual_premium_jpy (unrounded).
+    """
+    n_comp = len(COMPONENTS)
+
+    # NCD: row per grade 0..max, missing grades → grade 6
+    ncd_f   = factors["ncd"]
+    top     = max(ncd_f)
+    ncd_tab = np.array([[ncd_f.get(g, ncd_f[6])[c] for c in COMPONENTS] for g in range(top + 1)])
+    grade   = df["ncd_grade"].to_numpy(dtype=np.int64)
+    grade   = np.where((grade >= 0) & (grade <= top), grade, 6)
+
+    age_keys = list(factors["age"])
+    age_tab  = np.array([[factors["age"][k][c] for c in COMPONENTS]
+                         for k in age_keys + ["26+"]])
+
+    # bi / pd / passenger use the bi_pd factor, vehicle its own
+    pick      = ["bi_pd", "bi_pd", "vehicle", "bi_pd"]
+    pref_keys = list(factors["prefecture"])
+    pref_tab  = np.array([[factors["prefecture"][k][f] for f in pick] for k in pref_keys]
+                         + [[1.0] * n_comp])
+    dr_keys   = list(factors["driver_restriction"])
+    dr_tab    = np.array([[factors["driver_restriction"][k][f] for f in pick]
+                          for k in dr_keys + ["none"]])
+
+    # Nearest base-premium class, resolved once per distinct vehicle class
+    bp        = factors["base_premiums"]
+    available = sorted(bp["bi"].keys())
+    vcls, inv = np.unique(df["vehicle_rating_class"].to_numpy(dtype=np.int64), return_inverse=True)
+    nearest   = [min(available, key=lambda c: abs(c - v)) for v in vcls]
+    base_tab  = np.array([[bp[c].get(cls, _BASE_DEFAULTS[c]) for c in COMPONENTS]
+                          for cls in nearest]).reshape(-1, n_comp)
+
+    pref = df["prefecture_code"]
+    if not isinstance(pref.dtype, pd.CategoricalDtype):
+        pref = pref.astype(str).str.zfill(2)
+
+    comp = (base_tab[inv]
+            * ncd_tab[grade]
+            * age_tab[_codes(df["age_condition"], age_keys)]
+            * pref_tab[_codes(pref, pref_keys)]
+            * dr_tab[_codes(df["driver_restriction"], dr_keys)])
+
+    out = pd.DataFrame(comp, columns=[f"{c}_premium" for c in COMPONENTS], index=df.index)
+    out["annual_premium_jpy"] = comp.sum(axis=1)
+    return out
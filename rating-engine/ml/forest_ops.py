@@ -0,0 +1,61 @@
+"""
+forest_ops.py
+Operations on fitted scikit-learn Random Forests that the estimator API
+doesn't offer: replacing the oldest trees with new ones (incremental
+refresh) and combining independently trained forests.
+
+Both rely on a forest being a list of independent trees in estimators_;
+predictions average over that list, so trees trained elsewhere can be
+swapped in as long as features and classes line up.
+"""
+import numpy as np
+from sklearn.base import clone
+
+_STALE_ATTRS = ("oob_score_", "oob_decision_function_", "oob_prediction_")
+
+
+def _reset_derived(forest):
+    """Drop attributes computed from the old tree set."""
+    for attr in _STALE_ATTRS:
+        if hasattr(forest, attr):
+            delattr(forest, attr)
+    forest.n_estimators = len(forest.estimators_)
+    return forest
+
+
+def check_compatible(base, other):
+    """Raise ValueError unless other's trees can be mixed into base."""
+    if base.n_features_in_ != other.n_features_in_:
+        raise ValueError(f"Feature count mismatch: {base.n_features_in_} vs {other.n_features_in_}")
+    if hasattr(base, "classes_") and not np.array_equal(base.classes_, other.classes_):
+        raise ValueError(f"Class mismatch: {list(base.classes_)} vs {list(other.classes_)} "
+                         "— every tier must be present in the new rows")
+
+
+def grow_sliding_window(forest, X, y, n_trees: int, seed: int, sample_weight=None):
+    """
+    Fit n_trees new trees on (X, y) only, append them, and retire the
+    n_trees oldest so the forest size stays fixed. Returns the number of
+    trees replaced.
+    """
+    fresh = clone(forest).set_params(n_estimators=n_trees, warm_start=False,
+                                     oob_score=False, random_state=seed)
+    fresh.fit(X, y, sample_weight=sample_weight)
+    check_compatible(forest, fresh)
+
+    size = len(forest.estimators_)
+    forest.estimators_ = (forest.estimators_ + fresh.estimators_)[-size:]
+    _reset_derived(forest)
+    return min(n_trees, size)
+
+
+def merge_forests(forests: list):
+    """
+    Combine independently trained forests into one by concatenating their
+    trees. The first forest is extended in place and returned.
+    """
+    merged = forests[0]
+    for other in forests[1:]:
+        check_compatible(merged, other)
+        merged.estimators_ = merged.estimators_ + other.estimators_
+    return _reset_derived(merged)
@@ -0,0 +1,200 @@
+"""
+pgcopy.py
+=========
+PostgreSQL binary COPY format for fixed-width integer columns.
+
+When every selected column is a NOT NULL int2/int4/int8, every tuple in
+a binary COPY stream has the same byte layout:
+
+    int16 field count, then per field: int32 length, big-endian value
+
+so a run of tuples is a NumPy structured array. BinaryCopyDecoder is the
+file-like sink for cursor.copy_expert("COPY (SELECT ...) TO STDOUT
+(FORMAT binary)"): it buffers the incoming row messages and, once per
+DECODE_BYTES, reinterprets all complete tuples with np.frombuffer and
+copies each field into a preallocated native-endian array. No Python
+object is created per row or per value.
+
+Non-integer columns (enums, CHAR codes) are cast to small integer codes
+in the SELECT, see db_loader.
+
+encode_binary_copy() goes the other way for bulk loads (db/seeds): it
+lays out a whole COPY FROM stream from NumPy columns, one strided copy
+per column. Besides fixed-width int / bool / date fields it takes
+text-like columns (enum, varchar, char — all sent as UTF-8 bytes) either
+as fixed-width byte strings or as codes into a small vocabulary, so rows
+may differ in length.
+
+Usage:
+    dec = BinaryCopyDecoder([("ncd_grade", "int2"), ("annual_km", "int4")], capacity=n)
+    cur.copy_expert(f"COPY ({select}) TO STDOUT (FORMAT binary)", dec)
+    arrays = dec.finish()
+
+    data = encode_binary_copy([("int2", years), ("text", (codes, ["Low", "High"]))])
+    cur.copy_expert("COPY t (policy_year, risk_tier) FROM STDIN (FORMAT binary)", io.BytesIO(data))
+"""
+
+import numpy as np
+
+SIGNATURE    = b"PGCOPY\n\xff\r\n\x00"
+HEADER_FIXED = len(SIGNATURE) + 8            # + flags int32 + extension length int32
+TRAILER      = b"\xff\xff"
+DECODE_BYTES = 4 << 20                       # decode once this much is buffered
+
+PG_TYPES = {"int2": np.int16, "int4": np.int32, "int8": np.int64}
+# wire layout of fixed-width values in COPY FROM
+ENCODE_TYPES = {"int2": ">i2", "int4": ">i4", "int8": ">i8", "bool": "u1", "date": ">i4"}
+PG_EPOCH     = np.datetime64("2000-01-01", "D")    # binary dates count days from here
+ENCODE_BLOCK = 8192                                # rows laid out per pass
+
+
+class CopyFormatError(ValueError):
+    """The COPY stream does not have the expected binary layout."""
+
+
+class BinaryCopyDecoder:
+
+    def __init__(self, fields: list, capacity: int = 0):
+        self.names  = [name for name, _ in fields]
+        layout      = [("_nfields", ">i2")]
+        for i, (name, pgtype) in enumerate(fields):
+            width = np.dtype(PG_TYPES[pgtype]).itemsize
+            layout += [(f"_len{i}", ">i4"), (name, f">i{width}")]
+        self.row_dtype = np.dtype(layout)
+        self.widths    = [np.dtype(PG_TYPES[t]).itemsize for _, t in fields]
+        self.arrays    = {name: np.empty(capacity, PG_TYPES[t]) for name, t in fields}
+        self.n         = 0
+        self._buf      = bytearray()
+        self._header   = False
+
+    # file-like interface used by copy_expert
+    def write(self, data) -> int:
+        self._buf += data
+        if len(self._buf) >= DECODE_BYTES:
+            self._drain()
+        return len(data)
+
+    def _parse_header(self) -> bool:
+        if len(self._buf) < HEADER_FIXED:
+            return False
+        if bytes(self._buf[:len(SIGNATURE)]) != SIGNATURE:
+            raise CopyFormatError("Missing PGCOPY signature")
+        ext = int.from_bytes(self._buf[HEADER_FIXED - 4:HEADER_FIXED], "big")
+        if len(self._buf) < HEADER_FIXED + ext:
+            return False
+        del self._buf[:HEADER_FIXED + ext]
+        self._header = True
+        return True
+
+    def _drain(self):
+        if not self._header and not self._parse_header():
+            return
+        k = len(self._buf) // self.row_dtype.itemsize
+        if not k:
+            return
+        rec = np.frombuffer(self._buf, dtype=self.row_dtype, count=k)
+        if (rec["_nfields"] != len(self.names)).any():
+            raise CopyFormatError("Unexpected field count (or trailer) inside row data")
+        for i, w in enumerate(self.widths):
+            if (rec[f"_len{i}"] != w).any():
+                raise CopyFormatError(f"Column {self.names[i]!r} has NULLs or a different width")
+
+        end = self.n + k
+        if end > len(self.arrays[self.names[0]]):
+            grow = max(end, 2 * len(self.arrays[self.names[0]]))
+            for name in self.names:
+                arr = np.empty(grow, self.arrays[name].dtype)
+                arr[:self.n] = self.arrays[name][:self.n]
+                self.arrays[name] = arr
+        for name in self.names:
+            self.arrays[name][self.n:end] = rec[name]
+        del rec
+        del self._buf[:k * self.row_dtype.itemsize]
+        self.n = end
+
+    def finish(self) -> dict:
+        """Decode the remainder, check the trailer, return {name: array[:n]}."""
+        # the trailer may sit right behind a partial decode boundary
+        tail = bytes(self._buf[-len(TRAILER):])
+        if tail != TRAILER:
+            raise CopyFormatError("COPY stream ended without trailer")
+        del self._buf[-len(TRAILER):]
+        self._drain()
+        if self._buf:
+            raise CopyFormatError(f"{len(self._buf)} trailing bytes after last row")
+        return {name: arr[:self.n] for name, arr in self.arrays.items()}
+
+
+def _vocab_words(vocab: list) -> tuple:
+    """(padded length word + UTF-8 table as a 'V' array, used-byte table or None)."""
+    words = [v.encode("utf-8") for v in vocab]
+    width = 4 + max(len(w) for w in words)
+    table = np.zeros((len(words), width), np.uint8)
+    for i, w in enumerate(words):
+        table[i, :4 + len(w)] = np.frombuffer(len(w).to_bytes(4, "big") + w, np.uint8)
+    if len({len(w) for w in words}) == 1:
+        return table.view(f"V{width}").ravel(), None
+    used = (np.arange(width) < np.array([4 + len(w) for w in words])[:, None]).view(np.uint8)
+    return table.view(f"V{width}").ravel(), used.view(f"V{width}").ravel()
+
+
+def encode_binary_copy(fields: list) -> bytes:
+    """
+    Complete binary COPY FROM stream (header, rows, trailer) for columns
+    given as (pgtype, values):
+      int2 / int4 / int8 / bool   integer or bool NumPy arrays
+      date                        datetime64[D] arrays
+      text                        an 'S' array whose values all fill its
+                                  itemsize, or (codes, vocab) with vocab a
+                                  list of str
+    Values are never NULL. Rows are laid out at fixed offsets in a
+    structured array (each vocabulary column padded to its longest word),
+    one typed strided copy per field; a boolean compress then drops the
+    padding when some vocabulary has words of different lengths.
+    """
+    layout, values, masks = [("nfields", ">i2")], {}, {}
+    for i, (pgtype, col) in enumerate(fields):
+        if pgtype == "text" and isinstance(col, tuple):
+            codes, vocab = col
+            table, used = _vocab_words(vocab)
+            layout.append((f"f{i}", table.dtype))
+            values[f"f{i}"] = table[np.asarray(codes, np.intp)]
+            if used is not None:
+                masks[f"f{i}"] = used[np.asarray(codes, np.intp)]
+            continue
+        if pgtype == "text":
+            col = np.asarray(col)
+            if col.dtype.kind != "S":
+                raise TypeError("Fixed-width text needs a bytes ('S') array or (codes, vocab)")
+            wire = col.dtype
+        elif pgtype == "date":
+            col, wire = (np.asarray(col, "datetime64[D]") - PG_EPOCH).astype(np.int64), ">i4"
+        else:
+            wire = ENCODE_TYPES[pgtype]
+        layout += [(f"len{i}", ">i4"), (f"f{i}", wire)]
+        values[f"len{i}"] = np.dtype(wire).itemsize
+        values[f"f{i}"]   = col
+
+    n    = len(next(v for v in values.values() if np.ndim(v)))
+    row  = np.dtype(layout)
+    rec  = np.empty(n, row)
+    keep = np.ones((n, row.itemsize), np.uint8) if masks else None
+    if masks:
+        # 1 per byte to send: everything except vocabulary padding
+        fmask = np.dtype({"names":    list(masks),
+                          "formats":  [row.fields[f][0] for f in masks],
+                          "offsets":  [row.fields[f][1] for f in masks],
+                          "itemsize": row.itemsize})
+        keep_rec = keep.view(fmask).ravel()
+    # field by field within cache-sized row blocks, not across the whole array
+    for lo in range(0, n, ENCODE_BLOCK):
+        hi = lo + ENCODE_BLOCK
+        rec["nfields"][lo:hi] = len(fields)
+        for name, v in values.items():
+            rec[name][lo:hi] = v[lo:hi] if np.ndim(v) else v
+        for name, m in masks.items():
+            keep_rec[name][lo:hi] = m[lo:hi]
+    body = rec.view(np.uint8)
+    if masks:
+        body = body[keep.view(bool).ravel()]
+    return b"".join((SIGNATURE, bytes(8), body.tobytes(), TRAILER))
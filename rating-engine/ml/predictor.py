@@ -190,9 +190,22 @@ def get_model_info():
         "feature_names":      arts["feature_names"],
         "metrics":            arts["metrics"],
         "feature_importance": arts["feature_importance"],
+        "policy_watermark":   arts.get("policy_watermark"),
+        # per-phase seconds / peak RSS of the run that built this model
+        "training_profile":   arts["metrics"].get("profile"),
     }
 
 
+def swap_model():
+    """
+    Load freshly written artifacts and swap them in with a single
+    assignment, so in-flight predictions never block on the unpickle.
+    """
+    global _artifacts
+    with open(MODEL_PATH, "rb") as f:
+        _artifacts = pickle.load(f)
+
+
 def reload():
     global _artifacts, _excel_factors
     _artifacts = _excel_factors = None
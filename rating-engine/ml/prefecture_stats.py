@@ -0,0 +1,122 @@
+"""
+prefecture_stats.py
+===================
+Prefecture × policy-year statistics for GET /stats/prefecture, served from
+the incrementally maintained prefecture_stats table
+(db/migrations/003_prefecture_stats.sql) — never from japan_auto_policies.
+
+The whole summary (47 prefectures × years, counts, sums and a premium
+histogram each) is read at most once per PREF_STATS_TTL_S and kept in
+process. Filters and roll-ups (all years of a prefecture, all prefectures
+of a year, everything) add counts, sums and histograms, so a combined
+median is as accurate as a per-cell one: within one ¥1,000 bin.
+
+Configuration (.env):
+    PREF_STATS_TTL_S    in-process cache lifetime in seconds (default 60)
+
+Usage:
+    rows = summarize(await load_stats_async(), prefecture_codes=["13"], group_by="prefecture")
+"""
+
+import os
+import logging
+from pathlib import Path
+
+import numpy as np
+from dotenv import load_dotenv
+
+from .db_pool import async_connection, AsyncCursor, cached_async
+from .sketch import HistogramSketch
+
+load_dotenv(Path(__file__).parent.parent / ".env")
+
+log = logging.getLogger(__name__)
+
+PREF_STATS_TTL_S = float(os.getenv("PREF_STATS_TTL_S", 60))
+# (lo, hi, bin width) — must match premium_hist_bin() in 003_prefecture_stats.sql
+PREMIUM_HIST     = (0, 1_000_000, 1_000)
+GROUP_BY         = ("cell", "prefecture", "year", "all")
+
+STATS_SQL = """
+    SELECT prefecture_code, policy_year, total_policies, sum_premium_jpy,
+           sum_ncd_grade, claim_count, premium_hist, updated_at
+    FROM prefecture_stats
+    ORDER BY prefecture_code, policy_year
+"""
+
+
+async def load_stats_async() -> dict:
+    """Column arrays of prefecture_stats, cached for PREF_STATS_TTL_S."""
+    async def query():
+        async with async_connection() as conn:
+            cur  = await AsyncCursor(conn).execute(STATS_SQL)
+            rows = cur.fetchall()
+        n_bins = len(HistogramSketch(*PREMIUM_HIST).counts)
+        hist   = np.array([r[6] for r in rows], dtype=np.int64).reshape(len(rows), n_bins)
+        return {
+            "prefecture_code": np.array([r[0] for r in rows], dtype=object),
+            "policy_year":     np.array([r[1] for r in rows], dtype=np.int64),
+            "total_policies":  np.array([r[2] for r in rows], dtype=np.int64),
+            "sum_premium_jpy": np.array([r[3] for r in rows], dtype=np.int64),
+            "sum_ncd_grade":   np.array([r[4] for r in rows], dtype=np.int64),
+            "claim_count":     np.array([r[5] for r in rows], dtype=np.int64),
+            "premium_hist":    hist,
+            "updated_at":      max((r[7] for r in rows), default=None),
+        }
+    return await cached_async("prefecture_stats", PREF_STATS_TTL_S, query)
+
+
+def summarize(stats: dict, prefecture_codes=None, policy_years=None,
+              group_by: str = "cell") -> list:
+    """
+    Rows in the column layout of the old mv_prefecture_stats, one per
+    (prefecture, year) cell or rolled up by group_by; the merged-away key
+    is None. policy_years is a year or an inclusive (first, last) pair.
+    """
+    if group_by not in GROUP_BY:
+        raise ValueError(f"group_by must be one of {GROUP_BY}")
+
+    mask = np.ones(len(stats["policy_year"]), dtype=bool)
+    if prefecture_codes is not None:
+        codes = [prefecture_codes] if isinstance(prefecture_codes, str) else prefecture_codes
+        mask &= np.isin(stats["prefecture_code"], [str(c).zfill(2) for c in codes])
+    if policy_years is not None:
+        first, last = (policy_years, policy_years) if isinstance(policy_years, int) else policy_years
+        mask &= (stats["policy_year"] >= first) & (stats["policy_year"] <= last)
+
+    pref = stats["prefecture_code"][mask] if group_by in ("cell", "prefecture") \
+        else np.full(mask.sum(), None, dtype=object)
+    year = stats["policy_year"][mask] if group_by in ("cell", "year") \
+        else np.full(mask.sum(), None, dtype=object)
+    keys = list(zip(pref, year))
+    # group ids in first-seen order; the table is sorted by (prefecture, year)
+    index, gid = {}, np.empty(len(keys), dtype=np.int64)
+    for i, key in enumerate(keys):
+        gid[i] = index.setdefault(key, len(index))
+
+    def add(column):
+        out = np.zeros((len(index),) + stats[column].shape[1:], dtype=np.int64)
+        np.add.at(out, gid, stats[column][mask])
+        return out
+
+    total, premium, ncd, claims, hist = (add(c) for c in (
+        "total_policies", "sum_premium_jpy", "sum_ncd_grade", "claim_count", "premium_hist"))
+
+    rows = []
+    for g, (p, y) in enumerate(index):
+        n = int(total[g])
+        if not n:
+            continue
+        sk = HistogramSketch.from_counts(*PREMIUM_HIST, hist[g])
+        rows.append({
+            "prefecture_code":    p,
+            "policy_year":        None if y is None else int(y),
+            "total_policies":     n,
+            "avg_premium_jpy":    int(round(premium[g] / n)),
+            "median_premium_jpy": int(sk.quantiles([0.5])[0]),
+            "avg_ncd_grade":      round(ncd[g] / n, 2),
+            "claim_rate_pct":     round(100.0 * claims[g] / n, 2),
+        })
+    if group_by == "year":
+        rows.sort(key=lambda r: r["policy_year"])
+    return rows
@@ -0,0 +1,102 @@
+"""
+profiler.py
+===========
+Per-phase wall time, CPU time and peak memory for training runs.
+
+Peak memory is the resident-set high-water mark (VmHWM). On Linux the
+mark is reset at the start of every phase by writing "5" to
+/proc/self/clear_refs, so each phase reports its own peak. Where that is
+not available the process-lifetime peak (getrusage ru_maxrss) is
+recorded instead and the summary says so with peak_scope="process".
+
+Tree building runs in native threads inside this process, so RSS covers
+it; tracemalloc would not see sklearn's C allocations.
+
+Usage:
+    prof = PhaseProfiler()
+    with prof.phase("encode"):
+        X, enc = encode(df)
+    yield prof.event(pct=8)        # progress dict carrying the record
+    artifacts["metrics"]["profile"] = prof.summary()
+"""
+
+import sys
+import time
+import resource
+from contextlib import contextmanager
+
+_STATUS     = "/proc/self/status"
+_CLEAR_REFS = "/proc/self/clear_refs"
+
+
+def _status_mb(field: str):
+    """VmHWM / VmRSS from /proc/self/status in MB, or None off Linux."""
+    try:
+        with open(_STATUS) as f:
+            for line in f:
+                if line.startswith(field + ":"):
+                    return int(line.split()[1]) / 1024
+    except OSError:
+        pass
+    return None
+
+
+def _reset_peak() -> bool:
+    try:
+        with open(_CLEAR_REFS, "w") as f:
+            f.write("5")
+        return True
+    except OSError:
+        return False
+
+
+def _maxrss_mb() -> float:
+    rss = resource.getrusage(resource.RUSAGE_SELF).ru_maxrss
+    # bytes on macOS, kB elsewhere
+    return rss / (1024 * 1024) if sys.platform == "darwin" else rss / 1024
+
+
+class PhaseProfiler:
+    """Collects one record per named phase; phases run sequentially."""
+
+    def __init__(self):
+        self.phases     = []
+        self._started   = time.perf_counter()
+        self._per_phase = _reset_peak() and _status_mb("VmHWM") is not None
+
+    @contextmanager
+    def phase(self, name: str):
+        if self._per_phase:
+            _reset_peak()
+        rss0 = _status_mb("VmRSS")
+        t0, c0 = time.perf_counter(), time.process_time()
+        try:
+            yield
+        finally:
+            peak = _status_mb("VmHWM") if self._per_phase else _maxrss_mb()
+            rss1 = _status_mb("VmRSS")
+            self.phases.append({
+                "name":         name,
+                "seconds":      round(time.perf_counter() - t0, 3),
+                "cpu_seconds":  round(time.process_time() - c0, 3),
+                "peak_rss_mb":  round(peak, 1),
+                "rss_delta_mb": None if rss0 is None or rss1 is None else round(rss1 - rss0, 1),
+            })
+
+    @property
+    def last(self) -> dict:
+        return self.phases[-1] if self.phases else None
+
+    def event(self, pct: int) -> dict:
+        """Progress dict for the phase that just finished."""
+        p = self.last
+        return {"phase": f"{p['name']}: {p['seconds']:.2f}s, peak {p['peak_rss_mb']:,.0f} MB",
+                "pct": pct, "profile": p}
+
+    def summary(self) -> dict:
+        return {
+            "phases":        list(self.phases),
+            "total_seconds": round(time.perf_counter() - self._started, 3),
+            "peak_rss_mb":   max((p["peak_rss_mb"] for p in self.phases), default=None),
+            "peak_scope":    "phase" if self._per_phase else "process",
+        }
@@ -0,0 +1,298 @@
+"""
+snapshot.py
+===========
+Local Parquet snapshot of japan_auto_policies for DB-sourced training
+without going back to Postgres for the same historical rows.
+
+Layout (hive partitioning, one directory per policy year and prefecture):
+
+    SNAPSHOT_DIR/
+        _snapshot.json                          manifest: watermark + syncs
+        policy_year=2019/prefecture_code=13/s000001.parquet
+        policy_year=2019/prefecture_code=13/s000002.parquet
+        ...
+
+Each sync exports rows with watermark < policy_id <= MAX(policy_id) year by
+year through the server-side cursor in db_loader.iter_policies and writes
+one file per touched partition, tagged with the sync number. The manifest
+is replaced atomically after all files are closed: readers only see files
+of committed syncs, and files left behind by an interrupted sync are
+removed by the next one. Rows are immutable once written, so a sync never
+rewrites earlier files. The watermark stops before the first gap in the
+seeder's ledger (db_loader.get_policy_watermark), so seeder batches that
+commit out of id order are exported by a later sync; other transactions
+committing ids below the watermark are not revisited — sync after ingest
+has finished, or rebuild.
+
+Samples are read with memory-mapped I/O: partitions outside the year /
+prefecture filters are pruned by path, the sample is allocated across the
+remaining row groups from Parquet metadata alone, and only row groups
+that receive rows are decoded.
+
+Configuration (.env):
+    SNAPSHOT_DIR        snapshot directory (default rating-engine/data/snapshot)
+    SNAPSHOT_ROW_GROUP  rows per Parquet row group (default 131072)
+
+Usage:
+    from ml.snapshot import sync_snapshot, sample_snapshot
+    sync_snapshot()                                  # first run exports everything
+    df = sample_snapshot(1_000_000, seed=7, policy_years=(2020, 2024))
+"""
+
+import os
+import json
+import time
+import shutil
+import logging
+from datetime import datetime, timezone
+from pathlib import Path
+
+import numpy as np
+import pandas as pd
+import pyarrow as pa
+import pyarrow.parquet as pq
+from dotenv import load_dotenv
+
+load_dotenv(Path(__file__).parent.parent / ".env")
+
+log = logging.getLogger(__name__)
+
+SNAPSHOT_DIR       = Path(os.getenv("SNAPSHOT_DIR") or
+                          Path(__file__).parent.parent / "data" / "snapshot")
+SNAPSHOT_ROW_GROUP = int(os.getenv("SNAPSHOT_ROW_GROUP", 131_072))
+MANIFEST           = "_snapshot.json"
+
+
+class SnapshotMissingError(RuntimeError):
+    """No committed snapshot at the configured location."""
+
+
+# ── Manifest ────────────────────────────────────────────────────────────
+
+def read_manifest(root: Path = None) -> dict:
+    p = Path(root or SNAPSHOT_DIR) / MANIFEST
+    if not p.exists():
+        return {"watermark": 0, "rows": 0, "syncs": []}
+    return json.loads(p.read_text())
+
+
+def _write_manifest(root: Path, manifest: dict):
+    tmp = root / (MANIFEST + ".tmp")
+    tmp.write_text(json.dumps(manifest, indent=2))
+    os.replace(tmp, root / MANIFEST)
+
+
+def _committed_files(root: Path, manifest: dict) -> list:
+    tags = {s["tag"] for s in manifest["syncs"]}
+    return sorted(str(p) for p in root.glob("policy_year=*/prefecture_code=*/*.parquet")
+                  if p.stem in tags)
+
+
+def _remove_uncommitted(root: Path, manifest: dict):
+    tags = {s["tag"] for s in manifest["syncs"]}
+    for p in root.glob("policy_year=*/prefecture_code=*/*.parquet"):
+        if p.stem not in tags:
+            log.info("Removing %s left by an interrupted sync", p)
+            p.unlink()
+
+
+# ── Export / incremental sync ───────────────────────────────────────────
+
+class _PartitionWriter:
+    """One Parquet file for a (year, prefecture) partition, written in row groups."""
+
+    def __init__(self, path: Path):
+        self.path, self.writer, self.buf, self.n = path, None, [], 0
+
+    def add(self, table: pa.Table):
+        self.buf.append(table)
+        self.n += table.num_rows
+        if self.n >= SNAPSHOT_ROW_GROUP:
+            self.flush()
+
+    def flush(self):
+        if not self.buf:
+            return
+        table = pa.concat_tables(self.buf)
+        if self.writer is None:
+            self.path.parent.mkdir(parents=True, exist_ok=True)
+            self.writer = pq.ParquetWriter(self.path, table.schema)
+        self.writer.write_table(table, row_group_size=SNAPSHOT_ROW_GROUP)
+        self.buf, self.n = [], 0
+
+    def close(self):
+        self.flush()
+        if self.writer is not None:
+            self.writer.close()
+
+
+def _year_range(lo_id: int, hi_id: int) -> tuple:
+    from .db_loader import _fetchone
+    row = _fetchone("""SELECT MIN(policy_year), MAX(policy_year) FROM japan_auto_policies
+                       WHERE policy_id BETWEEN %s AND %s""", (lo_id, hi_id))
+    return (int(row[0]), int(row[1])) if row and row[0] is not None else None
+
+
+def _export_year(root: Path, tag: str, year: int, lo_id: int, hi_id: int,
+                 chunk_rows: int) -> int:
+    from .db_loader import iter_policies
+    writers, rows = {}, 0
+    try:
+        for df in iter_policies(chunk_rows=chunk_rows, policy_years=year,
+                                min_policy_id=lo_id, max_policy_id=hi_id):
+            codes = df["prefecture_code"].cat.codes.to_numpy()
+            order = np.argsort(codes, kind="stable")
+            table = pa.Table.from_pandas(df.drop(columns="prefecture_code").iloc[order],
+                                         preserve_index=False)
+            cuts  = np.flatnonzero(np.diff(codes[order])) + 1
+            for start, stop in zip(np.r_[0, cuts], np.r_[cuts, len(order)]):
+                pref = df["prefecture_code"].cat.categories[codes[order[start]]]
+                w = writers.get(pref)
+                if w is None:
+                    w = writers[pref] = _PartitionWriter(
+                        root / f"policy_year={year}" / f"prefecture_code={pref}" / f"{tag}.parquet")
+                w.add(table.slice(start, stop - start))
+            rows += len(df)
+    finally:
+        for w in writers.values():
+            w.close()
+    return rows
+
+
+def sync_snapshot(root: Path = None, rebuild: bool = False, chunk_rows: int = 100_000) -> dict:
+    """
+    Append policies above the snapshot watermark (all rows on the first
+    run) and return the updated manifest. rebuild=True exports a fresh
+    snapshot next to the old one and swaps it in when complete.
+    """
+    from .db_loader import get_policy_watermark
+
+    root = Path(root or SNAPSHOT_DIR)
+    if rebuild:
+        target = root.with_name(root.name + ".rebuild")
+        shutil.rmtree(target, ignore_errors=True)
+        manifest = sync_snapshot(target, chunk_rows=chunk_rows)
+        old = root.with_name(root.name + ".old")
+        shutil.rmtree(old, ignore_errors=True)
+        if root.exists():
+            os.replace(root, old)
+        os.replace(target, root)
+        shutil.rmtree(old, ignore_errors=True)
+        return manifest
+
+    root.mkdir(parents=True, exist_ok=True)
+    manifest = read_manifest(root)
+    _remove_uncommitted(root, manifest)
+
+    lo, hi = manifest["watermark"] + 1, get_policy_watermark()
+    years  = _year_range(lo, hi) if hi >= lo else None
+    if years is None:
+        log.info("Snapshot up to date at policy_id %s", f"{manifest['watermark']:,}")
+        return manifest
+
+    tag  = f"s{len(manifest['syncs']) + 1:06d}"
+    t0   = time.time()
+    rows = 0
+    for year in range(years[0], years[1] + 1):
+        rows += _export_year(root, tag, year, lo, hi, chunk_rows)
+        log.info("Snapshot %s: policy_year %d done (%s rows so far)", tag, year, f"{rows:,}")
+
+    manifest["syncs"].append({
+        "tag": tag, "min_id": lo, "max_id": hi, "rows": rows,
+        "seconds": round(time.time() - t0, 1),
+        "synced_at": datetime.now(timezone.utc).isoformat(timespec="seconds"),
+    })
+    manifest["watermark"] = hi
+    manifest["rows"]     += rows
+    _write_manifest(root, manifest)
+    log.info("Snapshot %s: %s rows up to policy_id %s in %.1fs",
+             tag, f"{rows:,}", f"{hi:,}", time.time() - t0)
+    return manifest
+
+
+# ── Sampling ────────────────────────────────────────────────────────────
+
+def _partition_of(path: str) -> tuple:
+    """(policy_year, prefecture_code) from a hive partition path."""
+    parts = dict(seg.split("=", 1) for seg in Path(path).parts[-3:-1])
+    return int(parts["policy_year"]), parts["prefecture_code"]
+
+
+def _keep(policy_years=None, prefecture_codes=None):
+    """Partition predicate for the sample filters."""
+    years = prefs = None
+    if policy_years is not None:
+        first, last = (policy_years, policy_years) if isinstance(policy_years, int) else policy_years
+        years = (int(first), int(last))
+    if prefecture_codes is not None:
+        codes = [prefecture_codes] if isinstance(prefecture_codes, str) else list(prefecture_codes)
+        prefs = {str(c).zfill(2) for c in codes}
+
+    def keep(year, pref):
+        return ((years is None or years[0] <= year <= years[1])
+                and (prefs is None or pref in prefs))
+    return keep
+
+
+def sample_snapshot(n_samples: int, seed: int = None, policy_years=None,
+                    prefecture_codes=None, root: Path = None) -> pd.DataFrame:
+    """
+    Uniform sample (without replacement) of n_samples rows from the
+    committed snapshot, in the column layout of db_loader.load_training_data.
+    The result depends only on (seed, filters, snapshot contents).
+    df.attrs["policy_watermark"] is the snapshot watermark.
+    """
+    from .db_loader import TRAINING_FIELDS, PREF_LABELS
+
+    root     = Path(root or SNAPSHOT_DIR)
+    manifest = read_manifest(root)
+    files    = _committed_files(root, manifest)
+    if not files:
+        raise SnapshotMissingError(f"No snapshot in {root} — run snapshot_policies.py sync")
+
+    keep = _keep(policy_years, prefecture_codes)
+    handles, groups = [], []                 # groups: (file index, row group, row count)
+    for path in files:
+        year, pref = _partition_of(path)
+        if not keep(year, pref):
+            continue
+        pf = pq.ParquetFile(path, memory_map=True)
+        handles.append((pf, pref))
+        meta = pf.metadata
+        groups += [(len(handles) - 1, i, meta.row_group(i).num_rows)
+                   for i in range(meta.num_row_groups)]
+    sizes = np.array([n for _, _, n in groups], dtype=np.int64)
+    if not sizes.sum():
+        raise RuntimeError("No snapshot rows match the filters")
+
+    n   = min(int(n_samples), int(sizes.sum()))
+    rng = np.random.default_rng(seed)
+    # exact without-replacement allocation of the sample across row groups
+    per_group = rng.multivariate_hypergeometric(sizes, n)
+
+    columns = [name for name, _, _ in TRAINING_FIELDS if name != "prefecture_code"]
+    picks   = {}                             # file index -> [(row group, rows in group)]
+    for (f, g, size), k in zip(groups, per_group):
+        if k:
+            picks.setdefault(f, []).append((g, np.sort(rng.choice(size, k, replace=False))))
+
+    parts, prefs = [], []
+    for f, sel in picks.items():
+        pf, pref = handles[f]
+        # one read per file, of only the row groups that received rows
+        table = pf.read_row_groups([g for g, _ in sel], columns=columns)
+        sizes_read = [pf.metadata.row_group(g).num_rows for g, _ in sel]
+        starts     = np.cumsum([0] + sizes_read[:-1])
+        idx = np.concatenate([start + rows for start, (_, rows) in zip(starts, sel)])
+        parts.append(table.take(idx))
+        prefs.append(np.full(len(idx), PREF_LABELS.index(pref), dtype=np.int8))
+
+    df = pa.concat_tables(parts).to_pandas()
+    df["prefecture_code"] = pd.Categorical.from_codes(np.concatenate(prefs),
+                                                      categories=PREF_LABELS)
+    df = df[[name for name, _, _ in TRAINING_FIELDS]]
+    df.attrs["policy_watermark"] = manifest["watermark"]
+    log.info("Sampled %s rows from snapshot (%s rows, watermark %s, %d row groups read)",
+             f"{len(df):,}", f"{int(sizes.sum()):,}", f"{manifest['watermark']:,}",
+             int((per_group > 0).sum()))
+    return df
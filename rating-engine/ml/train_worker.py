@@ -0,0 +1,262 @@
+"""
+train_worker.py
+===============
+Runs a training job in a separate OS process so retraining never competes
+with live quoting for the API process's GIL, memory or CPU.
+
+The worker loads (or generates) its own training data, applies the
+configured CPU affinity / niceness / memory limit to itself, trains, and
+hands the model back through the filesystem: trainer.py writes
+rf_artifacts.pkl atomically, and only lightweight progress dicts cross the
+process boundary.
+
+Configuration (.env):
+    TRAIN_CPU_AFFINITY     CPUs the trainer may use, e.g. "2-7" or "4,5,6"
+                           (empty = inherit the API process affinity)
+    TRAIN_NICE             niceness increment for the trainer (default 10)
+    TRAIN_MEMORY_LIMIT_MB  address-space limit for the trainer (0 = none)
+
+Usage:
+    from ml.train_worker import run_training
+    for event in run_training({"source": "synthetic", "n_samples": 100_000}):
+        ...
+"""
+
+import os
+import atexit
+import logging
+import multiprocessing as mp
+import queue as q_module
+import threading
+from pathlib import Path
+from typing import Generator
+
+from dotenv import load_dotenv
+
+load_dotenv(Path(__file__).parent.parent / ".env")
+
+log = logging.getLogger(__name__)
+
+TRAIN_CPU_AFFINITY    = os.getenv("TRAIN_CPU_AFFINITY", "")
+TRAIN_NICE            = int(os.getenv("TRAIN_NICE", 10))
+TRAIN_MEMORY_LIMIT_MB = int(os.getenv("TRAIN_MEMORY_LIMIT_MB", 0))
+
+# Request keys forwarded to trainer.train_models_streaming
+TRAIN_OPTIONS = ("oob_score", "early_stopping", "oob_tol", "dedupe", "params")
+# Request keys forwarded to db_loader.load_training_data (database source)
+SAMPLING_OPTIONS = ("policy_years", "prefecture_codes", "stratify_by", "quotas")
+
+MIN_REFRESH_ROWS = 1000
+
+# spawn, not fork: the API process runs uvicorn + threads, which must not be
+# duplicated into the child.
+_ctx = mp.get_context("spawn")
+
+_active_lock = threading.Lock()
+_active      = None
+
+
+class TrainingBusyError(RuntimeError):
+    """Raised when a training process is already running."""
+
+
+def _parse_cpu_list(spec: str) -> set:
+    """Parse "0-3,6" style CPU lists into a set of ints."""
+    cpus = set()
+    for part in filter(None, (p.strip() for p in spec.split(","))):
+        if "-" in part:
+            lo, hi = part.split("-", 1)
+            cpus.update(range(int(lo), int(hi) + 1))
+        else:
+            cpus.add(int(part))
+    return cpus
+
+
+def _apply_limits():
+    """Runs inside the child before any data is touched."""
+    if TRAIN_NICE:
+        os.nice(TRAIN_NICE)
+
+    cpus = _parse_cpu_list(TRAIN_CPU_AFFINITY)
+    if cpus and hasattr(os, "sched_setaffinity"):
+        os.sched_setaffinity(0, cpus)
+
+    if TRAIN_MEMORY_LIMIT_MB:
+        import resource
+        limit = TRAIN_MEMORY_LIMIT_MB * 1024 * 1024
+        resource.setrlimit(resource.RLIMIT_AS, (limit, limit))
+
+
+def load_dataset(spec: dict, report=None):
+    """
+    Build the training DataFrame described by spec, going through the
+    on-disk dataset cache (ml/dataset_cache.py). report(dict) receives
+    progress events. Returns (df, source_label).
+    """
+    report = report or (lambda item: None)
+    from .dataset_cache import get_or_build, file_hash
+
+    source    = spec.get("source", "synthetic")
+    n_samples = int(spec.get("n_samples", 10000))
+    seed      = int(spec.get("seed", 42))
+    use_cache = bool(spec.get("use_cache", True))
+
+    if source == "database":
+        from .db_loader import load_training_data, is_db_available, get_policy_watermark
+        if not is_db_available():
+            raise RuntimeError("Database not available")
+        report({"phase": "Querying database...", "pct": 2})
+        watermark = get_policy_watermark()
+        sampling  = {k: spec[k] for k in SAMPLING_OPTIONS if spec.get(k) is not None}
+        # same seed + watermark + sampling options -> the same REPEATABLE sample
+        params = {"source": "database", "n_samples": n_samples, "seed": seed,
+                  "policy_watermark": watermark, **sampling}
+        df, hit = get_or_build(params, lambda: load_training_data(n_samples=n_samples,
+                                                                   max_policy_id=watermark,
+                                                                   seed=seed, **sampling),
+                               use_cache=use_cache)
+        df.attrs["policy_watermark"] = watermark
+        origin = "dataset cache" if hit else "DB"
+        report({"phase": f"Loaded {len(df):,} rows from {origin}", "pct": 7})
+        return df, "database"
+
+    if source == "snapshot":
+        from .db_loader import load_training_data
+        report({"phase": "Sampling local snapshot...", "pct": 2})
+        # memory-mapped Parquet reads — as fast as the dataset cache, so not cached
+        sampling = {k: spec[k] for k in ("policy_years", "prefecture_codes")
+                    if spec.get(k) is not None}
+        df = load_training_data(n_samples, seed=seed, source="snapshot", **sampling)
+        report({"phase": f"Sampled {len(df):,} rows from snapshot "
+                         f"(watermark {df.attrs['policy_watermark']:,})", "pct": 7})
+        return df, "snapshot"
+
+    from .data_generator import generate_auto_insurance_data, CHUNK_ROWS, GENERATOR_VERSION
+    from .excel_reader import load_all_factors, EXCEL_PATH
+    excel_sha = file_hash(EXCEL_PATH)
+    report({"phase": "Preparing synthetic data...", "pct": 2})
+    params = {"source": "synthetic", "n_samples": n_samples, "seed": seed,
+              "excel_sha": excel_sha, "chunk_rows": CHUNK_ROWS,
+              "generator": GENERATOR_VERSION}
+
+    def build():
+        ef = load_all_factors(EXCEL_PATH) if excel_sha else None
+        # one generator process per CPU this worker may use
+        return generate_auto_insurance_data(n_samples, excel_factors=ef, seed=seed,
+                                            workers=None)
+
+    df, hit = get_or_build(params, build, use_cache=use_cache)
+    verb = "Loaded cached" if hit else "Generated"
+    report({"phase": f"{verb} {len(df):,} rows", "pct": 7})
+    return df, "synthetic" + ("_excel_anchored" if excel_sha else "")
+
+
+def _refresh_stream(spec: dict, report):
+    """Incremental refresh job: new trees on policies above the watermark."""
+    import pickle
+    from .db_loader import load_policies_after, is_db_available
+    from .trainer import refresh_models_streaming, MODEL_DIR
+
+    with open(MODEL_DIR / "rf_artifacts.pkl", "rb") as f:
+        artifacts = pickle.load(f)
+    watermark = artifacts.get("policy_watermark")
+    if watermark is None:
+        raise RuntimeError("Model has no policy_id watermark — train from the database first")
+    if not is_db_available():
+        raise RuntimeError("Database not available")
+
+    report({"phase": f"Loading policies above id {watermark:,}...", "pct": 2})
+    df_new = load_policies_after(watermark, limit=int(spec.get("max_rows", 1_000_000)))
+    if len(df_new) < MIN_REFRESH_ROWS:
+        raise RuntimeError(f"Only {len(df_new):,} new policies above watermark "
+                           f"{watermark:,} (need {MIN_REFRESH_ROWS:,})")
+    return refresh_models_streaming(artifacts, df_new, n_trees=int(spec.get("n_trees", 10)))
+
+
+def _worker_main(spec: dict, out_q):
+    """Child-process entry point. Always terminates the stream with None."""
+    try:
+        _apply_limits()
+
+        if spec.get("mode") == "refresh":
+            stream = _refresh_stream(spec, out_q.put)
+        else:
+            from .trainer import train_models_streaming
+            from .profiler import PhaseProfiler
+            prof = PhaseProfiler()
+            with prof.phase("load_data"):
+                df, label = load_dataset(spec, out_q.put)
+            out_q.put(prof.event(7))
+            options = {k: spec[k] for k in TRAIN_OPTIONS if k in spec}
+            stream = train_models_streaming(df, source=label, profiler=prof, **options)
+
+        for item in stream:
+            # models stay in the child — the parent reads rf_artifacts.pkl
+            out_q.put({k: v for k, v in item.items() if k != "artifacts"})
+    except MemoryError:
+        out_q.put({"error": f"Training exceeded TRAIN_MEMORY_LIMIT_MB={TRAIN_MEMORY_LIMIT_MB}",
+                   "pct": 0})
+    except Exception as e:
+        out_q.put({"error": str(e), "pct": 0})
+    finally:
+        out_q.put(None)
+
+
+@atexit.register
+def _terminate_active():
+    # registered after multiprocessing's own exit hook, so it runs first
+    if is_training():
+        _active.terminate()
+
+
+def is_training() -> bool:
+    return _active is not None and _active.is_alive()
+
+
+def run_training(spec: dict) -> Generator:
+    """
+    Start a training process for spec and yield its progress dicts.
+
+    spec: {"source": "synthetic" | "database" | "snapshot", "n_samples": int,
+           "seed": int, "use_cache": bool, **TRAIN_OPTIONS, **SAMPLING_OPTIONS}
+       or {"mode": "refresh", "n_trees": int, "max_rows": int}
+    Yields the same dicts as trainer.train_models_streaming (minus the
+    in-memory artifacts); an {"error": ...} dict is yielded if the child
+    fails or dies without reporting.
+
+    The process is started, or TrainingBusyError raised, by the call
+    itself, not on the first iteration.
+    """
+    global _active
+    with _active_lock:
+        if is_training():
+            raise TrainingBusyError("A training run is already in progress")
+        out_q = _ctx.Queue()
+        # not daemonic: the trainer may start its own data-generation pool;
+        # _terminate_active stops it when the API process exits
+        proc  = _ctx.Process(target=_worker_main, args=(spec, out_q), name="rf-trainer")
+        proc.start()
+        _active = proc
+
+    log.info("Started training process pid=%s spec=%s", proc.pid, spec)
+    return _relay(proc, out_q)
+
+
+def _relay(proc, out_q) -> Generator:
+    try:
+        while True:
+            try:
+                item = out_q.get(timeout=5)
+            except q_module.Empty:
+                if not proc.is_alive():
+                    yield {"error": f"Training process exited with code {proc.exitcode}",
+                           "pct": 0}
+                    return
+                continue
+            if item is None:
+                return
+            yield item
+    finally:
+        proc.join(timeout=30)
+        if proc.is_alive():
+            proc.terminate()
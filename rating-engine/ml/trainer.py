@@ -1,5 +1,7 @@
+import os
 import pickle
 import logging
+import warnings
 from pathlib import Path
 from typing import Generator
 
@@ -10,6 +12,9 @@ from sklearn.metrics import classification_report, mean_absolute_error, r2_score
 from sklearn.model_selection import train_test_split
 from sklearn.preprocessing import LabelEncoder
 
+from .forest_ops import grow_sliding_window
+from .profiler import PhaseProfiler
+
 log = logging.getLogger(__name__)
 
 MODEL_DIR    = Path(__file__).parent.parent / "models"
@@ -20,6 +25,32 @@ NUMERICAL    = ["ncd_grade","annual_km","driver_age","num_accidents",
 ALL_FEATURES = NUMERICAL + CATEGORICAL
 N_TREES      = 150
 CHUNK        = 10
+# Forest hyperparameters — override per run with train_models(params=...);
+# tune.py searches over these keys.
+RF_PARAMS    = {"n_estimators": N_TREES, "max_depth": 14,
+                "min_samples_split": 5, "min_samples_leaf": 2}
+TUNABLE      = (*RF_PARAMS, "max_features")   # max_features: sklearn default unless set
+OOB_TOL      = 0.001   # min OOB accuracy / R² gain per chunk to keep growing
+OOB_PATIENCE = 2       # consecutive sub-tolerance chunks before stopping
+
+
+def canonical_encoders():
+    """
+    Feature and tier encoders fitted on the full category vocabularies
+    rather than on a sample, so independently trained models (distributed
+    shards) share identical encodings.
+    """
+    from .data_generator import (AGE_CONDS, PREF_CODES, VEH_CLASSES, DRIVER_RESTR,
+                                 KM_BANDS, RISK_TIERS)
+    vocab = {
+        "age_condition":        AGE_CONDS,
+        "prefecture_code":      PREF_CODES,
+        "vehicle_rating_class": [str(v) for v in VEH_CLASSES],
+        "driver_restriction":   DRIVER_RESTR,
+        "annual_km_band":       KM_BANDS,
+    }
+    encoders = {col: LabelEncoder().fit(vocab[col]) for col in CATEGORICAL}
+    return encoders, LabelEncoder().fit(RISK_TIERS)
 
 
 def encode(df, encoders=None, fit=True):
@@ -36,85 +67,216 @@ def encode(df, encoders=None, fit=True):
     return df[ALL_FEATURES], encoders
 
 
-def train_models(df: pd.DataFrame, source: str = "synthetic") -> dict:
+def save_artifacts(artifacts: dict, path: Path = None) -> Path:
+    """
+    Write artifacts to a temp file and rename it over rf_artifacts.pkl, so a
+    concurrent reader sees either the old model or the new one — never a
+    half-written pickle.
+    """
+    path = Path(path) if path else MODEL_DIR / "rf_artifacts.pkl"
+    path.parent.mkdir(parents=True, exist_ok=True)
+    tmp = path.with_name(f"{path.name}.{os.getpid()}.tmp")
+    with open(tmp, "wb") as f:
+        pickle.dump(artifacts, f, protocol=pickle.HIGHEST_PROTOCOL)
+    os.replace(tmp, path)
+    return path
+
+
+def forest_params(params: dict = None) -> dict:
+    """RF_PARAMS overlaid with params; unknown keys are rejected."""
+    merged = dict(RF_PARAMS)
+    for k, v in (params or {}).items():
+        if k not in TUNABLE:
+            raise ValueError(f"Unknown forest parameter {k!r}; expected one of {list(TUNABLE)}")
+        merged[k] = v
+    return merged
+
+
+def collapse_duplicates(X: pd.DataFrame, y_cls: np.ndarray, y_reg: np.ndarray):
+    """
+    Collapse identical encoded feature rows into weighted unique rows.
+
+    Returns two (X, y, sample_weight) triples:
+      classifier — one row per (profile, tier) weighted by its count, so each
+                   profile keeps its observed tier distribution;
+      regressor  — one row per profile with the mean premium as target,
+                   weighted by the profile count.
+    A single weighted split scores the same impurity decrease as on the
+    raw rows, but the forest is an approximation, not the same model:
+    bootstrap draws and min_samples_split / min_samples_leaf count unique
+    rows rather than weight, so trees sample and stop differently. Fit
+    cost scales with distinct profiles instead of rows.
+    """
+    ids = X.groupby(list(X.columns), sort=False).ngroup().to_numpy()
+
+    counts = np.bincount(ids)
+    _, first = np.unique(ids, return_index=True)
+    reg = (X.iloc[first], np.bincount(ids, weights=y_reg) / counts, counts.astype(float))
+
+    n_cls = int(y_cls.max()) + 1
+    keys, first_c, counts_c = np.unique(ids * n_cls + y_cls,
+                                        return_index=True, return_counts=True)
+    cls = (X.iloc[first_c], (keys % n_cls).astype(y_cls.dtype), counts_c.astype(float))
+    return cls, reg
+
+
+def train_models(df: pd.DataFrame, source: str = "synthetic", **options) -> dict:
     """Blocking train — used by non-streaming /train endpoint."""
     artifacts = None
-    for item in train_models_streaming(df, source):
+    for item in train_models_streaming(df, source, **options):
         if item.get("done"):
             artifacts = item["artifacts"]
     return artifacts
 
 
-def train_models_streaming(df: pd.DataFrame, source: str = "synthetic") -> Generator:
+def _grow_forest(model, X, y, label: str, pct_lo: int, pct_hi: int, n_trees: int,
+                 oob_score: bool, early_stopping: bool, oob_tol: float,
+                 sample_weight=None) -> Generator:
+    """
+    Grow a warm_start forest CHUNK trees at a time up to n_trees, yielding a
+    progress dict per chunk. With oob_score the out-of-bag accuracy / R² is
+    computed after each chunk; with early_stopping growth stops once it has
+    improved by less than oob_tol for OOB_PATIENCE consecutive chunks.
+    sklearn's OOB score is unweighted, so on collapsed rows it is measured
+    per distinct profile. Returns (via StopIteration) the fitted model.
+    """
+    model.set_params(oob_score=oob_score or early_stopping)
+    best, stale = -np.inf, 0
+
+    steps = list(range(CHUNK, n_trees, CHUNK)) + [n_trees]
+    for n in steps:
+        model.n_estimators = n
+        with warnings.catch_warnings():
+            # early chunks leave a few rows without any OOB tree
+            warnings.simplefilter("ignore", UserWarning)
+            model.fit(X, y, sample_weight=sample_weight)
+
+        pct  = pct_lo + int((n / n_trees) * (pct_hi - pct_lo))
+        item = {"phase": f"{label}: {n}/{n_trees} trees", "pct": pct, "n_trees": n}
+        if model.oob_score:
+            item["oob_score"] = round(float(model.oob_score_), 5)
+        yield item
+
+        if early_stopping:
+            if model.oob_score_ - best < oob_tol:
+                stale += 1
+            else:
+                stale = 0
+            best = max(best, model.oob_score_)
+            if stale >= OOB_PATIENCE and n < n_trees:
+                yield {"phase": f"{label}: OOB converged at {n} trees", "pct": pct_hi,
+                       "n_trees": n, "oob_score": round(float(model.oob_score_), 5)}
+                break
+
+    return model
+
+
+def train_models_streaming(df: pd.DataFrame, source: str = "synthetic",
+                           oob_score: bool = False, early_stopping: bool = False,
+                           oob_tol: float = OOB_TOL, dedupe: bool = False,
+                           save: bool = True, params: dict = None,
+                           profiler: PhaseProfiler = None) -> Generator:
     """
     Generator that yields real progress dicts as trees are built.
     Uses warm_start so each chunk of 10 trees is a real training step.
+    oob_score / early_stopping: see _grow_forest.
+    dedupe: train on weighted unique rows (collapse_duplicates); the
+            held-out evaluation still uses the raw test rows.
+    save:   write rf_artifacts.pkl (benchmarks pass False).
+    params: forest hyperparameter overrides (see RF_PARAMS).
+    profiler: PhaseProfiler already holding earlier phases (e.g. data
+            loading in train_worker); a new one is started if omitted.
+            Its summary is stored in metrics["profile"].
 
-    Yields: {"phase": str, "pct": int}
+    Yields: {"phase": str, "pct": int[, "n_trees": int, "oob_score": float]}
+            and after every profiled phase {..., "profile": {name, seconds,
+            cpu_seconds, peak_rss_mb, rss_delta_mb}}
     Final:  {"phase": "Complete", "pct": 100, "done": True,
              "result": {...metrics...}, "artifacts": {...}}
     """
     MODEL_DIR.mkdir(parents=True, exist_ok=True)
+    rf      = forest_params(params)
+    n_trees = int(rf.pop("n_estimators"))
+    prof    = profiler or PhaseProfiler()
 
     yield {"phase": "Encoding features...", "pct": 8}
 
-    X, encoders = encode(df, fit=True)
-    tier_enc = LabelEncoder()
-    y_cls = tier_enc.fit_transform(df["risk_tier"].astype(str))
-    y_reg = df["annual_premium_jpy"].values
+    with prof.phase("encode"):
+        X, encoders = encode(df, fit=True)
+        tier_enc = LabelEncoder()
+        y_cls = tier_enc.fit_transform(df["risk_tier"].astype(str))
+        y_reg = df["annual_premium_jpy"].values
 
-    X_tr, X_te, yc_tr, yc_te, yr_tr, yr_te = train_test_split(
-        X, y_cls, y_reg, test_size=0.2, random_state=42
-    )
+        X_tr, X_te, yc_tr, yc_te, yr_tr, yr_te = train_test_split(
+            X, y_cls, y_reg, test_size=0.2, random_state=42
+        )
+    yield prof.event(8)
+    grow_opts = {"n_trees": n_trees, "oob_score": oob_score,
+                 "early_stopping": early_stopping, "oob_tol": oob_tol}
+
+    cls_fit = (X_tr, yc_tr, None)
+    reg_fit = (X_tr, yr_tr, None)
+    if dedupe:
+        yield {"phase": "Collapsing duplicate feature rows...", "pct": 9}
+        with prof.phase("dedupe"):
+            cls_fit, reg_fit = collapse_duplicates(X_tr, yc_tr, yr_tr)
+        yield prof.event(9)
+        yield {"phase": f"{len(X_tr):,} rows → {len(reg_fit[0]):,} unique profiles",
+               "pct": 9, "unique_rows": len(reg_fit[0])}
 
     # ── Classifier ──────────────────────────────────────────────────────
-    yield {"phase": f"Classifier: 0/{N_TREES} trees", "pct": 9}
+    yield {"phase": f"Classifier: 0/{n_trees} trees", "pct": 9}
 
     clf = RandomForestClassifier(
-        n_estimators=CHUNK, warm_start=True, max_depth=14,
-        min_samples_split=5, min_samples_leaf=2,
-        random_state=42, n_jobs=None,
+        n_estimators=CHUNK, warm_start=True, random_state=42, n_jobs=None, **rf,
     )
-    clf.fit(X_tr, yc_tr)
-    yield {"phase": f"Classifier: {CHUNK}/{N_TREES} trees", "pct": 11}
-
-    for n in range(CHUNK * 2, N_TREES + 1, CHUNK):
-        clf.n_estimators = n
-        clf.fit(X_tr, yc_tr)
-        pct = 11 + int(((n - CHUNK) / (N_TREES - CHUNK)) * 38)
-        yield {"phase": f"Classifier: {n}/{N_TREES} trees", "pct": pct}
+    with prof.phase("classifier_fit"):
+        clf = yield from _grow_forest(clf, cls_fit[0], cls_fit[1], "Classifier", 9, 49,
+                                      sample_weight=cls_fit[2], **grow_opts)
+    yield prof.event(49)
 
     yield {"phase": "Evaluating classifier...", "pct": 50}
-    yc_pred    = clf.predict(X_te)
-    clf_report = classification_report(
-        yc_te, yc_pred, target_names=tier_enc.classes_, output_dict=True
-    )
+    with prof.phase("classifier_eval"):
+        yc_pred    = clf.predict(X_te)
+        clf_report = classification_report(
+            yc_te, yc_pred, target_names=tier_enc.classes_, output_dict=True
+        )
+    yield prof.event(50)
 
     # ── Regressor ───────────────────────────────────────────────────────
-    yield {"phase": f"Regressor: 0/{N_TREES} trees", "pct": 51}
+    yield {"phase": f"Regressor: 0/{n_trees} trees", "pct": 51}
 
     reg = RandomForestRegressor(
-        n_estimators=CHUNK, warm_start=True, max_depth=14,
-        min_samples_split=5, min_samples_leaf=2,
-        random_state=42, n_jobs=None,
+        n_estimators=CHUNK, warm_start=True, random_state=42, n_jobs=None, **rf,
     )
-    reg.fit(X_tr, yr_tr)
-    yield {"phase": f"Regressor: {CHUNK}/{N_TREES} trees", "pct": 53}
-
-    for n in range(CHUNK * 2, N_TREES + 1, CHUNK):
-        reg.n_estimators = n
-        reg.fit(X_tr, yr_tr)
-        pct = 53 + int(((n - CHUNK) / (N_TREES - CHUNK)) * 37)
-        yield {"phase": f"Regressor: {n}/{N_TREES} trees", "pct": pct}
+    with prof.phase("regressor_fit"):
+        reg = yield from _grow_forest(reg, reg_fit[0], reg_fit[1], "Regressor", 51, 90,
+                                      sample_weight=reg_fit[2], **grow_opts)
+    yield prof.event(90)
 
     yield {"phase": "Evaluating regressor...", "pct": 91}
-    yr_pred     = reg.predict(X_te)
-    reg_metrics = {
-        "mae": float(mean_absolute_error(yr_te, yr_pred)),
-        "r2":  float(r2_score(yr_te, yr_pred)),
-    }
+    with prof.phase("regressor_eval"):
+        yr_pred     = reg.predict(X_te)
+        reg_metrics = {
+            "mae": float(mean_absolute_error(yr_te, yr_pred)),
+            "r2":  float(r2_score(yr_te, yr_pred)),
+        }
+    yield prof.event(91)
+
+    if save:
+        yield {"phase": "Saving rf_artifacts.pkl...", "pct": 95}
 
-    yield {"phase": "Saving rf_artifacts.pkl...", "pct": 95}
+    forest = {
+        "classifier_trees": len(clf.estimators_),
+        "regressor_trees":  len(reg.estimators_),
+        "early_stopping":   early_stopping,
+        "dedupe":           dedupe,
+        "params":           {"n_estimators": n_trees, **rf},
+        "fit_rows":         {"classifier": len(cls_fit[0]), "regressor": len(reg_fit[0])},
+    }
+    if clf.oob_score:
+        forest["classifier_oob_accuracy"] = float(clf.oob_score_)
+        forest["regressor_oob_r2"]        = float(reg.oob_score_)
 
     artifacts = {
         "classifier":         clf,
@@ -122,7 +284,8 @@ def train_models_streaming(df: pd.DataFrame, source: str = "synthetic") -> Gener
         "feature_encoders":   encoders,
         "tier_encoder":       tier_enc,
         "feature_names":      ALL_FEATURES,
-        "metrics":            {"classification": clf_report, "regression": reg_metrics},
+        "metrics":            {"classification": clf_report, "regression": reg_metrics,
+                               "forest": forest, "profile": prof.summary()},
         "feature_importance": {
             "classification": dict(zip(ALL_FEATURES, clf.feature_importances_.tolist())),
             "regression":     dict(zip(ALL_FEATURES, reg.feature_importances_.tolist())),
@@ -130,10 +293,15 @@ def train_models_streaming(df: pd.DataFrame, source: str = "synthetic") -> Gener
         "training_samples":   len(df),
         "trained_with_excel": False,
         "training_source":    source,
+        # DB runs: highest policy_id eligible for the sample (see refresh_models_streaming)
+        "policy_watermark":   df.attrs.get("policy_watermark"),
     }
 
-    with open(MODEL_DIR / "rf_artifacts.pkl", "wb") as f:
-        pickle.dump(artifacts, f)
+    if save:
+        # the pickled profile stops before its own save; result has the full one
+        with prof.phase("save"):
+            save_artifacts(artifacts)
+        yield prof.event(99)
 
     result = {
         "message":                 "Training complete",
@@ -142,10 +310,91 @@ def train_models_streaming(df: pd.DataFrame, source: str = "synthetic") -> Gener
         "classification_accuracy": round(clf_report["accuracy"], 4),
         "regression_r2":           round(reg_metrics["r2"], 4),
         "regression_mae_jpy":      round(reg_metrics["mae"]),
+        "classifier_trees":        forest["classifier_trees"],
+        "regressor_trees":         forest["regressor_trees"],
+        "profile":                 prof.summary(),
     }
 
     print(f"✅  Training complete ({len(df):,} samples — source: {source})")
     print(f"    Accuracy {clf_report['accuracy']:.3f}  R² {reg_metrics['r2']:.3f}  MAE ¥{reg_metrics['mae']:,.0f}")
+    print("    " + "  ".join(f"{p['name']} {p['seconds']:.1f}s/{p['peak_rss_mb']:,.0f}MB"
+                             for p in result["profile"]["phases"]))
+
+    yield {"phase": "Complete", "pct": 100, "done": True,
+           "result": result, "artifacts": artifacts}
+
+
+def refresh_models_streaming(artifacts: dict, df_new: pd.DataFrame, n_trees: int = CHUNK,
+                             save: bool = True) -> Generator:
+    """
+    Incremental refresh: train n_trees new trees per forest on df_new only
+    (policies above artifacts["policy_watermark"]) and retire the same
+    number of oldest trees, so forest size — and inference cost — stays
+    fixed while refresh cost scales with the new rows.
+
+    df_new must carry policy_id. 20% of it is held out to report how the
+    refreshed models score on the newest business. Yields progress dicts in
+    the same shape as train_models_streaming.
+    """
+    wm_from = artifacts.get("policy_watermark")
+    wm_to   = int(df_new["policy_id"].max())
+    clf, reg = artifacts["classifier"], artifacts["regressor"]
+
+    yield {"phase": f"Encoding {len(df_new):,} new policies...", "pct": 10}
+    X, _  = encode(df_new, artifacts["feature_encoders"], fit=False)
+    y_cls = artifacts["tier_encoder"].transform(df_new["risk_tier"].astype(str))
+    y_reg = df_new["annual_premium_jpy"].values
+
+    X_tr, X_te, yc_tr, yc_te, yr_tr, yr_te = train_test_split(
+        X, y_cls, y_reg, test_size=0.2, random_state=42
+    )
+    seed = wm_to % (2 ** 31)
+
+    yield {"phase": f"Classifier: {n_trees} new trees on {len(X_tr):,} rows", "pct": 20}
+    try:
+        clf_replaced = grow_sliding_window(clf, X_tr, yc_tr, n_trees, seed)
+    except ValueError as e:
+        clf_replaced = 0
+        yield {"phase": f"Classifier unchanged: {e}", "pct": 50}
+
+    yield {"phase": f"Regressor: {n_trees} new trees on {len(X_tr):,} rows", "pct": 55}
+    reg_replaced = grow_sliding_window(reg, X_tr, yr_tr, n_trees, seed)
+
+    yield {"phase": "Evaluating on newest policies...", "pct": 85}
+    yr_pred = reg.predict(X_te)
+    refresh = {
+        "watermark_from":   wm_from,
+        "watermark_to":     wm_to,
+        "new_rows":         len(df_new),
+        "classifier_trees_replaced": clf_replaced,
+        "regressor_trees_replaced":  reg_replaced,
+        "accuracy_new":     float((clf.predict(X_te) == yc_te).mean()),
+        "r2_new":           float(r2_score(yr_te, yr_pred)),
+        "mae_new":          float(mean_absolute_error(yr_te, yr_pred)),
+    }
+
+    artifacts["policy_watermark"] = wm_to
+    artifacts["metrics"].setdefault("refreshes", []).append(refresh)
+    artifacts["feature_importance"] = {
+        "classification": dict(zip(ALL_FEATURES, clf.feature_importances_.tolist())),
+        "regression":     dict(zip(ALL_FEATURES, reg.feature_importances_.tolist())),
+    }
+
+    if save:
+        yield {"phase": "Saving rf_artifacts.pkl...", "pct": 95}
+        save_artifacts(artifacts)
+
+    result = {
+        "message":             "Refresh complete",
+        "new_rows":            len(df_new),
+        "policy_watermark":    wm_to,
+        "classifier_trees_replaced": clf_replaced,
+        "regressor_trees_replaced":  reg_replaced,
+        "accuracy_new":        round(refresh["accuracy_new"], 4),
+        "r2_new":              round(refresh["r2_new"], 4),
+        "mae_new_jpy":         round(refresh["mae_new"]),
+    }
+    print(f"✅  Refresh complete ({len(df_new):,} new policies, watermark {wm_from} → {wm_to})")
 
     yield {"phase": "Complete", "pct": 100, "done": True,
            "result": result, "artifacts": artifacts}
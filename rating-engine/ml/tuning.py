@@ -0,0 +1,204 @@
+"""
+tuning.py
+=========
+Successive-halving hyperparameter search for the Random Forest pair.
+
+The training data is encoded once and published as float32 matrices in
+POSIX shared memory; every worker in the process pool attaches to the same
+pages instead of receiving a pickled copy per candidate (float32 is also
+the dtype sklearn's tree builder uses internally, so fits don't copy X).
+
+Each rung fits every surviving candidate (classifier + regressor, the same
+params for both as in trainer.py) on a growing prefix of the shuffled
+training rows, scores it on a fixed validation split, and keeps the best
+1/eta. Every evaluation is written to a leaderboard with accuracy, R²,
+train time and single-row inference latency, so models can be chosen on
+cost as well as score.
+
+Usage:
+    from ml.tuning import successive_halving
+    board = successive_halving(df, n_candidates=27, eta=3, workers=4)
+"""
+
+import json
+import time
+import logging
+import itertools
+from concurrent.futures import ProcessPoolExecutor
+import multiprocessing as mp
+from multiprocessing import shared_memory
+from pathlib import Path
+
+import numpy as np
+import pandas as pd
+from sklearn.ensemble import RandomForestClassifier, RandomForestRegressor
+from sklearn.metrics import accuracy_score, r2_score
+from sklearn.model_selection import train_test_split
+from sklearn.preprocessing import LabelEncoder
+
+from .trainer import encode, MODEL_DIR, forest_params
+
+log = logging.getLogger(__name__)
+
+LEADERBOARD_PATH = MODEL_DIR / "tuning_leaderboard.json"
+
+SEARCH_SPACE = {
+    "n_estimators":      [50, 100, 150],
+    "max_depth":         [10, 14, 18, None],
+    "min_samples_split": [2, 5, 10],
+    "min_samples_leaf":  [1, 2, 5],
+    "max_features":      ["sqrt", 0.5, 1.0],
+}
+LATENCY_CALLS = 30      # single-row predictions timed per candidate
+
+_shared = {}            # worker-side: name -> ndarray view over shared memory
+
+
+# ── Shared-memory plumbing ──────────────────────────────────────────────
+
+def _publish(arrays: dict):
+    """Copy arrays into new shared-memory blocks; returns (blocks, descriptors)."""
+    blocks, desc = [], {}
+    for name, arr in arrays.items():
+        arr = np.ascontiguousarray(arr)
+        shm = shared_memory.SharedMemory(create=True, size=max(arr.nbytes, 1))
+        np.ndarray(arr.shape, arr.dtype, buffer=shm.buf)[...] = arr
+        blocks.append(shm)
+        desc[name] = (shm.name, arr.shape, arr.dtype.str)
+    return blocks, desc
+
+
+def _attach(desc: dict):
+    """Pool initializer: map the parent's shared blocks read-only."""
+    for name, (shm_name, shape, dtype) in desc.items():
+        # pool workers share the parent's resource tracker, which owns the
+        # blocks and unlinks them in successive_halving's finally
+        shm = shared_memory.SharedMemory(name=shm_name)
+        view = np.ndarray(shape, np.dtype(dtype), buffer=shm.buf)
+        view.flags.writeable = False
+        _shared[name] = (shm, view)
+
+
+def _view(name):
+    return _shared[name][1]
+
+
+# ── Worker task ─────────────────────────────────────────────────────────
+
+def _evaluate(params: dict, n_rows: int) -> dict:
+    X, X_val = _view("X_tr")[:n_rows], _view("X_val")
+    yc, yr   = _view("yc_tr")[:n_rows], _view("yr_tr")[:n_rows]
+    rf       = forest_params(params)
+
+    t0  = time.perf_counter()
+    clf = RandomForestClassifier(random_state=42, n_jobs=1, **rf).fit(X, yc)
+    reg = RandomForestRegressor(random_state=42, n_jobs=1, **rf).fit(X, yr)
+    train_s = time.perf_counter() - t0
+
+    acc = float(accuracy_score(_view("yc_val"), clf.predict(X_val)))
+    r2  = float(r2_score(_view("yr_val"), reg.predict(X_val)))
+
+    # Same call pattern as predictor.predict for one policy
+    row, lat = X_val[:1], []
+    for _ in range(LATENCY_CALLS):
+        t = time.perf_counter()
+        clf.predict_proba(row)
+        reg.predict(row)
+        lat.append(time.perf_counter() - t)
+
+    return {
+        "params":            params,
+        "n_rows":            n_rows,
+        "accuracy":          round(acc, 5),
+        "r2":                round(r2, 5),
+        "score":             round((acc + r2) / 2, 5),
+        "train_seconds":     round(train_s, 3),
+        "predict_ms_p50":    round(float(np.median(lat)) * 1000, 3),
+        "total_nodes":       int(sum(e.tree_.node_count for e in clf.estimators_)
+                                 + sum(e.tree_.node_count for e in reg.estimators_)),
+    }
+
+
+# ── Search ──────────────────────────────────────────────────────────────
+
+def sample_candidates(n: int, seed: int = 42) -> list:
+    """n distinct random points from SEARCH_SPACE."""
+    keys  = list(SEARCH_SPACE)
+    grid  = list(itertools.product(*(SEARCH_SPACE[k] for k in keys)))
+    rng   = np.random.default_rng(seed)
+    picks = rng.choice(len(grid), size=min(n, len(grid)), replace=False)
+    return [dict(zip(keys, grid[i])) for i in picks]
+
+
+def _prepare(df: pd.DataFrame, val_fraction: float, seed: int) -> dict:
+    X, _ = encode(df, fit=True)
+    y_cls = LabelEncoder().fit_transform(df["risk_tier"].astype(str))
+    y_reg = df["annual_premium_jpy"].to_numpy(dtype=np.float64)
+    X_tr, X_val, yc_tr, yc_val, yr_tr, yr_val = train_test_split(
+        X.to_numpy(dtype=np.float32), y_cls, y_reg,
+        test_size=val_fraction, random_state=seed, shuffle=True,
+    )
+    return {"X_tr": X_tr, "yc_tr": yc_tr, "yr_tr": yr_tr,
+            "X_val": X_val, "yc_val": yc_val, "yr_val": yr_val}
+
+
+def successive_halving(df: pd.DataFrame, n_candidates: int = 27, eta: int = 3,
+                       min_rows: int = 20_000, workers: int = None,
+                       val_fraction: float = 0.2, seed: int = 42,
+                       report=print) -> list:
+    """
+    Run the search and return the leaderboard (best first). Also written to
+    models/tuning_leaderboard.json.
+    """
+    arrays = _prepare(df, val_fraction, seed)
+    n_max  = len(arrays["X_tr"])
+    blocks, desc = _publish(arrays)
+    del arrays
+
+    candidates = sample_candidates(n_candidates, seed)
+    board      = []
+    n_rows     = min(min_rows, n_max)
+    rung       = 0
+    try:
+        with ProcessPoolExecutor(max_workers=workers, mp_context=mp.get_context("spawn"),
+                                 initializer=_attach, initargs=(desc,)) as pool:
+            while candidates:
+                report(f"🔎  Rung {rung}: {len(candidates)} candidates × {n_rows:,} rows")
+                results = list(pool.map(_evaluate, candidates, [n_rows] * len(candidates)))
+                for r in results:
+                    r["rung"] = rung
+                board.extend(results)
+
+                results.sort(key=lambda r: r["score"], reverse=True)
+                best = results[0]
+                report(f"    best score {best['score']:.4f}  acc {best['accuracy']:.4f}  "
+                       f"R² {best['r2']:.4f}  {best['train_seconds']:.1f}s  {best['params']}")
+
+                if len(candidates) == 1 or n_rows >= n_max:
+                    break
+                keep       = max(1, len(candidates) // eta)
+                candidates = [r["params"] for r in results[:keep]]
+                n_rows     = min(n_rows * eta, n_max)
+                rung      += 1
+    finally:
+        for shm in blocks:
+            shm.close()
+            shm.unlink()
+
+    # best-first: deepest rung (most data) dominates, then score
+    board.sort(key=lambda r: (r["rung"], r["score"]), reverse=True)
+    save_leaderboard(board, {"training_rows": n_max, "eta": eta,
+                             "n_candidates": n_candidates, "seed": seed})
+    return board
+
+
+def save_leaderboard(board: list, meta: dict, path: Path = LEADERBOARD_PATH):
+    path.parent.mkdir(parents=True, exist_ok=True)
+    with open(path, "w") as f:
+        json.dump({"created": time.strftime("%Y-%m-%dT%H:%M:%S"), **meta,
+                   "leaderboard": board}, f, indent=2)
+
+
+def load_leaderboard(path: Path = LEADERBOARD_PATH) -> dict:
+    with open(path) as f:
+        return json.load(f)
@@ -0,0 +1,41 @@
+#!/usr/bin/env python3
+"""
+Local Parquet snapshot of japan_auto_policies (ml/snapshot.py).
+
+    python snapshot_policies.py sync        # first run: full export; then only new policies
+    python snapshot_policies.py rebuild     # fresh export, swapped in when complete
+    python snapshot_policies.py info
+
+Train from it with source=snapshot, e.g.
+    POST /train {"source": "snapshot", "n_samples": 1000000}
+"""
+import argparse, logging, sys
+from pathlib import Path
+sys.path.insert(0, str(Path(__file__).parent))
+
+from ml.snapshot import sync_snapshot, read_manifest, SNAPSHOT_DIR
+
+def main():
+    parser = argparse.ArgumentParser()
+    parser.add_argument("cmd", choices=["sync", "rebuild", "info"])
+    parser.add_argument("--dir",        default=str(SNAPSHOT_DIR))
+    parser.add_argument("--chunk-rows", type=int, default=100_000)
+    args = parser.parse_args()
+    logging.basicConfig(level=logging.INFO, format="%(message)s")
+
+    if args.cmd == "info":
+        m = read_manifest(args.dir)
+    else:
+        m = sync_snapshot(args.dir, rebuild=args.cmd == "rebuild", chunk_rows=args.chunk_rows)
+
+    if not m["syncs"]:
+        print(f"⚠️   No snapshot in {args.dir}")
+        return
+    last = m["syncs"][-1]
+    print(f"📦  {args.dir}: {m['rows']:,} rows up to policy_id {m['watermark']:,} "
+          f"in {len(m['syncs'])} sync(s)")
+    print(f"    last sync {last['tag']}: {last['rows']:,} rows in {last['seconds']}s "
+          f"at {last['synced_at']}")
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,82 @@
+#!/usr/bin/env python3
+"""
+Multi-node forest training (ml/distributed.py).
+
+On each node (shared --out directory, or copy the shard files over):
+    python train_distributed.py worker --shard 0/4 --samples 2000000 --trees 40 --out /shared/rf
+    python train_distributed.py worker --shard 1/4 ...
+Then on the coordinator:
+    python train_distributed.py merge --out /shared/rf
+
+Pass the same --watermark to every worker so all shards train on the same
+snapshot of japan_auto_policies (default: each worker reads MAX(policy_id)).
+
+Local test with separate processes:
+    python train_distributed.py local --workers 4 --source synthetic --samples 200000
+"""
+import argparse, subprocess, sys, time
+from pathlib import Path
+sys.path.insert(0, str(Path(__file__).parent))
+
+from ml.distributed import train_shard, merge_shards
+
+def _shard(spec):
+    i, n = (int(x) for x in spec.split("/"))
+    if not 0 <= i < n:
+        raise argparse.ArgumentTypeError(f"shard must be i/N with 0 <= i < N, got {spec}")
+    return i, n
+
+def main():
+    parser = argparse.ArgumentParser()
+    sub = parser.add_subparsers(dest="cmd", required=True)
+    for name in ("worker", "local"):
+        p = sub.add_parser(name)
+        p.add_argument("--samples",   type=int, default=1_000_000, help="rows per worker")
+        p.add_argument("--trees",     type=int, default=None, help="trees per worker (default 150/N)")
+        p.add_argument("--source",    choices=["synthetic", "database", "snapshot"], default="database")
+        p.add_argument("--seed",      type=int, default=42)
+        p.add_argument("--watermark", type=int, default=None)
+        p.add_argument("--out",       default="models/shards")
+    sub.choices["worker"].add_argument("--shard", type=_shard, required=True, help="i/N")
+    sub.choices["local"].add_argument("--workers", type=int, default=2)
+    m = sub.add_parser("merge")
+    m.add_argument("--out",          default="models/shards")
+    m.add_argument("--eval-samples", type=int, default=100_000)
+    args = parser.parse_args()
+
+    if args.cmd == "merge":
+        merge_shards(args.out, eval_samples=args.eval_samples)
+        return
+
+    if args.cmd == "worker":
+        i, n  = args.shard
+        trees = args.trees or max(1, 150 // n)
+        print(f"🌲  Shard {i}/{n}: {trees} trees on {args.samples:,} {args.source} rows")
+        path = train_shard(i, n, args.samples, trees, args.out, source=args.source,
+                           base_seed=args.seed, max_policy_id=args.watermark)
+        print(f"✅  Wrote {path}")
+        return
+
+    # local: one OS process per shard, then merge here
+    n = args.workers
+    for old in Path(args.out).glob("shard-*-of-*.pkl"):
+        old.unlink()
+    base = [sys.executable, __file__, "worker", "--samples", str(args.samples),
+            "--source", args.source, "--seed", str(args.seed), "--out", args.out]
+    if args.trees:
+        base += ["--trees", str(args.trees)]
+    if args.source == "database" and args.watermark is None:
+        from ml.db_loader import get_policy_watermark
+        args.watermark = get_policy_watermark()
+    if args.watermark is not None:
+        base += ["--watermark", str(args.watermark)]
+    t0    = time.time()
+    procs = [subprocess.Popen(base + ["--shard", f"{i}/{n}"]) for i in range(n)]
+    codes = [p.wait() for p in procs]
+    if any(codes):
+        sys.exit(f"❌  Worker exit codes: {codes}")
+    print(f"⏱️   {n} workers finished in {time.time() - t0:.1f}s")
+    merge_shards(args.out, eval_samples=min(args.samples, 100_000))
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,42 @@
+#!/usr/bin/env python3
+"""
+Successive-halving hyperparameter search (ml/tuning.py).
+
+    python tune.py --samples 500000 --candidates 27 --eta 3 --workers 6
+    python tune.py --source database --samples 1000000
+
+Writes models/tuning_leaderboard.json; apply a result with
+    POST /train {"params": {...}}
+"""
+import argparse, sys
+from pathlib import Path
+sys.path.insert(0, str(Path(__file__).parent))
+
+from ml.train_worker import load_dataset
+from ml.tuning import successive_halving, LEADERBOARD_PATH
+
+def main():
+    parser = argparse.ArgumentParser()
+    parser.add_argument("--samples",    type=int, default=200_000)
+    parser.add_argument("--source",     choices=["synthetic", "database", "snapshot"], default="synthetic")
+    parser.add_argument("--seed",       type=int, default=42)
+    parser.add_argument("--candidates", type=int, default=27)
+    parser.add_argument("--eta",        type=int, default=3)
+    parser.add_argument("--min-rows",   type=int, default=20_000)
+    parser.add_argument("--workers",    type=int, default=None)
+    args = parser.parse_args()
+
+    df, label = load_dataset({"source": args.source, "n_samples": args.samples, "seed": args.seed},
+                             lambda e: print(f"    {e['phase']}"))
+    print(f"🎛️   Tuning on {len(df):,} {label} rows")
+    board = successive_halving(df, n_candidates=args.candidates, eta=args.eta,
+                               min_rows=args.min_rows, workers=args.workers, seed=args.seed)
+
+    print(f"\n{'rung':>4} {'rows':>9} {'score':>7} {'acc':>7} {'R²':>7} {'train s':>8} {'pred ms':>8}  params")
+    for r in board[:10]:
+        print(f"{r['rung']:>4} {r['n_rows']:>9,} {r['score']:>7.4f} {r['accuracy']:>7.4f} {r['r2']:>7.4f} "
+              f"{r['train_seconds']:>8.1f} {r['predict_ms_p50']:>8.2f}  {r['params']}")
+    print(f"\n✅  Leaderboard written to {LEADERBOARD_PATH}")
+
+if __name__ == "__main__":
+    main()